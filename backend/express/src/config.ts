@@ -5,6 +5,12 @@ dotenv.config();
 export const config = {
   port: process.env.PORT || 3000,
   pythonApiUrl: process.env.PYTHON_API_URL || "http://localhost:8000",
+  // Where browsers reach the Python API directly (signed direct uploads)
+  pythonPublicUrl:
+    process.env.PYTHON_PUBLIC_URL ||
+    process.env.PYTHON_API_URL ||
+    "http://localhost:8000",
+  uploadTokenIssuerKey: process.env.UPLOAD_TOKEN_ISSUER_KEY,
   environment: process.env.NODE_ENV || "development",
   corsOrigins: [
     "http://localhost:5173",
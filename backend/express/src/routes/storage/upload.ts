@@ -2,16 +2,52 @@ import express from "express";
 import multer from "multer";
 import axios from "axios";
 import FormData from "form-data";
+import { config } from "@/config";
 
 const router = express.Router();
 
+// Issue a signed token so the browser sends the file straight to the Python
+// API; only this small JSON request passes through Express. Size and type
+// limits live in the Python upload policy, whose 413/415 are passed through.
+router.post("/upload-token", async (req, res) => {
+  const { filename, contentType, size } = req.body || {};
+
+  try {
+    const response = await axios.post(
+      `${config.pythonApiUrl}/api/storage/upload-tokens`,
+      { filename, content_type: contentType, size },
+      {
+        headers: config.uploadTokenIssuerKey
+          ? { "X-Service-Key": config.uploadTokenIssuerKey }
+          : {},
+      }
+    );
+    res.json({
+      success: true,
+      token: response.data.token,
+      uploadUrl: `${config.pythonPublicUrl}${response.data.upload_path}`,
+      expiresAt: response.data.expires_at,
+      maxBytes: response.data.max_bytes,
+    });
+  } catch (error: any) {
+    console.error("Upload token error:", {
+      message: error.message,
+      response: error.response?.data,
+    });
+    res.status(error.response?.status || 500).json({
+      success: false,
+      error: error.response?.data?.detail || "Failed to create upload token",
+    });
+  }
+});
+
 const upload = multer({
   limits: {
     fileSize: 10 * 1024 * 1024, // 10MB
   },
 });
 
-
+// Buffered fallback for clients that cannot upload directly
 router.post("/upload", upload.single("file"), async (req, res) => {
   try {
     if (!req.file) {
@@ -49,6 +85,9 @@ router.post("/upload", upload.single("file"), async (req, res) => {
         headers: {
           ...formData.getHeaders(),
           'Content-Type': 'multipart/form-data',
+          ...(config.uploadTokenIssuerKey
+            ? { "X-Service-Key": config.uploadTokenIssuerKey }
+            : {}),
         },
         maxContentLength: Infinity,
         maxBodyLength: Infinity,
@@ -0,0 +1,88 @@
+"""
+Latency under overload with and without admission control:
+
+    python -m scripts.bench_admission --capacity 50 --load 2.0 --seconds 5
+
+An inference-like endpoint runs each request for 1/capacity seconds on a
+single worker thread, like live frames on the ASL executor. Requests arrive
+open-loop at ``load`` times that capacity. Without admission control every
+request queues and latency grows for as long as the overload lasts; with it,
+the excess is shed with a fast 503 and admitted requests keep a bounded wait.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from src.core.admission import AdmissionControl, AdmissionLimiter, AdmissionMiddleware
+
+def build_app(service_time: float, limiter=None) -> FastAPI:
+    app = FastAPI()
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    @app.post("/api/ml/frame")
+    async def frame():
+        await asyncio.get_running_loop().run_in_executor(executor, time.sleep, service_time)
+        return {"detected": True}
+
+    if limiter is not None:
+        control = AdmissionControl([limiter], [("POST", r"/api/ml/.+", "inference")])
+        app.add_middleware(AdmissionMiddleware, control=control)
+    return app
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+async def drive(app, rate: float, seconds: float):
+    ok, shed = [], []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        async def one():
+            started = time.perf_counter()
+            response = await client.post("/api/ml/frame")
+            (ok if response.status_code == 200 else shed).append(time.perf_counter() - started)
+
+        tasks = []
+        started = time.perf_counter()
+        sent = 0
+        while (now := time.perf_counter() - started) < seconds:
+            while sent < now * rate:
+                tasks.append(asyncio.create_task(one()))
+                sent += 1
+            await asyncio.sleep(0.002)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    return ok, shed, elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--capacity", type=float, default=50, help="Requests per second the endpoint can serve")
+    parser.add_argument("--load", type=float, default=2.0, help="Offered load as a multiple of capacity")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--limit", type=int, default=2)
+    parser.add_argument("--queue", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=0.5)
+    args = parser.parse_args()
+
+    service_time = 1 / args.capacity
+    rate = args.capacity * args.load
+    print(f"{rate:.0f} req/s offered to a {args.capacity:.0f} req/s endpoint for {args.seconds:.0f}s")
+    print(f"{'':<20} {'ok':>6} {'shed':>6} {'ok/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'503 p50':>8}")
+    for name, limiter in [
+        ("no admission", None),
+        ("admission control", AdmissionLimiter("inference", args.limit, args.queue, args.timeout)),
+    ]:
+        ok, shed, elapsed = asyncio.run(drive(build_app(service_time, limiter), rate, args.seconds))
+        print(
+            f"{name:<20} {len(ok):>6} {len(shed):>6} {len(ok) / elapsed:>7.1f} "
+            f"{percentile(ok, 0.5):>8.1f} {percentile(ok, 0.95):>8.1f} {percentile(ok, 0.99):>8.1f} "
+            f"{percentile(shed, 0.5):>8.1f}"
+        )
+        if limiter is not None:
+            print(f"{'':<20} shed by reason: {dict(limiter.shed)}")
+
+if __name__ == "__main__":
+    main()
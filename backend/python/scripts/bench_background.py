@@ -0,0 +1,155 @@
+"""
+Throughput and memory of background removal on CPU, whole image versus hand crops:
+
+    python -m scripts.bench_background --images 16 --size 4000x3000
+    python -m scripts.bench_background --segmenter stub --detector stub
+
+Modes, each measured in a fresh process:
+
+- ``naive``: ``rembg.remove`` on every full image, which creates a new model
+  session per call (rembg only)
+- ``whole``: one pre-loaded session, whole images, one at a time
+- ``crop``: ``CutoutStage``, with hand detection, padded crops and batching
+
+By default the real rembg model and asl's HandDetector are used. The stub
+segmenter is an ONNX-shaped numpy network whose cost per model input is fixed,
+like the real one; it exercises the plumbing when rembg is not installed, but
+its absolute numbers say nothing about the real model.
+"""
+import argparse
+import asyncio
+import io
+import multiprocessing
+import resource
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+import numpy as np
+from PIL import Image
+
+class StubOnnxSession:
+    """InferenceSession-shaped stand-in: a per-pixel MLP over each 320x320 input"""
+
+    def __init__(self, hidden: int = 32, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.w1 = rng.normal(0, 0.5, (3, hidden)).astype(np.float32)
+        self.w2 = rng.normal(0, 0.2, (hidden, hidden)).astype(np.float32)
+        self.w3 = rng.normal(0, 0.2, (hidden, 1)).astype(np.float32)
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input.1", shape=["batch", 3, 320, 320])]
+
+    def run(self, outputs, feeds):
+        batch = feeds["input.1"]
+        n, _, h, w = batch.shape
+        x = batch.transpose(0, 2, 3, 1).reshape(-1, 3)
+        x = np.maximum(x @ self.w1, 0)
+        x = np.maximum(x @ self.w2, 0)
+        return [(x @ self.w3).reshape(n, 1, h, w)]
+
+def camera_photos(count: int, width: int, height: int) -> List[bytes]:
+    from scripts.bench_pipeline import synthetic_frame
+    photos = []
+    for i in range(count):
+        frame = synthetic_frame(width, height, hand=True, seed=i)[..., ::-1]
+        buffer = io.BytesIO()
+        Image.fromarray(frame).save(buffer, "JPEG", quality=90)
+        photos.append(buffer.getvalue())
+    return photos
+
+def stub_locator():
+    from scripts.bench_pipeline import StubHandDetector
+    return StubHandDetector().detect
+
+def session_factory(args):
+    from src.services.ml.background_removal import SegmentationSession, load_session
+    if args.segmenter == "stub":
+        session = SegmentationSession(StubOnnxSession())
+        return lambda: session
+    return lambda: load_session(args.model)
+
+def locator_factory(args):
+    if args.detector == "stub":
+        return stub_locator
+    from src.services.ml.background_removal import asl_hand_locator
+    return lambda: asl_hand_locator(args.model_path)
+
+def run_naive(photos: List[bytes], args) -> int:
+    from rembg import remove
+    for data in photos:
+        remove(data)
+    return len(photos)
+
+def run_whole(photos: List[bytes], args) -> int:
+    from src.services.ml.background_removal import CutoutStage
+    session = session_factory(args)()
+    for data in photos:
+        image = np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+        mask = session.masks([image])[0]
+        CutoutStage._compose(image, mask, (0, 0, image.shape[1], image.shape[0]), False)
+    return len(photos)
+
+def run_crop(photos: List[bytes], args) -> int:
+    from src.services.ml.background_removal import CutoutOptions, CutoutStage
+    stage = CutoutStage(
+        locator_factory(args),
+        session_factory(args),
+        CutoutOptions(model=args.model, batch_size=args.batch_size),
+        workers=args.workers,
+    )
+
+    async def cut_all():
+        return await asyncio.gather(*(stage.cut(data) for data in photos))
+
+    cutouts = asyncio.run(cut_all())
+    found = sum(1 for cutout in cutouts if cutout is not None)
+    metrics = stage.metrics()
+    print(f"  crop: {found}/{len(photos)} hands, {metrics['segmented_share']:.1%} of pixels segmented, "
+          f"mean batch {metrics['mean_batch']:.1f}")
+    stage.close()
+    return len(photos)
+
+MODES = {"naive": run_naive, "whole": run_whole, "crop": run_crop}
+
+def measure(mode: str, args) -> Dict[str, Any]:
+    """Runs in a fresh process so model sessions and peak RSS do not carry over"""
+    photos = camera_photos(args.images, *args.size)
+    if mode != "naive":
+        MODES[mode](photos[:1], args)  # load the session and warm up, as a worker does at startup
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    count = MODES[mode](photos, args)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "images_per_s": count / elapsed,
+        "max_rss_mb": peak / 1024,
+        "rss_growth_mb": (peak - baseline) / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--size", type=lambda s: tuple(int(v) for v in s.split("x")), default=(4000, 3000))
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=None)
+    parser.add_argument("--segmenter", choices=["rembg", "stub"], default="rembg")
+    parser.add_argument("--detector", choices=["asl", "stub"], default="asl")
+    parser.add_argument("--model", default="u2netp")
+    parser.add_argument("--model-path", default="models/asl_coords_model")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    modes = args.modes or (["whole", "crop"] if args.segmenter == "stub" else list(MODES))
+
+    print(f"{args.images} photos of {args.size[0]}x{args.size[1]}, segmenter {args.segmenter}, detector {args.detector}")
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for mode in modes:
+        with context.Pool(1) as pool:
+            results[mode] = pool.apply(measure, (mode, args))
+    print(f"{'mode':<8} {'images/s':>9} {'max RSS MB':>11} {'RSS growth MB':>14}")
+    for mode, result in results.items():
+        print(f"{mode:<8} {result['images_per_s']:>9.2f} {result['max_rss_mb']:>11.0f} {result['rss_growth_mb']:>14.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Throughput benchmark for LilypadService against the local stand-in server.
+
+Compares one job per input (max_batch_size=1) with batched jobs at the same
+job-concurrency limit:
+
+    python -m scripts.bench_lilypad --requests 500 --concurrency 100
+"""
+import argparse
+import asyncio
+import time
+from aiohttp.test_utils import TestServer
+from scripts.lilypad_standin import STATS, create_app
+from src.services.compute.lilypad import LilypadService
+
+async def run(batch_size: int, requests: int, concurrency: int, args) -> dict:
+    server = TestServer(create_app(args.job_overhead, args.per_item_latency))
+    await server.start_server()
+    service = LilypadService(
+        api_key="bench",
+        base_url=str(server.make_url("")),
+        max_batch_size=batch_size,
+        max_concurrent_jobs=args.max_jobs,
+        poll_interval=args.poll_interval
+    )
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with gate:
+            return await service.infer({"frame": i})
+
+    started = time.perf_counter()
+    async with service:
+        await asyncio.gather(*[one(i) for i in range(requests)])
+    elapsed = time.perf_counter() - started
+    stats = server.app[STATS]
+    await server.close()
+    return {
+        "batch_size": batch_size,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "jobs": stats["jobs"],
+        "polls": stats["polls"],
+        "max_running_jobs": stats["max_running"],
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--max-jobs", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--job-overhead", type=float, default=0.2)
+    parser.add_argument("--per-item-latency", type=float, default=0.002)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    for batch_size in (1, args.batch_size):
+        print(await run(batch_size, args.requests, args.concurrency, args))
+
+if __name__ == "__main__":
+    asyncio.run(main())
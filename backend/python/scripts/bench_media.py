@@ -0,0 +1,144 @@
+"""
+Stored bytes and preview-serving latency of upload derivatives:
+
+    python -m scripts.bench_media --images 12 --quality 80
+
+Renders synthetic camera photos (12MP JPEGs with a large EXIF block) through
+MediaPipeline backed by a local storage provider, then reports the size of the
+display copy and thumbnails against the originals, render throughput, and the
+latency of serving a thumbnail (cached and cold) versus the full original.
+"""
+import argparse
+import asyncio
+import io
+import statistics
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from fastapi import FastAPI
+from fastapi.responses import FileResponse
+from httpx import ASGITransport, AsyncClient
+from PIL import Image
+from src.services.storage.cid_cache import CIDCache
+from src.services.storage.derivatives import DerivativeOptions, MediaPipeline
+from src.services.storage.local import LocalStorageService
+
+BUCKET = "asl-training-data"
+
+def camera_photo(seed: int, width: int, height: int) -> bytes:
+    """Smooth gradients and shapes with sensor-like noise, saved like a phone camera would"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        128 + 100 * np.sin(x / rng.uniform(200, 600) + rng.uniform(0, 6)),
+        128 + 100 * np.cos(y / rng.uniform(200, 600) + rng.uniform(0, 6)),
+        128 + 100 * np.sin((x + y) / rng.uniform(300, 900)),
+    ], axis=-1)
+    for _ in range(12):
+        cx, cy, r = rng.uniform(0, width), rng.uniform(0, height), rng.uniform(80, 600)
+        mask = (x - cx) ** 2 + (y - cy) ** 2 < r ** 2
+        base[mask] = rng.uniform(0, 255, 3)
+    base += rng.normal(0, 4, base.shape)
+    image = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+    exif = Image.Exif()
+    exif[0x0112] = 1
+    exif[0x010F] = "PhoneMaker"
+    exif[0x927C] = bytes(rng.integers(0, 255, 60_000, dtype=np.uint8))  # maker note
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=92, exif=exif.tobytes())
+    return buffer.getvalue()
+
+def build_app(pipeline: MediaPipeline, storage: LocalStorageService) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/original/{name}")
+    async def original(name: str):
+        return FileResponse(storage.path_for(BUCKET, name), media_type="image/jpeg")
+
+    @app.get("/media/{cid}/{variant}")
+    async def derivative(cid: str, variant: str):
+        path, info = await pipeline.variant_path(cid, variant)
+        return FileResponse(path, media_type=info["media_type"])
+
+    return app
+
+async def timed_gets(client: AsyncClient, paths, before=None):
+    samples, size = [], 0
+    for path in paths:
+        if before:
+            before()
+        started = time.perf_counter()
+        response = await client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        size = len(response.content)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)], size
+
+async def run(args) -> None:
+    root = Path(tempfile.mkdtemp(prefix="bench-media-"))
+    storage = LocalStorageService(root / "storage")
+    options = DerivativeOptions(
+        format=args.format, quality=args.quality, max_edge=args.max_edge, thumbnail_sizes=(128, 320)
+    )
+    pipeline = MediaPipeline(storage, BUCKET, CIDCache(root / "cache"), options, workers=args.workers)
+
+    photos = [camera_photo(seed, args.width, args.height) for seed in range(args.images)]
+    cids = []
+    for seed, data in enumerate(photos):
+        cid = await storage.upload_file(BUCKET, data, f"photo-{seed}.jpg")
+        cids.append(cid)
+
+    started = time.perf_counter()
+    for seed, (cid, data) in enumerate(zip(cids, photos)):
+        pipeline.schedule(cid, data, f"photo-{seed}.jpg")
+    await pipeline.drain()
+    elapsed = time.perf_counter() - started
+
+    manifests = [await pipeline.manifest(cid) for cid in cids]
+    assert all(m.status == "ready" for m in manifests), [m.error for m in manifests]
+    originals = sum(len(p) for p in photos)
+    print(f"{args.images} photos {args.width}x{args.height}, {args.format} q{args.quality}, {args.workers} workers")
+    print(f"render: {args.images / elapsed:.1f} images/s ({elapsed / args.images * 1000:.0f} ms/image wall)")
+    print(f"\n{'variant':<12} {'avg bytes':>11} {'vs original':>12}")
+    print(f"{'original':<12} {originals / args.images:>11,.0f} {'100.0%':>12}")
+    for variant in manifests[0].variants:
+        size = sum(m.variants[variant]["bytes"] for m in manifests)
+        print(f"{variant:<12} {size / args.images:>11,.0f} {size / originals:>11.1%}")
+
+    app = build_app(pipeline, storage)
+    requests = max(args.requests // args.images, 1)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        def fresh_cache():
+            # Forget local manifests and cached derivatives, as on a new node
+            pipeline.cache = CIDCache(Path(tempfile.mkdtemp(dir=root)))
+            pipeline.manifest_dir = pipeline.cache.root / "manifests"
+            pipeline.manifest_dir.mkdir()
+
+        cases = [
+            ("original", [f"/original/photo-{seed}.jpg" for seed in range(args.images)] * requests, None),
+            ("thumb-128 cached", [f"/media/{cid}/thumb-128" for cid in cids] * requests, None),
+            ("display cached", [f"/media/{cid}/display" for cid in cids] * requests, None),
+            ("thumb-128 cold", [f"/media/{cid}/thumb-128" for cid in cids], fresh_cache),
+        ]
+        print(f"\n{'serving':<18} {'p50 ms':>8} {'p95 ms':>8} {'bytes':>11}")
+        for name, paths, before in cases:
+            await timed_gets(client, paths[:args.images], before)  # warm up
+            p50, p95, size = await timed_gets(client, paths, before)
+            print(f"{name:<18} {p50:>8.2f} {p95:>8.2f} {size:>11,}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--format", default="webp")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--max-edge", type=int, default=2048)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=600)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""
+Benchmark suite for the ASL inference pipeline, with regression gates.
+
+Builds synthetic frames (and optionally fixture photos) at several
+resolutions, with and without a hand, and measures every stage of a frame
+request: base64/JPEG decode, hand detection, landmark preprocessing, model
+prediction and response serialization, plus end-to-end latency, throughput
+with 1..N concurrent threads and peak memory per request.
+
+    python -m scripts.bench_pipeline                   # run, compare with the baseline
+    python -m scripts.bench_pipeline --update-baseline # accept the current numbers
+    python -m scripts.bench_pipeline --quick --output results.json
+
+Runs offline on CPU-only Linux. The default "stub" backend stands in for the
+``asl`` package with an OpenCV skin-colour detector that returns 21 landmarks
+and a tiny two-layer CoordsModel-shaped classifier, so the suite runs
+without MediaPipe or TensorFlow. ``--backend service`` benchmarks the real
+``ASLService`` (stages: decode, pipeline, serialize) when those are installed.
+
+Results are JSON with sorted keys. The run fails (exit status 1) when a
+stage's median latency, the throughput or the peak memory is worse than the
+baseline by more than the gate percentage, which is stored in the baseline
+under "gates" with optional per-metric overrides (fnmatch patterns).
+Baselines are only comparable on the machine that recorded them; regenerate
+it there with --update-baseline.
+"""
+import os
+
+# Never touch a GPU, even when one is visible
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+import argparse
+import base64
+import fnmatch
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from src.api.serialization import JSON, render
+
+SCHEMA = 1
+BASELINE_PATH = Path(__file__).with_name("bench_pipeline_baseline.json")
+RESOLUTIONS = {"vga": (640, 480), "hd": (1280, 720), "fhd": (1920, 1080)}
+LETTERS = ["0"] + [chr(c) for c in range(ord("A"), ord("Z") + 1)]
+DEFAULT_GATES = {"default_pct": 25.0, "overrides": {}}
+# Differences below these are noise, whatever the percentage
+NOISE_FLOOR_MS = 0.05
+NOISE_FLOOR_MB = 1.0
+
+# Skin tone in BGR; inside the YCrCb range the stub detector looks for
+SKIN = (120, 160, 220)
+
+
+# Inputs
+
+def synthetic_frame(width: int, height: int, hand: bool, seed: int = 0) -> np.ndarray:
+    """Webcam-like frame: shaded non-skin background with noise, optionally a hand shape"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[..., 0] = 150 + 60 * x / width   # blue-ish wall
+    frame[..., 1] = 110 + 40 * y / height
+    frame[..., 2] = 60 + 20 * (x + y) / (width + height)
+    frame += rng.normal(0, 6, frame.shape)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+    if hand:
+        scale = min(width, height) / 480
+        cx, cy = int(width * 0.5), int(height * 0.6)
+        cv2.ellipse(frame, (cx, cy), (int(70 * scale), int(85 * scale)), 0, 0, 360, SKIN, -1)
+        for i, angle in enumerate((-50, -20, 0, 20, 45)):
+            length = (110 if i else 80) * scale
+            tip = (
+                int(cx + length * 1.4 * np.sin(np.radians(angle))),
+                int(cy - 40 * scale - length * np.cos(np.radians(angle))),
+            )
+            cv2.line(frame, (cx, int(cy - 30 * scale)), tip, SKIN, max(1, int(24 * scale)))
+    return frame
+
+def encode_payload(frame: np.ndarray) -> str:
+    """Base64 JPEG, as sent to /api/ml/process-image"""
+    ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise ValueError("Could not encode frame")
+    return base64.b64encode(data.tobytes()).decode()
+
+def build_cases(resolutions: List[str], fixtures: Optional[Path]) -> Dict[str, str]:
+    """Payloads by case name, "<resolution>/<hand|empty|fixture-name>" """
+    cases = {}
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        cases[f"{name}/hand"] = encode_payload(synthetic_frame(width, height, hand=True))
+        cases[f"{name}/empty"] = encode_payload(synthetic_frame(width, height, hand=False))
+        for path in sorted(fixtures.iterdir()) if fixtures else []:
+            image = cv2.imread(str(path))
+            if image is None:
+                continue
+            cases[f"{name}/{path.stem}"] = encode_payload(cv2.resize(image, (width, height)))
+    return cases
+
+
+# Pipeline stages
+
+@contextmanager
+def timed(timings: Dict[str, List[float]], stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    yield
+    timings.setdefault(stage, []).append((time.perf_counter() - started) * 1000)
+
+def decode(payload: str) -> np.ndarray:
+    """Same decode as ASLService.process_image"""
+    image = cv2.imdecode(np.frombuffer(base64.b64decode(payload), dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Invalid image data")
+    return image
+
+
+class StubHandDetector:
+    """
+    Stand-in for asl's MediaPipe HandDetector: skin-colour segmentation at the
+    detector's input size, returning 21 normalized (x, y, z) landmarks taken
+    from the largest skin contour, or None when there is no hand.
+    """
+
+    def __init__(self, input_size: int = 256, min_area: float = 0.01):
+        self.input_size = input_size
+        self.min_area = min_area
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    def detect(self, image: np.ndarray) -> Optional[np.ndarray]:
+        height, width = image.shape[:2]
+        scale = self.input_size / max(height, width)
+        small = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        ycrcb = cv2.cvtColor(small, cv2.COLOR_BGR2YCrCb)
+        mask = cv2.inRange(ycrcb, (0, 135, 85), (255, 180, 135))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+        contour = max(contours, key=cv2.contourArea)
+        if cv2.contourArea(contour) < self.min_area * mask.size:
+            return None
+        moments = cv2.moments(contour)
+        wrist = (moments["m10"] / moments["m00"], moments["m01"] / moments["m00"])
+        points = contour[:, 0, :].astype(np.float32)
+        picks = points[np.linspace(0, len(points) - 1, 20).astype(int)]
+        landmarks = np.zeros((21, 3), dtype=np.float32)
+        landmarks[0, :2] = wrist
+        landmarks[1:, :2] = picks
+        landmarks[:, 0] /= mask.shape[1]
+        landmarks[:, 1] /= mask.shape[0]
+        return landmarks
+
+
+def preprocess(landmarks: np.ndarray) -> np.ndarray:
+    """Like ASLPreprocessor(normalize=True, flatten=True): wrist-relative, unit scale, flat"""
+    centered = landmarks - landmarks[0]
+    scale = np.abs(centered).max() or 1.0
+    return (centered / scale).reshape(1, -1).astype(np.float32)
+
+
+class TinyCoordsModel:
+    """CoordsModel-shaped classifier (63 landmark coordinates in, 27 classes out) with fixed weights"""
+
+    def __init__(self, hidden: int = 128, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.w1 = rng.normal(0, 0.2, (63, hidden)).astype(np.float32)
+        self.b1 = np.zeros(hidden, dtype=np.float32)
+        self.w2 = rng.normal(0, 0.2, (hidden, len(LETTERS))).astype(np.float32)
+        self.b2 = np.zeros(len(LETTERS), dtype=np.float32)
+
+    def predict(self, features: np.ndarray) -> Dict[str, Any]:
+        hidden = np.maximum(features @ self.w1 + self.b1, 0)
+        logits = hidden @ self.w2 + self.b2
+        probabilities = np.exp(logits - logits.max())
+        probabilities /= probabilities.sum()
+        class_index = int(probabilities.argmax())
+        return {"class_index": class_index, "confidence": float(probabilities[0, class_index])}
+
+
+class StubStages:
+    """The frame request path with asl stood in by StubHandDetector and TinyCoordsModel"""
+    name = "stub"
+    stages = ("decode", "detect", "preprocess", "predict", "serialize")
+
+    def __init__(self, model: TinyCoordsModel):
+        # Like ASLService: a detector per instance, one shared model
+        self.detector = StubHandDetector()
+        self.model = model
+
+    def run(self, payload: str, timings: Dict[str, List[float]]) -> bytes:
+        with timed(timings, "decode"):
+            image = decode(payload)
+        with timed(timings, "detect"):
+            landmarks = self.detector.detect(image)
+        result: Dict[str, Any] = {"detected": False}
+        if landmarks is not None:
+            with timed(timings, "preprocess"):
+                features = preprocess(landmarks)
+            with timed(timings, "predict"):
+                prediction = self.model.predict(features)
+            result = {
+                "detected": True,
+                "letter": LETTERS[prediction["class_index"]],
+                "confidence": prediction["confidence"],
+                "landmarks": landmarks,
+            }
+        with timed(timings, "serialize"):
+            return render(result, JSON).body
+
+
+class ServiceStages:
+    """The real ASLService; detection, preprocessing and prediction are timed together"""
+    name = "service"
+    stages = ("decode", "pipeline", "serialize")
+
+    def __init__(self, model_path: str):
+        from src.services.ml.asl_service import ASLService
+        self.service = ASLService(model_path)
+
+    def run(self, payload: str, timings: Dict[str, List[float]]) -> bytes:
+        with timed(timings, "decode"):
+            image = decode(payload)
+        with timed(timings, "pipeline"):
+            result = self.service.process_frame(image, as_array=True)
+        with timed(timings, "serialize"):
+            return render(result, JSON).body
+
+
+def stage_factory(args) -> Callable[[], Any]:
+    if args.backend == "service":
+        return lambda: ServiceStages(args.model_path)
+    model = TinyCoordsModel()
+    return lambda: StubStages(model)
+
+
+# Measurements
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 4),
+        "p50_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+    }
+
+def measure_latency(stages, cases: Dict[str, str], repeats: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for case, payload in cases.items():
+        timings: Dict[str, List[float]] = {}
+        for _ in range(warmup):
+            stages.run(payload, {})
+        for _ in range(repeats):
+            with timed(timings, "end_to_end"):
+                stages.run(payload, timings)
+        for stage, samples in timings.items():
+            results[f"{case}/{stage}"] = summarize(samples)
+    return results
+
+def measure_throughput(factory, payloads: List[str], threads: int, requests: int) -> float:
+    """Frames per second with ``threads`` request threads, each with its own stages like a worker"""
+    workers = [factory() for _ in range(threads)]
+
+    def work(index: int) -> None:
+        stages = workers[index % threads]
+        for i in range(index, requests, threads):
+            stages.run(payloads[i % len(payloads)], {})
+
+    for stages in workers:
+        stages.run(payloads[0], {})
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        started = time.perf_counter()
+        list(pool.map(work, range(threads)))
+        elapsed = time.perf_counter() - started
+    return round(requests / elapsed, 2)
+
+def measure_memory(stages, cases: Dict[str, str]) -> Dict[str, float]:
+    """Peak Python/NumPy allocations while serving one frame of each case"""
+    results = {}
+    for case, payload in cases.items():
+        stages.run(payload, {})
+        tracemalloc.start()
+        try:
+            stages.run(payload, {})
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        results[f"{case}/peak_mb"] = round(peak / 1024 ** 2, 3)
+    # ru_maxrss is in kB on Linux
+    results["process/max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return results
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+def run_suite(args) -> Dict[str, Any]:
+    cv2.setNumThreads(args.native_threads)
+    factory = stage_factory(args)
+    stages = factory()
+    cases = build_cases(args.resolutions, args.fixtures)
+    hand_payloads = [payload for case, payload in cases.items() if not case.endswith("/empty")]
+    return {
+        "schema": SCHEMA,
+        "backend": stages.name,
+        "environment": environment(),
+        "config": {
+            "repeats": args.repeats,
+            "resolutions": args.resolutions,
+            "threads": args.threads,
+            "native_threads": args.native_threads,
+        },
+        "latency": measure_latency(stages, cases, args.repeats, args.warmup),
+        "throughput": {
+            f"threads-{threads}/fps": measure_throughput(factory, hand_payloads, threads, args.throughput_requests)
+            for threads in args.threads
+        },
+        "memory": measure_memory(stages, cases),
+    }
+
+
+# Regression gates
+
+def gate_for(metric: str, gates: Dict[str, Any]) -> float:
+    for pattern, pct in gates.get("overrides", {}).items():
+        if fnmatch.fnmatch(metric, pattern):
+            return float(pct)
+    return float(gates.get("default_pct", DEFAULT_GATES["default_pct"]))
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """
+    Compare a run with a baseline.
+
+    Returns:
+        Tuple[List[str], List[str]]: (regressions, report lines)
+    """
+    gates = baseline.get("gates", DEFAULT_GATES)
+    regressions, lines = [], []
+    if current.get("backend") != baseline.get("backend") or current.get("schema") != baseline.get("schema"):
+        return [], [f"baseline is for backend {baseline.get('backend')!r}, schema {baseline.get('schema')}; not compared"]
+
+    if current.get("environment") != baseline.get("environment"):
+        lines.append("warning: baseline was recorded in a different environment; expect noise")
+
+    # (section, metric, value, baseline value, higher is worse, noise floor)
+    checks = []
+    for metric, stats in current["latency"].items():
+        base = baseline["latency"].get(metric)
+        if base:
+            checks.append(("latency", metric, stats["p50_ms"], base["p50_ms"], True, NOISE_FLOOR_MS))
+    for metric, value in current["throughput"].items():
+        if metric in baseline["throughput"]:
+            checks.append(("throughput", metric, value, baseline["throughput"][metric], False, 0.0))
+    for metric, value in current["memory"].items():
+        if metric in baseline["memory"]:
+            checks.append(("memory", metric, value, baseline["memory"][metric], True, NOISE_FLOOR_MB))
+
+    for section, metric, value, base, higher_is_worse, floor in checks:
+        change = (value - base) / base * 100 if base else 0.0
+        worse = change if higher_is_worse else -change
+        limit = gate_for(metric, gates)
+        failed = worse > limit and abs(value - base) > floor
+        status = "REGRESSION" if failed else "ok"
+        lines.append(f"{section:<10} {metric:<34} {base:>10.3f} -> {value:>10.3f} {change:>+7.1f}% (gate {limit:.0f}%) {status}")
+        if failed:
+            regressions.append(f"{section} {metric}: {base:.3f} -> {value:.3f} ({change:+.1f}%, gate {limit:.0f}%)")
+
+    new = sorted(set(current["latency"]) - set(baseline["latency"]))
+    if new:
+        lines.append(f"not in baseline: {', '.join(new)}")
+    return regressions, lines
+
+def write_json(path: Path, data: Dict[str, Any]) -> None:
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("stub", "service"), default="stub")
+    parser.add_argument("--model-path", default=os.environ.get("ASL_MODEL_PATH", "models/asl_coords_model"))
+    parser.add_argument("--resolutions", type=lambda s: s.split(","), default=list(RESOLUTIONS))
+    parser.add_argument("--fixtures", type=Path, help="Directory of photos to add as cases at every resolution")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--threads", type=lambda s: [int(t) for t in s.split(",")], default=[1, 2, 4])
+    parser.add_argument("--throughput-requests", type=int, default=200)
+    parser.add_argument("--native-threads", type=int, default=1, help="OpenCV threads per request thread")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", type=Path, help="Also write this run's results here")
+    parser.add_argument("--quick", action="store_true", help="Few repeats, for smoke runs; not compared")
+    args = parser.parse_args(argv)
+    unknown = set(args.resolutions) - set(RESOLUTIONS)
+    if unknown:
+        parser.error(f"unknown resolutions: {', '.join(sorted(unknown))}")
+    if args.quick:
+        args.repeats, args.warmup, args.throughput_requests = 5, 1, 20
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = run_suite(args)
+    if args.output:
+        write_json(args.output, results)
+
+    print(f"{'case/stage':<34} {'p50 ms':>9} {'p95 ms':>9}")
+    for metric, stats in sorted(results["latency"].items()):
+        print(f"{metric:<34} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f}")
+    for metric, value in results["throughput"].items():
+        print(f"{metric:<34} {value:>9.1f}")
+    for metric, value in results["memory"].items():
+        print(f"{metric:<34} {value:>9.3f}")
+
+    if args.update_baseline:
+        gates = DEFAULT_GATES
+        if args.baseline.exists():
+            gates = json.loads(args.baseline.read_text()).get("gates", DEFAULT_GATES)
+        write_json(args.baseline, {**results, "gates": gates})
+        print(f"\nbaseline written to {args.baseline}")
+        return 0
+    if args.quick or not args.baseline.exists():
+        return 0
+
+    regressions, lines = compare(results, json.loads(args.baseline.read_text()))
+    print(f"\ncompared with {args.baseline}")
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):\n  " + "\n  ".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
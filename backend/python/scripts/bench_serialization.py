@@ -0,0 +1,67 @@
+"""
+Encode time and size of one inference response in each response format.
+
+"baseline" is the previous path: landmarks.tolist(), FastAPI's
+jsonable_encoder and the stdlib JSON encoder used by JSONResponse.
+
+    python -m scripts.bench_serialization --iterations 20000
+"""
+import argparse
+import json
+import time
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from src.api import serialization
+from src.api.serialization import COMPACT_JSON, JSON, MSGPACK, render
+
+def make_result(hands: int) -> dict:
+    rng = np.random.default_rng(0)
+    return {
+        "detected": True,
+        "letter": "A",
+        "confidence": 0.93,
+        "landmarks": rng.random((21 * hands, 3), dtype=np.float32),
+        "committed": None,
+        "word": "HELLO",
+    }
+
+def baseline(result: dict) -> bytes:
+    content = jsonable_encoder({**result, "landmarks": result["landmarks"].tolist()})
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def measure(encode, iterations: int):
+    body = encode()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        encode()
+    return (time.perf_counter() - started) / iterations * 1e6, len(body)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--hands", type=int, default=1)
+    args = parser.parse_args()
+
+    result = make_result(args.hands)
+    cases = [
+        ("baseline (tolist + json)", lambda: baseline(result)),
+        ("json (orjson)" if serialization.orjson else "json (stdlib)", lambda: render(result, JSON).body),
+        ("compact json float32", lambda: render(result, f"{COMPACT_JSON}; dtype=float32").body),
+        ("compact json float16", lambda: render(result, COMPACT_JSON).body),
+    ]
+    if serialization.msgpack is not None:
+        cases += [
+            ("msgpack float32", lambda: render(result, f"{MSGPACK}; dtype=float32").body),
+            ("msgpack float16", lambda: render(result, MSGPACK).body),
+        ]
+    else:
+        print("msgpack not installed; skipping MessagePack formats")
+
+    base_us, base_bytes = measure(cases[0][1], args.iterations)
+    print(f"{'format':<26} {'us/response':>12} {'bytes':>7} {'speedup':>8} {'size':>6}")
+    for name, encode in cases:
+        us, size = (base_us, base_bytes) if encode is cases[0][1] else measure(encode, args.iterations)
+        print(f"{name:<26} {us:>12.1f} {size:>7} {base_us / us:>7.1f}x {size / base_bytes:>6.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Live-frame latency with a shadow model version, against none:
+
+    python -m scripts.bench_shadow --frames 300 --rate 20 --shadow 0 0.25 1.0
+
+Frames go through ``ModelRegistry`` on one thread, like the live-frame
+executor, with the stand-in detector and model from ``scripts.bench_pipeline``.
+A candidate with a smaller hidden layer runs in shadow on the given fraction
+of frames; the live p50/p95 show what shadowing costs the user, and the
+shadow stats what it tells us about the candidate.
+"""
+import argparse
+import time
+from typing import Any, Dict
+from scripts.bench_pipeline import (
+    LETTERS,
+    StubHandDetector,
+    TinyCoordsModel,
+    decode,
+    encode_payload,
+    preprocess,
+    synthetic_frame,
+)
+from src.services.ml.model_registry import ModelRegistry, ModelVersion
+
+MODELS = {"stable": TinyCoordsModel(hidden=512, seed=0), "fast": TinyCoordsModel(hidden=64, seed=0)}
+
+class StubService:
+    """ASLService-shaped: a detector per instance, shared model weights"""
+
+    def __init__(self, version: ModelVersion):
+        self.detector = StubHandDetector()
+        self.model = MODELS[version.path]
+
+    def process_image(self, image_data: str, as_array: bool = False) -> Dict[str, Any]:
+        landmarks = self.detector.detect(decode(image_data))
+        if landmarks is None:
+            return {"detected": False}
+        prediction = self.model.predict(preprocess(landmarks))
+        return {
+            "detected": True,
+            "letter": LETTERS[prediction["class_index"]],
+            "confidence": prediction["confidence"],
+            "landmarks": landmarks,
+        }
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+def run(shadow: float, frames, rate: float) -> Dict[str, Any]:
+    registry = ModelRegistry(
+        [ModelVersion("stable", "stable"), ModelVersion("fast", "fast", weight=0, shadow=shadow)],
+        StubService,
+        seed=0,
+    )
+    registry.process_image(frames[0])  # load outside the measurement
+    latencies = []
+    started = time.perf_counter()
+    for i, frame in enumerate(frames):
+        # Paced like a camera: the next frame arrives every 1/rate seconds
+        time.sleep(max(0.0, started + i / rate - time.perf_counter()))
+        begin = time.perf_counter()
+        registry.process_image(frame, key="bench")
+        latencies.append(time.perf_counter() - begin)
+    registry.drain()
+    metrics = registry.metrics()["versions"]
+    registry.close()
+    return {"latencies": latencies, "shadow": metrics["fast"].get("shadow_stats")}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=20, help="Frames per second")
+    parser.add_argument("--shadow", type=float, nargs="+", default=[0.0, 0.25, 1.0])
+    args = parser.parse_args()
+
+    frames = [encode_payload(synthetic_frame(640, 480, hand=i % 5 != 0)) for i in range(args.frames)]
+    print(f"{args.frames} VGA frames at {args.rate:.0f} fps")
+    print(f"{'shadow':>7} {'live p50':>9} {'live p95':>9} {'compared':>9} {'dropped':>8} {'agree':>6} {'shadow p50':>11}")
+    for rate in args.shadow:
+        result = run(rate, frames, args.rate)
+        stats = result["shadow"] or {}
+        shadow_p50 = (stats.get("latency") or {}).get("p50")
+        agreement = stats.get("agreement")
+        print(
+            f"{rate:>7.2f} {percentile(result['latencies'], 0.5):>9.2f} {percentile(result['latencies'], 0.95):>9.2f} "
+            f"{stats.get('compared', 0):>9} {stats.get('dropped', 0):>8} "
+            f"{'-' if agreement is None else f'{agreement:.2f}':>6} "
+            f"{'-' if shadow_p50 is None else f'{shadow_p50 * 1000:.2f}':>11}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Reading training data object by object versus from shards:
+
+    python -m scripts.bench_shards --samples 2000 --latency-ms 20
+
+Fills a local bucket with image-sized samples and a landmark sidecar each,
+behind a storage provider that adds a fixed per-request latency like a remote
+store. Reports one epoch read as individual downloads (with the given
+concurrency) against one epoch read from tar shards through ``ShardReader``,
+including the one-off export.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from src.services.storage.local import LocalStorageService
+from src.services.storage.shards import ShardReader, export_shards, group_samples, storage_shards
+
+BUCKET = "asl-training-data"
+SHARD_BUCKET = "asl-training-shards"
+
+class RemoteLike(LocalStorageService):
+    """Local storage with a fixed delay per request"""
+
+    def __init__(self, root, latency: float):
+        super().__init__(root, max_bytes=1 << 40)
+        self.latency = latency
+        self.requests = 0
+
+    async def download_file(self, bucket_name, file_name, destination):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return await super().download_file(bucket_name, file_name, destination)
+
+async def per_object_epoch(storage: RemoteLike, concurrency: int, directory: Path) -> int:
+    groups, _ = group_samples(await storage.list_files(BUCKET))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i, group):
+        async with semaphore:
+            for ext, name in group.members.items():
+                path = Path(await storage.download_file(BUCKET, name, str(directory / f"{i}.{ext}")))
+                path.read_bytes()
+                path.unlink()
+
+    await asyncio.gather(*(one(i, group) for i, group in enumerate(groups)))
+    return len(groups)
+
+async def fill(storage: RemoteLike, samples: int, size: int) -> None:
+    for i in range(samples):
+        key = f"{chr(65 + i % 26)}_{i:06d}"
+        await storage.upload_file(BUCKET, os.urandom(size), f"{key}.jpg")
+        await storage.upload_file(BUCKET, json.dumps([[0.5, 0.5, 0.0]] * 21).encode(), f"{key}.landmarks.json")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--size-kb", type=int, default=60, help="Bytes per image")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Added to every download request")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--shard-mb", type=float, default=32)
+    parser.add_argument("--prefetch", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        storage = RemoteLike(tmp / "storage", args.latency_ms / 1000)
+        asyncio.run(fill(storage, args.samples, args.size_kb * 1024))
+
+        storage.requests = 0
+        started = time.perf_counter()
+        (tmp / "objects").mkdir()
+        count = asyncio.run(per_object_epoch(storage, args.concurrency, tmp / "objects"))
+        per_object = time.perf_counter() - started, storage.requests
+
+        storage.requests = 0
+        started = time.perf_counter()
+        index = asyncio.run(export_shards(
+            storage, BUCKET, tmp / "export", shard_bytes=int(args.shard_mb * 1024 * 1024),
+            concurrency=args.concurrency, seed=0, upload_bucket=SHARD_BUCKET, keep_local=False,
+        ))
+        export = time.perf_counter() - started, storage.requests
+
+        storage.requests = 0
+        started = time.perf_counter()
+        reader = ShardReader(index, storage_shards(storage, SHARD_BUCKET, tmp / "cache"), prefetch=args.prefetch, seed=0)
+        assert sum(1 for _ in reader) == count
+        sharded = time.perf_counter() - started, storage.requests
+
+    print(f"{count} samples, {len(index.shards)} shards, {args.latency_ms:.0f}ms per request")
+    print(f"{'':<22} {'seconds':>8} {'requests':>9} {'samples/s':>10}")
+    for name, (elapsed, requests) in [
+        ("per-object epoch", per_object),
+        ("export (one-off)", export),
+        ("sharded epoch", sharded),
+    ]:
+        print(f"{name:<22} {elapsed:>8.2f} {requests:>9} {count / elapsed:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Overhead of TracingMiddleware per request, measured at the ASGI level so
+network and server noise do not hide it:
+
+    python -m scripts.bench_tracing --requests 20000
+
+First against a minimal ASGI endpoint, which isolates the middleware's own
+cost, then on a FastAPI app: bare, behind an empty middleware layer, with the
+middleware (profiling off), with two spans per request, and fully profiled.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from fastapi import FastAPI
+from src.core.tracing import TracingMiddleware, span
+
+class PassThrough:
+    """Empty ASGI middleware: the cost any middleware layer has before doing work"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        async def forward(message):
+            await send(message)
+        await self.app(scope, receive, forward)
+
+def build_app(with_spans: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/frame")
+    async def frame():
+        if with_spans:
+            with span("inference"):
+                pass
+            with span("akave"):
+                pass
+        return {"detected": True, "letter": "A"}
+
+    return app
+
+async def run(app, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/frame", "raw_path": b"/frame", "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench")], "server": ("bench", 80), "client": ("bench", 1),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+async def raw_app(scope, receive, send):
+    """Minimal ASGI endpoint, so only the middleware's own cost is measured"""
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+def compare(title: str, cases, args) -> None:
+    apps = [factory() for _, factory in cases]
+    best = [float("inf")] * len(cases)
+    # Interleave the cases and keep the best round of each, so drift in CPU
+    # frequency or GC pressure does not land on one case only
+    for _ in range(args.rounds):
+        for i, (name, _) in enumerate(cases):
+            requests = args.requests if "profiled" not in name else max(1, args.requests // 100)
+            best[i] = min(best[i], asyncio.run(run(apps[i], requests)))
+
+    print(f"\n{title}")
+    print(f"{'case':<28} {'us/request':>11} {'overhead':>9}")
+    for (name, _), us in zip(cases, best):
+        print(f"{name:<28} {us:>11.1f} {us - best[0]:>+8.1f}us")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=7)
+    args = parser.parse_args()
+
+    profile_dir = tempfile.mkdtemp(prefix="profiles-")
+    compare("Middleware alone (raw ASGI endpoint)", [
+        ("bare endpoint", lambda: raw_app),
+        ("empty middleware layer", lambda: PassThrough(raw_app)),
+        ("middleware, profiling off", lambda: TracingMiddleware(raw_app, slow_threshold=60)),
+    ], args)
+    compare("FastAPI app", [
+        ("bare app", lambda: build_app(False)),
+        ("empty middleware layer", lambda: PassThrough(build_app(False))),
+        ("middleware, profiling off", lambda: TracingMiddleware(build_app(False), slow_threshold=60)),
+        ("middleware + 2 spans", lambda: TracingMiddleware(build_app(True), slow_threshold=60)),
+        ("every request profiled", lambda: TracingMiddleware(
+            build_app(False), slow_threshold=60, sample_rate=1.0, profile_dir=profile_dir)),
+    ], args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Memory benchmark for the production launcher.
+
+Starts ``scripts.serve`` with each worker count and preload mode, waits for
+/health, optionally warms the ML endpoint, then reports RSS and PSS per worker
+and in total (Linux only):
+
+    python -m scripts.bench_workers --workers 1 2 4 --preload none models
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from scripts.serve import memory_report, worker_pids
+
+def wait_healthy(port: int, workers: int, parent_pid: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                if response.status == 200 and len(worker_pids(parent_pid)) >= workers:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server on port {port} not healthy after {timeout}s")
+
+def warm(port: int, image_path: str, requests: int) -> None:
+    """Send a few frames so lazily created per-worker state is included"""
+    import base64
+    import json
+    with open(image_path, "rb") as f:
+        body = json.dumps({"image": base64.b64encode(f.read()).decode()}).encode()
+    for i in range(requests):
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/api/ml/sessions/bench-{i}/frames",
+            data=body,
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            urllib.request.urlopen(request, timeout=60).read()
+        except OSError as e:
+            print(f"  warm-up request failed: {e}")
+            return
+
+def run(workers: int, preload: str, args) -> dict:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "scripts.serve", "--workers", str(workers), "--preload", preload,
+         "--port", str(args.port), "--host", "127.0.0.1", "--log-level", "warning"],
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        wait_healthy(args.port, workers, process.pid, args.startup_timeout)
+        if args.warm_image:
+            warm(args.port, args.warm_image, args.warm_requests)
+        time.sleep(args.settle)
+        return memory_report(process.pid, worker_pids(process.pid))
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--preload", nargs="+", default=["none", "models"], choices=["none", "app", "models"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--warm-image", default=None, help="Image sent to each worker before measuring")
+    parser.add_argument("--warm-requests", type=int, default=8)
+    parser.add_argument("--settle", type=float, default=1.0)
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("Memory reporting needs Linux /proc/<pid>/smaps_rollup")
+
+    print(f"{'preload':<8} {'workers':>7} {'worker RSS MB':>14} {'worker PSS MB':>14} {'total RSS MB':>13} {'total PSS MB':>13}")
+    for preload in args.preload:
+        for workers in args.workers:
+            report = run(workers, preload, args)
+            per_worker = [u for name, u in report["processes"].items() if name != "parent" and u]
+            rss = sum(u["rss"] for u in per_worker) / max(1, len(per_worker)) / 1024
+            pss = sum(u["pss"] for u in per_worker) / max(1, len(per_worker)) / 1024
+            print(
+                f"{preload:<8} {workers:>7} {rss:>14.1f} {pss:>14.1f} "
+                f"{report['total_rss_kb'] / 1024:>13.1f} {report['total_pss_kb'] / 1024:>13.1f}"
+            )
+
+if __name__ == "__main__":
+    main()
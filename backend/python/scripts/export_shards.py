@@ -0,0 +1,86 @@
+"""
+Export a training-data bucket as tar shards:
+
+    python -m scripts.export_shards --out shards --shard-mb 256 --seed 0 --label-pattern '^([A-Z])_'
+    python -m scripts.export_shards --out shards --upload asl-training-shards --no-keep-local
+
+Reads from Akave (or, with ``--local-root``, from a local storage tier) and
+writes ``<prefix>-NNNNN.tar`` shards plus ``<prefix>.index.json``. With
+``--verify`` the shards are read back through ``ShardReader`` afterwards.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import List, Optional
+from src.services.storage.local import LocalStorageService
+from src.services.storage.shards import (
+    ShardReader,
+    export_shards,
+    label_from_pattern,
+    load_labels,
+    local_shards,
+)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pack a training-data bucket into tar shards")
+    parser.add_argument("--bucket", default="asl-training-data")
+    parser.add_argument("--out", required=True, help="Directory for shards and the index")
+    parser.add_argument("--prefix", default="asl-train")
+    parser.add_argument("--shard-mb", type=float, default=256)
+    parser.add_argument("--max-samples", type=int, default=None, help="Samples per shard at most")
+    parser.add_argument("--labels", help="CSV of key,label rows for samples without a label sidecar")
+    parser.add_argument("--label-pattern", help="Regex whose first group is the label, e.g. '^([A-Z])_'")
+    parser.add_argument("--require-label", action="store_true", help="Skip samples without a label")
+    parser.add_argument("--concurrency", type=int, default=8, help="Samples downloaded at once")
+    parser.add_argument("--seed", type=int, default=None, help="Shuffle samples across shards")
+    parser.add_argument("--upload", metavar="BUCKET", help="Upload shards and index to this bucket")
+    parser.add_argument("--no-keep-local", action="store_true", help="Delete local shards once uploaded")
+    parser.add_argument("--local-root", help="Read from a local storage tier instead of Akave")
+    parser.add_argument("--verify", action="store_true", help="Read every shard back and report throughput")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.local_root:
+        storage = LocalStorageService(args.local_root)
+    else:
+        from src.services.storage.akave import AkaveStorageService
+        storage = AkaveStorageService()
+
+    labels = None
+    if args.labels:
+        labels = load_labels(args.labels).get
+    elif args.label_pattern:
+        labels = label_from_pattern(args.label_pattern)
+
+    index = asyncio.run(export_shards(
+        storage,
+        args.bucket,
+        args.out,
+        prefix=args.prefix,
+        shard_bytes=int(args.shard_mb * 1024 * 1024),
+        max_samples=args.max_samples,
+        labels=labels,
+        require_label=args.require_label,
+        concurrency=args.concurrency,
+        seed=args.seed,
+        upload_bucket=args.upload,
+        keep_local=not args.no_keep_local,
+    ))
+    total = sum(shard.size for shard in index.shards)
+    print(f"{index.samples} samples in {len(index.shards)} shards ({total / 1024 / 1024:.1f} MB)")
+    print(f"labels: {index.labels}")
+
+    if args.verify:
+        if args.no_keep_local:
+            print("--verify needs the local shards; skipped")
+            return
+        started = time.perf_counter()
+        count = sum(1 for _ in ShardReader(index, local_shards(args.out), shuffle_buffer=1))
+        elapsed = time.perf_counter() - started
+        print(f"read back {count} samples in {elapsed:.2f}s ({count / elapsed:.0f} samples/s)")
+
+if __name__ == "__main__":
+    main()
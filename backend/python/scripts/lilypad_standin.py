@@ -0,0 +1,84 @@
+"""
+Local stand-in for the Lilypad jobs API, for tests and throughput benchmarks.
+
+Implements the contract LilypadService expects: POST /jobs creates a job that
+completes after a fixed scheduling overhead plus a per-input cost, and
+GET /jobs/{id} reports its status. Each output echoes its input so callers can
+check that results are fanned back out in order.
+"""
+import argparse
+import asyncio
+import itertools
+from aiohttp import web
+
+JOBS = web.AppKey("jobs", dict)
+STATS = web.AppKey("stats", dict)
+
+def create_app(
+    job_overhead: float = 0.5,
+    per_item_latency: float = 0.005,
+    fail_modules: tuple = ()
+) -> web.Application:
+    """Build the stand-in app; counters are kept in ``app[STATS]``"""
+    app = web.Application()
+    jobs = {}
+    ids = itertools.count(1)
+    stats = {"jobs": 0, "polls": 0, "running": 0, "max_running": 0, "items": 0}
+    app[JOBS] = jobs
+    app[STATS] = stats
+
+    async def run_job(job_id: str, inputs: list, fail: bool) -> None:
+        stats["running"] += 1
+        stats["max_running"] = max(stats["max_running"], stats["running"])
+        jobs[job_id]["status"] = "running"
+        try:
+            await asyncio.sleep(job_overhead + per_item_latency * len(inputs))
+            if fail:
+                jobs[job_id].update(status="failed", error="module crashed")
+            else:
+                jobs[job_id].update(
+                    status="completed",
+                    result={"outputs": [{"echo": item} for item in inputs]}
+                )
+        finally:
+            stats["running"] -= 1
+
+    async def submit(request: web.Request) -> web.Response:
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            return web.json_response({"error": "unauthorized"}, status=401)
+        body = await request.json()
+        job_input = body.get("input", {})
+        inputs = job_input["batch"] if "batch" in job_input else [job_input]
+        job_id = f"job-{next(ids)}"
+        jobs[job_id] = {"id": job_id, "status": "pending"}
+        stats["jobs"] += 1
+        stats["items"] += len(inputs)
+        fail = body.get("module") in fail_modules or any(item.get("fail") for item in inputs)
+        asyncio.get_running_loop().create_task(run_job(job_id, inputs, fail))
+        return web.json_response({"id": job_id, "status": "pending"})
+
+    async def status(request: web.Request) -> web.Response:
+        stats["polls"] += 1
+        job = jobs.get(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "not found"}, status=404)
+        return web.json_response(job)
+
+    app.router.add_post("/jobs", submit)
+    app.router.add_get("/jobs/{job_id}", status)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Lilypad stand-in server")
+    parser.add_argument("--port", type=int, default=4100)
+    parser.add_argument("--job-overhead", type=float, default=0.5)
+    parser.add_argument("--per-item-latency", type=float, default=0.005)
+    args = parser.parse_args()
+    web.run_app(
+        create_app(args.job_overhead, args.per_item_latency),
+        host="127.0.0.1",
+        port=args.port
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Production launcher: load the app once, then fork uvicorn workers.
+
+The parent imports the app before forking, so every worker shares those pages
+copy-on-write instead of importing its own copy. With ``--preload models``
+(opt in) the parent also loads the model weights; this imports TensorFlow
+before ``fork``, which is not fork-safe on every platform, so check it on the
+target before relying on it. If the weights cannot be loaded the launcher
+warns and workers load the model lazily on the first ML request, as with the
+default ``--preload app``.
+Thread pools are capped per worker, and workers can be replaced one at a time
+without dropping the listening socket.
+
+    python -m scripts.serve --workers 4 --threads-per-worker 2
+
+Signals to the parent:
+    SIGHUP           rolling restart (new worker is up before the old one stops)
+    SIGUSR1          print a memory report (RSS/PSS per worker and total)
+    SIGTERM, SIGINT  graceful shutdown
+
+Workers are forked from the preloaded parent, so a rolling restart recycles
+worker processes but does not pick up new code or model files; restart the
+launcher for that. Memory reporting reads /proc and is Linux only.
+"""
+import argparse
+import gc
+import importlib
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional, Tuple
+
+# Must be set before numpy/TensorFlow/OpenCV are imported; workers inherit them
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS",
+)
+
+SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared",
+    "Shared_Dirty": "shared",
+    "Private_Clean": "private",
+    "Private_Dirty": "private",
+}
+
+# Seconds between attempts to replace a dead worker that fails to start
+RESPAWN_BACKOFF_MIN = 1.0
+RESPAWN_BACKOFF_MAX = 60.0
+
+def cap_threads(threads: int) -> None:
+    """Limit native thread pools so N workers do not oversubscribe the CPUs"""
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    # Inference runs one op graph at a time; extra inter-op threads only add contention
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+
+def memory_usage(pid: int) -> Optional[Dict[str, int]]:
+    """RSS, PSS, shared and private memory of a process in kB, or None if unavailable"""
+    usage = {"rss": 0, "pss": 0, "shared": 0, "private": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in SMAPS_FIELDS:
+                    usage[SMAPS_FIELDS[key]] += int(rest.split()[0])
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+    return usage
+
+def memory_report(parent_pid: int, worker_pids: List[int]) -> Dict[str, object]:
+    """
+    Per-process memory plus totals. Summed RSS counts shared pages once per
+    process; summed PSS splits them between sharers and is the real footprint.
+    """
+    processes = {"parent": memory_usage(parent_pid)}
+    for pid in worker_pids:
+        processes[str(pid)] = memory_usage(pid)
+    known = [usage for usage in processes.values() if usage]
+    return {
+        "workers": len(worker_pids),
+        "processes": processes,
+        "total_rss_kb": sum(usage["rss"] for usage in known),
+        "total_pss_kb": sum(usage["pss"] for usage in known),
+    }
+
+def worker_pids(parent_pid: int) -> List[int]:
+    """Direct children of a process (used by the benchmark to find workers)"""
+    try:
+        with open(f"/proc/{parent_pid}/task/{parent_pid}/children") as f:
+            return [int(pid) for pid in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+def load_app(target: str):
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr or "app")
+
+def preload(args):
+    """Import the app (and optionally the model) in the parent before forking"""
+    if args.preload == "none":
+        return None
+    app = load_app(args.app)
+    if args.preload == "models":
+        from src.api.routes.ml import preload_models
+        started = time.perf_counter()
+        try:
+            preload_models()
+        except Exception as e:
+            # Storage-only deployments have no model; the ML routes load it lazily if it appears
+            print(f"[serve] Model preload failed ({e}); workers will load it on first use")
+        else:
+            print(f"[serve] Model preloaded in {time.perf_counter() - started:.1f}s")
+    return app
+
+def run_worker(app, sock: socket.socket, args, ready_fd: int) -> None:
+    import uvicorn
+
+    if app is None:
+        app = load_app(args.app)
+    try:
+        import cv2
+        cv2.setNumThreads(args.threads_per_worker)
+    except ImportError:
+        pass
+
+    class WorkerServer(uvicorn.Server):
+        async def startup(self, sockets=None):
+            await super().startup(sockets=sockets)
+            if self.started:
+                os.write(ready_fd, b"1")
+            os.close(ready_fd)
+
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    WorkerServer(config).run(sockets=[sock])
+
+class Supervisor:
+    """Forks workers on a shared socket, replaces dead ones and handles signals"""
+
+    def __init__(self, app, sock: socket.socket, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, float] = {}
+        self.stopping = False
+        self.restart_requested = False
+        self.report_requested = False
+        self.exit_code = 0
+        # Workers that died and are still owed a replacement, and when to try next
+        self.missing = 0
+        self.respawn_delay = RESPAWN_BACKOFF_MIN
+        self.next_respawn = 0.0
+
+    def spawn(self) -> Tuple[int, int]:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            # uvicorn installs its own SIGINT/SIGTERM handlers; the control
+            # signals are only meant for the supervisor, even when sent to the group
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.args, write_fd)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(write_fd)
+        self.workers[pid] = time.time()
+        return pid, read_fd
+
+    def wait_ready(self, pid: int, read_fd: int) -> bool:
+        """Block until the worker is accepting connections, exits or times out"""
+        try:
+            readable, _, _ = select.select([read_fd], [], [], self.args.startup_timeout)
+            return bool(readable) and os.read(read_fd, 1) == b"1"
+        finally:
+            os.close(read_fd)
+
+    def start_worker(self) -> Optional[int]:
+        pid, read_fd = self.spawn()
+        if self.wait_ready(pid, read_fd):
+            print(f"[serve] Worker {pid} ready")
+            return pid
+        print(f"[serve] Worker {pid} failed to start")
+        self.stop_worker(pid)
+        return None
+
+    def stop_worker(self, pid: int) -> None:
+        """SIGTERM a worker, let it drain in-flight requests, SIGKILL after the timeout"""
+        self.workers.pop(pid, None)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        self._wait_exit(pid)
+
+    def _wait_exit(self, pid: int) -> None:
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        try:
+            while time.monotonic() < deadline:
+                if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                    return
+                time.sleep(0.05)
+            print(f"[serve] Worker {pid} did not stop in time, killing")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+    def rolling_restart(self) -> None:
+        print(f"[serve] Rolling restart of {len(self.workers)} workers")
+        for old_pid in list(self.workers):
+            # Bring the replacement up first so capacity never drops by more than one
+            if self.start_worker() is None:
+                print("[serve] Aborting rolling restart; old workers keep serving")
+                return
+            self.stop_worker(old_pid)
+
+    def reap(self) -> None:
+        """Replace workers that exited without being asked to"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.workers.pop(pid, None) is not None and not self.stopping:
+                code = os.waitstatus_to_exitcode(status)
+                print(f"[serve] Worker {pid} exited unexpectedly (exit code {code}), respawning")
+                self.missing = min(self.missing + 1, self.args.workers - len(self.workers))
+        self.respawn()
+
+    def respawn(self) -> None:
+        """
+        Start owed replacements; after a failed start, back off and retry on a
+        later tick. With no worker left to serve, give up and exit non-zero so
+        the process manager can restart the whole server.
+        """
+        while self.missing and not self.stopping and time.monotonic() >= self.next_respawn:
+            if self.start_worker() is not None:
+                self.missing -= 1
+                self.respawn_delay = RESPAWN_BACKOFF_MIN
+                continue
+            if not self.workers:
+                print("[serve] No workers left and the replacement failed to start; exiting")
+                self.exit_code = 1
+                self.stopping = True
+                return
+            print(f"[serve] Retrying in {self.respawn_delay:.0f}s with {len(self.workers)} workers serving")
+            self.next_respawn = time.monotonic() + self.respawn_delay
+            self.respawn_delay = min(self.respawn_delay * 2, RESPAWN_BACKOFF_MAX)
+
+    def report(self) -> None:
+        print(json.dumps(memory_report(os.getpid(), list(self.workers))), flush=True)
+
+    def _on_signal(self, signum, frame) -> None:
+        if signum == signal.SIGHUP:
+            self.restart_requested = True
+        elif signum == signal.SIGUSR1:
+            self.report_requested = True
+        else:
+            self.stopping = True
+
+    def run(self) -> None:
+        for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGUSR1):
+            signal.signal(sig, self._on_signal)
+
+        for _ in range(self.args.workers):
+            if self.start_worker() is None:
+                self.exit_code = 1
+                self.stopping = True
+                break
+        if not self.stopping:
+            print(f"[serve] {len(self.workers)} workers on {self.args.host}:{self.args.port}")
+            self.report()
+
+        last_report = time.monotonic()
+        while not self.stopping:
+            time.sleep(0.2)
+            self.reap()
+            if self.restart_requested:
+                self.restart_requested = False
+                self.rolling_restart()
+            due = self.args.report_interval and time.monotonic() - last_report >= self.args.report_interval
+            if self.report_requested or due:
+                self.report_requested = False
+                last_report = time.monotonic()
+                self.report()
+
+        print("[serve] Shutting down workers")
+        # Signal every worker first so they drain in parallel
+        pids = list(self.workers)
+        self.workers.clear()
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in pids:
+            self._wait_exit(pid)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="src.main:app")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", "2")))
+    parser.add_argument("--threads-per-worker", type=int, default=int(os.getenv("THREADS_PER_WORKER", "1")))
+    parser.add_argument(
+        "--preload", choices=["models", "app", "none"], default=os.getenv("PRELOAD", "app"),
+        help="What to load before forking: app and model weights (opt in), the app only, or nothing"
+    )
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--report-interval", type=float, default=0, help="Seconds between memory reports (0 = off)")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    """Production server entry point"""
+    args = parse_args(argv)
+    cap_threads(args.threads_per_worker)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        sock.bind((args.host, args.port))
+    except OSError as e:
+        print(f"\nCannot bind {args.host}:{args.port}: {e}")
+        sys.exit(1)
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    app = preload(args)
+    # Move everything loaded so far out of the GC's reach: collections would
+    # otherwise write to object headers and un-share the pages in every worker
+    gc.collect()
+    gc.freeze()
+
+    supervisor = Supervisor(app, sock, args)
+    supervisor.run()
+    sock.close()
+    sys.exit(supervisor.exit_code)
+
+if __name__ == "__main__":
+    main()
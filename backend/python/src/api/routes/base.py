@@ -1,6 +1,9 @@
+import logging
 from fastapi import APIRouter, HTTPException
 from typing import Any, Dict
 
+logger = logging.getLogger(__name__)
+
 class BaseRouter:
     """Base class for all route handlers"""
     def __init__(self, prefix: str, tags: list[str]):
@@ -13,7 +16,7 @@ class BaseRouter:
 
     def handle_error(self, error: Exception) -> None:
         """Standardized error handling"""
-        print(f"Error occurred: {str(error)}")
+        logger.error(f"Error occurred: {str(error)}", exc_info=error)
         raise HTTPException(
             status_code=500,
             detail=str(error)
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import Header, HTTPException, Query, Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+from .base import BaseRouter
+from ..serialization import encode_json, render
+from ..uploads import read_upload, rejection_response
+from ...core.config import settings
+from ...core.tracing import span
+from ...services.ml.model_registry import ModelRegistry, ModelVersion, parse_versions
+from ...services.ml.sequence_decoder import FingerspellingDecoder
+from ...services.ml.video_service import (
+    MotionSampler,
+    StrideSampler,
+    VideoPipeline,
+    VideoProcessingError,
+)
+from ...services.storage.akave import AkaveStorageService
+from ...services.storage.validation import VIDEO_TYPES, UploadPolicy, UploadRejected
+
+logger = logging.getLogger(__name__)
+
+# Same 100MB limit as uploads, for videos only
+VIDEO_POLICY = UploadPolicy(allowed_types=VIDEO_TYPES)
+
+def _create_asl_service(model_path: Optional[str] = None):
+    # Deferred so TensorFlow/MediaPipe only load when the first ML request arrives
+    from ...services.ml.asl_service import ASLService
+    return ASLService(model_path or settings.ASL_MODEL_PATH)
+
+def _model_versions() -> List[ModelVersion]:
+    return parse_versions(settings.ASL_MODEL_VERSIONS, settings.ASL_MODEL_PATH)
+
+def preload_models() -> None:
+    """Import the ML stack and load the weights of every model version now (used by the pre-fork launcher)"""
+    from ...services.ml.asl_service import load_model
+    for version in _model_versions():
+        load_model(version.path)
+
+class FrameRequest(BaseModel):
+    image: str  # base64 encoded frame
+
+class MLRouter(BaseRouter):
+    def __init__(self):
+        super().__init__(prefix="/api/ml", tags=["ml"])
+        self._video_pipeline: Optional[VideoPipeline] = None
+        # Live frames run on a single thread (MediaPipe is not thread-safe); the registry
+        # keeps one ASLService per model version for it and for the shadow threads
+        self._frame_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asl-frames")
+        self.models = ModelRegistry(
+            _model_versions(),
+            lambda version: _create_asl_service(version.path),
+            shadow_workers=settings.ASL_SHADOW_WORKERS,
+            shadow_queue=settings.ASL_SHADOW_QUEUE,
+        )
+        self.decoder = FingerspellingDecoder()
+        self.router.add_event_handler("shutdown", self._shutdown)
+        self._register_routes()
+
+    def _shutdown(self) -> None:
+        """Stop shadow mirroring and release the inference threads as the worker exits"""
+        self.models.close()
+        self._frame_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _process_frame(self, image_data: str, session_id: str) -> Dict[str, Any]:
+        # Landmarks stay a float32 array; the response encoder packs or serializes it
+        return self.models.process_image(image_data, key=session_id, as_array=True)
+
+    @property
+    def video_pipeline(self) -> VideoPipeline:
+        """Shared pipeline; each worker thread loads its own ASLService on first use"""
+        if self._video_pipeline is None:
+            # Clips run on the primary model version only
+            primary_path = self.models.primary.path
+            self._video_pipeline = VideoPipeline(
+                lambda: _create_asl_service(primary_path),
+                workers=settings.VIDEO_WORKERS,
+                batch_size=settings.VIDEO_BATCH_SIZE
+            )
+        return self._video_pipeline
+
+    def _register_routes(self) -> None:
+        """Register all ML routes"""
+
+        @self.router.post("/video")
+        async def process_video(
+            request: Request,
+            filename: Optional[str] = Query(None),
+            sampling: Literal["stride", "motion"] = Query("stride"),
+            stride: int = Query(settings.VIDEO_SAMPLE_STRIDE, ge=1),
+            store: bool = Query(True),
+            accept: Optional[str] = Header(None)
+        ) -> Response:
+            """
+            Run ASL inference over a video clip.
+            Takes multipart/form-data (field "file") or a raw video body. The
+            stream is validated as it arrives, so non-video or oversized bodies
+            are rejected from their first bytes, and is spooled to disk once,
+            where the decoder reads it incrementally.
+            Frames are sampled by stride or by motion and the per-clip timeline
+            of letters and landmarks is stored next to the clip.
+            """
+            tmp = NamedTemporaryFile(delete=False)
+            try:
+                try:
+                    upload = await read_upload(request, VIDEO_POLICY, filename=filename, spool=tmp)
+                except UploadRejected as e:
+                    logger.info(f"Rejected video: {e.detail}")
+                    return rejection_response(e)
+                tmp.close()
+
+                sampler = MotionSampler() if sampling == "motion" else StrideSampler(stride)
+                with span("inference"):
+                    timeline = await self.video_pipeline.process_async(tmp.name, sampler)
+                timeline.source = upload.filename
+                result = timeline.to_dict()
+
+                response = {
+                    "filename": upload.filename,
+                    "size": upload.size,
+                    "fps": timeline.fps,
+                    "frame_count": timeline.frame_count,
+                    "frames_sampled": result["frames_sampled"],
+                    "letters": result["letters"],
+                }
+                if store:
+                    timeline_name = f"{Path(upload.filename).stem}.timeline.json"
+                    cid = await AkaveStorageService().upload_file(
+                        bucket_name=settings.DEFAULT_BUCKET,
+                        file_data=encode_json(result),
+                        file_name=timeline_name
+                    )
+                    response.update(timeline_file=timeline_name, timeline_cid=cid)
+                else:
+                    response["timeline"] = result["entries"]
+                return render(response, accept)
+
+            except HTTPException:
+                raise
+            except VideoProcessingError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            except Exception as e:
+                self.handle_error(e)
+            finally:
+                tmp.close()
+                os.unlink(tmp.name)
+
+        @self.router.post("/sessions/{session_id}/frames")
+        async def process_session_frame(
+            session_id: str,
+            request: FrameRequest,
+            accept: Optional[str] = Header(None)
+        ) -> Response:
+            """
+            Run ASL inference on one live frame and feed it to the session's
+            fingerspelling decoder. Returns the frame prediction plus the word
+            being spelled; ``committed`` is set on the frame that adds a letter.
+            The whole text is at GET /sessions/{session_id}, so per-frame work
+            does not grow with the session.
+            Send ``Accept: application/msgpack`` or
+            ``application/vnd.asl.compact+json`` for packed float16 landmarks.
+            ``model`` names the model version that served the frame; a session
+            stays on one version.
+            """
+            try:
+                loop = asyncio.get_running_loop()
+                with span("inference"):
+                    result = await loop.run_in_executor(
+                        self._frame_executor, self._process_frame, request.image, session_id
+                    )
+                if "error" in result:
+                    raise HTTPException(status_code=400, detail=result["error"])
+
+                class_index = None
+                if result.get("detected") and result.get("letter") in self.decoder.labels:
+                    class_index = self.decoder.labels.index(result["letter"])
+                update = self.decoder.update_prediction(session_id, class_index, result.get("confidence") or 0.0)
+                return render({
+                    **result,
+                    "committed": update.committed,
+                    "word": update.word,
+                }, accept)
+            except HTTPException:
+                raise
+            except Exception as e:
+                self.handle_error(e)
+
+        @self.router.get("/models")
+        async def model_metrics() -> Dict[str, Any]:
+            """
+            Model versions with their routing weight and shadow rate, live
+            latency, and for shadow versions the agreement with live results
+            and latency on the same frames.
+            """
+            return self.models.metrics()
+
+        @self.router.get("/sessions/{session_id}")
+        async def session_text(session_id: str) -> Dict[str, Any]:
+            """Text spelled so far in a fingerspelling session"""
+            return {"session_id": session_id, "text": self.decoder.text(session_id)}
+
+        @self.router.delete("/sessions/{session_id}")
+        async def reset_session(session_id: str) -> Dict[str, Any]:
+            """End a fingerspelling session and return its final text"""
+            text = self.decoder.text(session_id)
+            self.decoder.reset(session_id)
+            return {"session_id": session_id, "text": text}
+
+# Create singleton instance
+ml_router = MLRouter().router
@@ -1,85 +1,307 @@
-
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from typing import Dict, Any
-import aiohttp
+import hashlib
+import hmac
+import logging
+import time
+from pathlib import Path
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from typing import Dict, Any, Optional
 from .base import BaseRouter
-from ...core.config import settings
+from ..uploads import ReceivedUpload, read_upload, rejection_response
+from ...core.config import APP_DIR, settings
+from ...services.ml.background_removal import CutoutOptions, CutoutStage, asl_hand_locator
+from ...services.storage.akave import AkaveStorageService
 from ...services.storage.akave_sdk import AkaveSDK, AkaveConfig, AkaveError
-from pydantic import BaseModel
+from ...services.storage.cid_cache import CIDCache
+from ...services.storage.derivatives import DerivativeError, DerivativeOptions, MediaPipeline
+from ...services.storage.upload_tokens import InvalidUploadToken, UploadTokenSigner
+from ...services.storage.validation import (
+    IMAGE_TYPES,
+    VIDEO_TYPES,
+    UploadPolicy,
+    UploadRejected,
+    format_size,
+)
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
 
 # Create a model for the request body
 class BucketCreate(BaseModel):
     bucket_name: str
 
+class UploadTokenRequest(BaseModel):
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    size: Optional[int] = Field(None, ge=1)
+
+def _upload_token_signer() -> UploadTokenSigner:
+    secret = settings.UPLOAD_TOKEN_SECRET
+    if secret:
+        return UploadTokenSigner(secret.encode(), ttl=settings.UPLOAD_TOKEN_TTL)
+    # Derived, so every worker agrees on the key without extra configuration
+    key = hmac.new(settings.AUTH_PRIVATE_KEY.encode(), b"asl-upload-tokens", hashlib.sha256).digest()
+    return UploadTokenSigner(key, ttl=settings.UPLOAD_TOKEN_TTL)
+
+def _service_key_matches(x_service_key: Optional[str]) -> bool:
+    """Whether the caller sent the configured UPLOAD_TOKEN_ISSUER_KEY (False if none is configured)"""
+    expected = settings.UPLOAD_TOKEN_ISSUER_KEY
+    return bool(expected) and hmac.compare_digest((x_service_key or "").encode(), expected.encode())
+
 class StorageRouter(BaseRouter):
     def __init__(self):
         # Initialize base class first
         super().__init__(prefix="/api/storage", tags=["storage"])
+        self.storage_service = AkaveStorageService()
+        self.media: Optional[MediaPipeline] = None
+        self.upload_tokens = _upload_token_signer()
+        if settings.MEDIA_PIPELINE:
+            self.router.add_event_handler("startup", self._start_media_pipeline)
 
         # Register routes after everything is set up
         self._register_routes()
 
+    def _start_media_pipeline(self) -> None:
+        """
+        Build the media pipeline as each worker starts (after any pre-fork), so
+        importing the app creates no cache directory and the segmentation
+        model is loaded before the first upload rather than on it.
+        """
+        if self.media is None:
+            self.media = self._create_media_pipeline()
+            if self.media.cutouts is not None:
+                self.media.cutouts.start()
+
+    def _create_media_pipeline(self) -> MediaPipeline:
+        options = DerivativeOptions(
+            format=settings.MEDIA_FORMAT.lower(),
+            quality=settings.MEDIA_QUALITY,
+            max_edge=settings.MEDIA_MAX_EDGE,
+            thumbnail_sizes=tuple(int(size) for size in settings.MEDIA_THUMBNAIL_SIZES.split(",")),
+        )
+        cutouts = None
+        if settings.BACKGROUND_REMOVAL:
+            cutouts = CutoutStage(
+                lambda: asl_hand_locator(settings.ASL_MODEL_PATH),
+                options=CutoutOptions(
+                    model=settings.BACKGROUND_MODEL,
+                    padding=settings.BACKGROUND_PADDING,
+                    batch_size=settings.BACKGROUND_BATCH_SIZE,
+                ),
+                workers=settings.BACKGROUND_WORKERS,
+            )
+        cache_dir = Path(settings.MEDIA_CACHE_DIR)
+        if not cache_dir.is_absolute():
+            cache_dir = APP_DIR / cache_dir
+        # Derivatives and manifests get their own bucket so the originals' bucket stays training data only
+        return MediaPipeline(
+            self.storage_service,
+            settings.MEDIA_BUCKET,
+            CIDCache(cache_dir, max_bytes=settings.MEDIA_CACHE_BYTES),
+            options=options,
+            workers=settings.MEDIA_WORKERS,
+            cutouts=cutouts,
+        )
+
+    async def _store_upload(self, upload: ReceivedUpload, bucket_name: str) -> Dict[str, Any]:
+        """Store a validated upload and schedule derivatives for images"""
+        try:
+            logger.info(f"Processing file: {upload.filename}, size: {upload.size} bytes, type: {upload.media_type}")
+            derive = self.media is not None and upload.media_type in IMAGE_TYPES
+            with upload.file:
+                # Images are at most MAX_IMAGE_BYTES, so keep them for the media pipeline
+                file_data = upload.file.read() if derive else upload.file
+                cid = await self.storage_service.upload_file(
+                    bucket_name=bucket_name,
+                    file_data=file_data,
+                    file_name=upload.filename
+                )
+
+            response = {
+                "message": "File uploaded successfully",
+                "filename": upload.filename,
+                "size": upload.size,
+                "cid": cid,
+                "bucket": bucket_name,
+                "contentType": upload.media_type
+            }
+            if upload.dimensions:
+                response["width"], response["height"] = upload.dimensions
+            if derive:
+                try:
+                    self.media.schedule(cid, file_data, upload.filename)
+                    response["derivatives"] = f"{self.router.prefix}/media/{cid}"
+                except DerivativeError as e:
+                    logger.warning(f"Not deriving {upload.filename}: {str(e)}")
+            return response
+
+        except Exception as e:
+            logger.exception(f"Upload error: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Upload failed: {str(e)}"
+            )
+
     def _register_routes(self) -> None:
         """Register all storage routes"""
         
         @self.router.post("/upload")
-        async def upload_file(file: UploadFile = File(...)) -> Dict[str, Any]:
+        async def upload_file(
+            request: Request,
+            filename: Optional[str] = Query(None),
+            x_service_key: Optional[str] = Header(None)
+        ) -> Dict[str, Any]:
             """
             Upload a file to Akave storage.
-            Supports binary files (images, videos, etc.)
+            Supports images and videos as multipart/form-data (field "file") or
+            as a raw body with the file's media type. The stream is validated as
+            it arrives and bad uploads are rejected from their first bytes.
+            Images also get a normalized display copy and thumbnails (and a
+            background-removed cutout of the hand if enabled), rendered in the
+            background and listed under /media/{cid}.
+            Once UPLOAD_TOKEN_ISSUER_KEY is set, only callers sending it as
+            X-Service-Key (the Express fallback) may use this route; browsers
+            go through /upload-tokens and /direct-upload instead.
             """
+            if settings.UPLOAD_TOKEN_ISSUER_KEY and not _service_key_matches(x_service_key):
+                return rejection_response(UploadRejected(401, "Invalid service key"))
             try:
-                # Read file as bytes
-                contents = await file.read()
-                file_size = len(contents)
+                upload = await read_upload(request, filename=filename)
+            except UploadRejected as e:
+                logger.info(f"Rejected upload: {e.detail}")
+                return rejection_response(e)
 
-                # Size validations
-                if file_size < 127:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="File size must be at least 127 bytes"
-                    )
-                if file_size > 100 * 1024 * 1024:  # 100MB
+            return await self._store_upload(upload, settings.DEFAULT_BUCKET)
+
+        @self.router.post("/upload-tokens")
+        async def create_upload_token(
+            token_request: UploadTokenRequest,
+            x_service_key: Optional[str] = Header(None)
+        ) -> Dict[str, Any]:
+            """
+            Issue a short-lived signed token for one direct upload.
+            The token fixes the bucket, the size limit (the declared size, if
+            given) and the allowed media types; the file is then sent straight
+            to /direct-upload instead of through the caller.
+            Only callers holding UPLOAD_TOKEN_ISSUER_KEY get tokens; without
+            one configured, issuing is disabled rather than open to anyone.
+            """
+            if not settings.UPLOAD_TOKEN_ISSUER_KEY:
+                raise HTTPException(
+                    status_code=503, detail="Upload tokens are disabled: UPLOAD_TOKEN_ISSUER_KEY is not set"
+                )
+            if not _service_key_matches(x_service_key):
+                raise HTTPException(status_code=401, detail="Invalid service key")
+
+            policy = UploadPolicy()
+            allowed_types = policy.allowed_types
+            max_bytes = policy.max_bytes
+            if token_request.content_type:
+                if token_request.content_type not in IMAGE_TYPES | VIDEO_TYPES:
+                    raise HTTPException(status_code=415, detail=f"Unsupported file type: {token_request.content_type}")
+                allowed_types = frozenset({token_request.content_type})
+                if token_request.content_type in IMAGE_TYPES:
+                    max_bytes = policy.max_image_bytes
+            if token_request.size is not None:
+                if token_request.size > max_bytes:
                     raise HTTPException(
-                        status_code=400,
-                        detail="File size must not exceed 100MB"
+                        status_code=413, detail=f"File size must not exceed {format_size(max_bytes)}"
                     )
+                max_bytes = token_request.size
 
-                print(f"Processing file: {file.filename}, size: {file_size} bytes")
-                
-                # Initialize Akave SDK with proper configuration
-                akave_config = AkaveConfig(host="http://localhost:4000")  # Docker container port
-                akave_sdk = AkaveSDK(akave_config)
+            filename = Path(token_request.filename).name if token_request.filename else None
+            now = time.time()
+            token = self.upload_tokens.issue(
+                settings.DEFAULT_BUCKET, max_bytes, allowed_types, filename=filename, now=now
+            )
+            return {
+                "token": token,
+                "upload_path": f"{self.router.prefix}/direct-upload",
+                "expires_at": int(now + self.upload_tokens.ttl),
+                "bucket": settings.DEFAULT_BUCKET,
+                "max_bytes": max_bytes,
+                "allowed_types": sorted(allowed_types),
+            }
 
-                async with akave_sdk as client:  # Use initialized SDK
-                    result = await client.upload_file(
-                        bucket_name="asl-training-data",
-                        file_data=contents,
-                        file_name=file.filename
-                    )
+        @self.router.api_route("/direct-upload", methods=["PUT", "POST"])
+        async def direct_upload(
+            request: Request,
+            authorization: Optional[str] = Header(None)
+        ) -> Dict[str, Any]:
+            """
+            Upload with a token from /upload-tokens (``Authorization: Bearer <token>``).
+            The body is the file itself (or multipart/form-data) and is streamed
+            through validation against the token's limits, so the file is never
+            buffered by a proxy in front of this API.
+            """
+            scheme, _, token = (authorization or "").partition(" ")
+            try:
+                if scheme.lower() != "bearer" or not token:
+                    raise InvalidUploadToken("Missing upload token")
+                grant = self.upload_tokens.verify(token.strip())
+            except InvalidUploadToken as e:
+                return rejection_response(UploadRejected(401, str(e)))
 
-                    return {
-                        "message": "File uploaded successfully",
-                        "filename": file.filename,
-                        "size": file_size,
-                        "cid": result.get("cid", ""),
-                        "bucket": "asl-training-data",
-                        "contentType": file.content_type
-                    }
+            policy = UploadPolicy(
+                allowed_types=grant.allowed_types,
+                max_bytes=grant.max_bytes,
+                max_image_bytes=min(grant.max_bytes, UploadPolicy.max_image_bytes),
+            )
+            try:
+                upload = await read_upload(request, policy, filename=grant.filename)
+            except UploadRejected as e:
+                logger.info(f"Rejected direct upload: {e.detail}")
+                return rejection_response(e)
+            # The name signed into the token wins over the one in a multipart part
+            upload.filename = grant.filename or upload.filename
+            return await self._store_upload(upload, grant.bucket)
 
-            except AkaveError as e:
-                print(f"Akave error: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Storage error: {str(e)}"
-                )
+        @self.router.get("/media/metrics")
+        async def media_metrics() -> Dict[str, Any]:
+            """Stored-bytes reduction and render/serve latency of upload derivatives"""
+            if self.media is None:
+                raise HTTPException(status_code=404, detail="Media pipeline is disabled")
+            return self.media.metrics()
+
+        @self.router.get("/media/{cid}")
+        async def get_derivatives(cid: str) -> Dict[str, Any]:
+            """Derivatives of an uploaded image and whether they are ready"""
+            if self.media is None:
+                raise HTTPException(status_code=404, detail="Media pipeline is disabled")
+            try:
+                manifest = await self.media.manifest(cid)
+            except DerivativeError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if manifest is None:
+                raise HTTPException(status_code=404, detail=f"No derivatives for {cid}")
+            return {
+                "cid": manifest.original_cid,
+                "status": manifest.status,
+                "error": manifest.error,
+                "variants": {
+                    variant: {**info, "url": f"{self.router.prefix}/media/{cid}/{variant}"}
+                    for variant, info in manifest.variants.items()
+                },
+            }
+
+        @self.router.get("/media/{cid}/{variant}")
+        async def get_derivative(cid: str, variant: str) -> FileResponse:
+            """Serve a display copy or thumbnail from the local derivative cache"""
+            if self.media is None:
+                raise HTTPException(status_code=404, detail="Media pipeline is disabled")
+            try:
+                path, info = await self.media.variant_path(cid, variant)
+            except DerivativeError as e:
+                raise HTTPException(status_code=404, detail=str(e))
             except Exception as e:
-                print(f"Upload error: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Upload failed: {str(e)}"
-                )
+                logger.exception(f"Derivative fetch error: {str(e)}")
+                raise HTTPException(status_code=502, detail=f"Failed to fetch derivative: {str(e)}")
+            return FileResponse(
+                path,
+                media_type=info["media_type"],
+                # Derivatives are addressed by content, so they never change
+                headers={"Cache-Control": "public, max-age=31536000, immutable"},
+            )
 
         @self.router.get("/buckets/{bucket_name}/files")
         async def list_files(bucket_name: str) -> Dict[str, Any]:
@@ -117,13 +339,13 @@ class StorageRouter(BaseRouter):
                     }
 
             except AkaveError as e:
-                print(f"Akave error: {str(e)}")
+                logger.error(f"Akave error: {str(e)}")
                 raise HTTPException(
                     status_code=500,
                     detail=f"Storage error: {str(e)}"
                 )
             except Exception as e:
-                print(f"Bucket creation error: {str(e)}")
+                logger.exception(f"Bucket creation error: {str(e)}")
                 raise HTTPException(
                     status_code=500,
                     detail=f"Failed to create bucket: {str(e)}"
@@ -0,0 +1,141 @@
+"""
+Response encoders for inference results.
+
+The default path renders JSON with orjson, which serializes numpy arrays
+natively instead of going through ``tolist()`` and the stdlib encoder. Clients
+that stream frames can negotiate a compact format with the Accept header:
+
+- ``application/vnd.asl.compact+json``: JSON where float arrays and landmark
+  lists are packed as ``{"dtype", "shape", "data"}`` with little-endian base64
+  data; everything else, including integer arrays, is left as plain JSON
+- ``application/msgpack``: the same structure as MessagePack with raw bytes
+
+Both take an optional ``dtype`` parameter (``float16`` by default, or
+``float32``), e.g. ``Accept: application/msgpack; dtype=float32``. Landmark
+coordinates are normalised to [0, 1], where float16 keeps an error under 3e-4.
+"""
+import base64
+import json
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+JSON = "application/json"
+COMPACT_JSON = "application/vnd.asl.compact+json"
+MSGPACK = "application/msgpack"
+PACKED_DTYPES = {"float16": "<f2", "float32": "<f4"}
+DEFAULT_PACKED_DTYPE = "float16"
+# Fields whose nested number lists are coordinates, and so safe to pack lossily
+PACKED_FIELDS = {"landmarks"}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(content: Any) -> bytes:
+    """Encode JSON, with numpy arrays and scalars, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY, default=_json_default)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_json_default
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by ``encode_json``"""
+
+    def render(self, content: Any) -> bytes:
+        return encode_json(content)
+
+
+def pack_array(array: Any, dtype: str = DEFAULT_PACKED_DTYPE, binary: bool = False) -> Dict[str, Any]:
+    """Pack a numeric array as dtype, shape and little-endian bytes (base64 unless binary)"""
+    packed = np.ascontiguousarray(array, dtype=PACKED_DTYPES[dtype])
+    data = packed.tobytes()
+    return {
+        "dtype": dtype,
+        "shape": list(packed.shape),
+        "data": data if binary else base64.b64encode(data).decode("ascii"),
+    }
+
+
+def unpack_array(packed: Dict[str, Any]) -> np.ndarray:
+    """Inverse of ``pack_array``"""
+    data = packed["data"]
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+    return np.frombuffer(data, dtype=PACKED_DTYPES[packed["dtype"]]).reshape(packed["shape"])
+
+
+def _pack_arrays(content: Any, dtype: str, binary: bool, field: Optional[str] = None) -> Any:
+    if isinstance(content, dict):
+        return {key: _pack_arrays(value, dtype, binary, key) for key, value in content.items()}
+    if isinstance(content, (list, tuple)):
+        # Landmark lists (e.g. from tolist()) are packed too; other lists keep their exact values
+        if field in PACKED_FIELDS and content:
+            try:
+                return pack_array(content, dtype, binary)
+            except (TypeError, ValueError):
+                pass
+        return [_pack_arrays(value, dtype, binary) for value in content]
+    if isinstance(content, np.ndarray):
+        if content.dtype.kind == "f":
+            return pack_array(content, dtype, binary)
+        # msgpack has no ndarray support; the JSON encoder handles them natively
+        return content.tolist() if binary else content
+    if isinstance(content, np.generic):
+        return content.item()
+    return content
+
+
+def negotiate(accept: Optional[str]) -> Tuple[str, str]:
+    """Pick (media type, packed dtype) from an Accept header, preferring higher q"""
+    candidates = []
+    for position, media_range in enumerate((accept or "").split(",")):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        options = dict(param.split("=", 1) for param in params if "=" in param)
+        try:
+            quality = float(options.get("q", 1))
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, position, media_type.lower(), options.get("dtype")))
+
+    for _, _, media_type, dtype in sorted(candidates):
+        if media_type in ("application/msgpack", "application/x-msgpack") and msgpack is not None:
+            media_type = MSGPACK
+        elif media_type != COMPACT_JSON:
+            if media_type in (JSON, "application/*", "*/*"):
+                return JSON, DEFAULT_PACKED_DTYPE
+            continue
+        return media_type, dtype if dtype in PACKED_DTYPES else DEFAULT_PACKED_DTYPE
+    return JSON, DEFAULT_PACKED_DTYPE
+
+
+def render(content: Any, accept: Optional[str] = None, status_code: int = 200) -> Response:
+    """Encode an inference result in the format the client asked for"""
+    media_type, dtype = negotiate(accept)
+    headers = {"Vary": "Accept"}
+    if media_type == MSGPACK:
+        body = msgpack.packb(_pack_arrays(content, dtype, binary=True), use_bin_type=True)
+    elif media_type == COMPACT_JSON:
+        body = encode_json(_pack_arrays(content, dtype, binary=False))
+    else:
+        body = encode_json(content)
+    return Response(body, status_code=status_code, media_type=media_type, headers=headers)
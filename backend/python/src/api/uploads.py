@@ -0,0 +1,175 @@
+"""
+Streaming upload reader: validates the file while the request body arrives.
+
+``read_upload`` parses multipart/form-data (or a raw body whose media type is
+the file's) straight from ``request.stream()``. Each chunk of the file field
+goes through an ``UploadValidator`` before it is spooled, so a bad upload
+stops being read at the chunk that gave it away. ``rejection_response``
+closes the connection, so the client cannot keep streaming the rest of the
+body into a keep-alive socket.
+"""
+from dataclasses import dataclass
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Dict, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from ..services.storage.validation import UploadPolicy, UploadRejected, UploadValidator
+
+try:
+    import python_multipart as multipart
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # pragma: no cover - older package name
+    import multipart
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import parse_options_header
+
+# Multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 16 * 1024
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+
+@dataclass
+class ReceivedUpload:
+    filename: str
+    media_type: str
+    size: int
+    dimensions: Optional[Tuple[int, int]]
+    file: BinaryIO
+
+
+class _MultipartFileReader:
+    """python-multipart callbacks that route one file field into the validator and spool"""
+
+    def __init__(self, field_name: str, validator: UploadValidator, spool: BinaryIO):
+        self.field_name = field_name
+        self.validator = validator
+        self.spool = spool
+        self.filename: Optional[str] = None
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+        self._seen = False
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+        }
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._in_file = False
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        if name == self.field_name and b"filename" in options:
+            if self._seen:
+                raise UploadRejected(400, "Only one file may be uploaded per request")
+            self._seen = self._in_file = True
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            chunk = data[start:end]
+            self.validator.feed(chunk)
+            self.spool.write(chunk)
+
+
+async def read_upload(
+    request: Request,
+    policy: Optional[UploadPolicy] = None,
+    field_name: str = "file",
+    filename: Optional[str] = None,
+    spool: Optional[BinaryIO] = None
+) -> ReceivedUpload:
+    """
+    Read and validate the uploaded file from the request stream.
+
+    Args:
+        request (Request): Incoming request; multipart/form-data or a raw media body
+        policy (Optional[UploadPolicy]): Limits and allowed types
+        field_name (str): Multipart field holding the file
+        filename (Optional[str]): Name for raw-body uploads
+        spool (Optional[BinaryIO]): Where to write the file, e.g. a named temp
+            file for readers that need a path; closed if the upload is rejected
+
+    Returns:
+        ReceivedUpload: Validated file spooled to memory or disk, rewound
+
+    Raises:
+        UploadRejected: As soon as the stream fails validation
+    """
+    validator = UploadValidator(policy or UploadPolicy())
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    is_multipart = content_type == b"multipart/form-data"
+
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            raise UploadRejected(400, "Invalid Content-Length")
+        validator.check_declared_length(declared, MULTIPART_OVERHEAD if is_multipart else 0)
+
+    if spool is None:
+        spool = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    try:
+        if is_multipart:
+            boundary = options.get(b"boundary")
+            if not boundary:
+                raise UploadRejected(400, "Missing multipart boundary")
+            reader = _MultipartFileReader(field_name, validator, spool)
+            parser = multipart.MultipartParser(boundary, reader.callbacks())
+            async for chunk in request.stream():
+                parser.write(chunk)
+            parser.finalize()
+            if reader.filename is None:
+                raise UploadRejected(400, "No file provided")
+            filename = reader.filename
+        else:
+            async for chunk in request.stream():
+                validator.feed(chunk)
+                spool.write(chunk)
+        validator.finish()
+    except UploadRejected:
+        spool.close()
+        raise
+    except FormParserError as e:
+        spool.close()
+        raise UploadRejected(400, f"Malformed multipart body: {str(e)}")
+
+    spool.seek(0)
+    return ReceivedUpload(
+        filename=filename or "upload",
+        media_type=validator.media_type,
+        size=validator.size,
+        dimensions=validator.dimensions,
+        file=spool,
+    )
+
+
+def rejection_response(error: UploadRejected) -> JSONResponse:
+    """Error response that also closes the connection instead of draining the body"""
+    return JSONResponse(
+        status_code=error.status_code,
+        content={"detail": error.detail},
+        headers={"Connection": "close"},
+    )
@@ -0,0 +1,213 @@
+"""
+Admission control and load shedding per route class.
+
+Each route class (uploads, listings, inference) gets an ``AdmissionLimiter``:
+at most ``limit`` requests run at once and at most ``max_queue`` wait, in
+arrival order, for up to ``timeout`` seconds. A request that cannot be
+admitted in time is answered straight away with 503 and ``Retry-After``
+instead of joining an ever-growing backlog, so admitted requests keep their
+normal latency under overload. A request is also shed on arrival when the
+queue ahead of it, at the observed service time, would outlast its timeout.
+
+Limits are per server process; with N pre-forked workers the total is N
+times the configured values.
+"""
+import asyncio
+import json
+import math
+import re
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Pattern, Tuple
+from .metrics import RollingLatency
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; ``reason`` is queue_full, expected_wait or timeout"""
+
+    def __init__(self, route_class: str, reason: str, retry_after: int):
+        super().__init__(f"{route_class} overloaded ({reason})")
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded FIFO wait queue and a per-request deadline"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        """
+        Args:
+            name (str): Route class, used in responses and metrics
+            limit (int): Requests allowed to run at once
+            max_queue (int): Requests allowed to wait for a slot
+            timeout (float): Seconds a request may wait before it is shed
+        """
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.admitted = 0
+        self.shed: Counter = Counter()
+        self.wait = RollingLatency()
+        self.service = RollingLatency()
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait(self, position: int) -> float:
+        """Seconds until the request at ``position`` in the queue gets a slot, from the mean service time"""
+        mean = self.service.mean
+        if mean is None:
+            return 0.0
+        return (position + 1) * mean / self.limit
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.expected_wait(self.queued)))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.shed[reason] += 1
+        return AdmissionRejected(self.name, reason, self.retry_after())
+
+    async def acquire(self) -> None:
+        """
+        Wait for a slot.
+
+        Raises:
+            AdmissionRejected: If the queue is full or no slot frees up within the timeout
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            self.wait.record(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+        if self.expected_wait(len(self._waiters)) > self.timeout:
+            raise self._reject("expected_wait")
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        timer = loop.call_later(self.timeout, self._expire, waiter)
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the client went away
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self.release()
+            raise
+        finally:
+            timer.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        self.admitted += 1
+        self.wait.record(time.perf_counter() - started)
+
+    def _expire(self, waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_exception(self._reject("timeout"))
+
+    def release(self, elapsed: Optional[float] = None) -> None:
+        """Free a slot, handing it straight to the longest-waiting request if any"""
+        if elapsed is not None:
+            self.service.record(elapsed)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # slot passes over; active is unchanged
+                return
+        self.active -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "timeout": self.timeout,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "shed_total": sum(self.shed.values()),
+            "wait": self.wait.snapshot(),
+            "service": self.service.snapshot(),
+        }
+
+
+class AdmissionControl:
+    """Route classes and the rules mapping requests to them"""
+
+    def __init__(self, limiters: Iterable[AdmissionLimiter], routes: Iterable[Tuple[str, str, str]]):
+        """
+        Args:
+            limiters (Iterable[AdmissionLimiter]): One per route class
+            routes (Iterable[Tuple[str, str, str]]): (method or "*", path regex, route class);
+                the first match wins and unmatched requests are not limited
+        """
+        self.limiters = {limiter.name: limiter for limiter in limiters}
+        self.routes: List[Tuple[str, Pattern, AdmissionLimiter]] = [
+            (method, re.compile(pattern), self.limiters[name]) for method, pattern, name in routes
+        ]
+
+    def classify(self, method: str, path: str) -> Optional[AdmissionLimiter]:
+        for route_method, pattern, limiter in self.routes:
+            if route_method in ("*", method) and pattern.fullmatch(path):
+                return limiter
+        return None
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.snapshot() for name, limiter in self.limiters.items()}
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that admits, queues or sheds each request by its route class"""
+
+    def __init__(self, app, control: AdmissionControl):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.control.classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as e:
+            await self._reject(scope, send, e)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
+
+    @staticmethod
+    async def _reject(scope, send, error: AdmissionRejected) -> None:
+        body = json.dumps({
+            "detail": f"Server busy; retry in {error.retry_after}s",
+            "route_class": error.route_class,
+            "reason": error.reason,
+        }).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(error.retry_after).encode()),
+        ]
+        if any(
+            name == b"transfer-encoding" or (name == b"content-length" and value != b"0")
+            for name, value in scope.get("headers", [])
+        ):
+            # Do not read an unadmitted upload body just to keep the connection alive
+            headers.append((b"connection", b"close"))
+        await send({"type": "http.response.start", "status": 503, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -1,18 +1,61 @@
 from functools import lru_cache
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 
+# backend/python; relative data directories in the settings are resolved against it
+APP_DIR = Path(__file__).parent.parent.parent
+
 # Load .env file once at startup
-load_dotenv(Path(__file__).parent.parent.parent / ".env")
+load_dotenv(APP_DIR / ".env")
 
 class Settings(BaseSettings):
     NODE_ADDRESS: str = "connect.akave.ai:5500"
     DEFAULT_BUCKET: str = "asl-training-data"
     AUTH_PRIVATE_KEY: str
+    ASL_MODEL_PATH: str = "models/asl_coords_model"
+    ASL_MODEL_VERSIONS: str = ""
+    ASL_SHADOW_WORKERS: int = 1
+    ASL_SHADOW_QUEUE: int = 16
+    VIDEO_WORKERS: int = 1
+    VIDEO_BATCH_SIZE: int = 8
+    VIDEO_SAMPLE_STRIDE: int = 5
+    LOG_LEVEL: str = "INFO"
+    SLOW_REQUEST_MS: float = 1000.0
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_TOKEN: Optional[str] = None
+    PROFILE_DIR: str = "profiles"
+    MEDIA_PIPELINE: bool = True
+    MEDIA_FORMAT: str = "webp"
+    MEDIA_QUALITY: int = 80
+    MEDIA_MAX_EDGE: int = 2048
+    MEDIA_THUMBNAIL_SIZES: str = "128,320"
+    MEDIA_WORKERS: int = 2
+    MEDIA_BUCKET: str = "asl-media"
+    MEDIA_CACHE_DIR: str = "media-cache"
+    MEDIA_CACHE_BYTES: int = 2 * 1024 * 1024 * 1024
+    BACKGROUND_REMOVAL: bool = False
+    BACKGROUND_MODEL: str = "u2netp"
+    BACKGROUND_PADDING: float = 0.3
+    BACKGROUND_BATCH_SIZE: int = 8
+    BACKGROUND_WORKERS: int = 1
+    UPLOAD_TOKEN_SECRET: Optional[str] = None
+    UPLOAD_TOKEN_TTL: int = 300
+    UPLOAD_TOKEN_ISSUER_KEY: Optional[str] = None
+    ADMISSION_CONTROL: bool = True
+    ADMISSION_UPLOAD_LIMIT: int = 8
+    ADMISSION_UPLOAD_QUEUE: int = 16
+    ADMISSION_UPLOAD_TIMEOUT: float = 5.0
+    ADMISSION_LISTING_LIMIT: int = 16
+    ADMISSION_LISTING_QUEUE: int = 64
+    ADMISSION_LISTING_TIMEOUT: float = 1.0
+    ADMISSION_INFERENCE_LIMIT: int = 2
+    ADMISSION_INFERENCE_QUEUE: int = 16
+    ADMISSION_INFERENCE_TIMEOUT: float = 1.0
     
     class Config:
-        env_file = Path(__file__).parent.parent.parent / ".env"
+        env_file = APP_DIR / ".env"
         env_file_encoding = 'utf-8'
 
 @lru_cache()
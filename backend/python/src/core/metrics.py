@@ -0,0 +1,58 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+
+class RollingLatency:
+    """Latency samples over a sliding window plus lifetime success/error counts"""
+
+    def __init__(self, window: int = 256):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+
+    def record_error(self) -> None:
+        self.errors += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def mean(self) -> Optional[float]:
+        return sum(self.samples) / len(self.samples) if self.samples else None
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self.quantile(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self.quantile(0.95)
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Record the duration of the block, or an error if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record_error()
+            raise
+        self.record(time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": self.mean,
+            "p50": self.p50,
+            "p95": self.p95,
+        }
@@ -0,0 +1,265 @@
+"""
+Per-request tracing and on-demand profiling.
+
+``TracingMiddleware`` times every HTTP request and exposes a ``RequestTrace``
+through a context variable. Code that calls out to another system wraps the
+call in ``span("akave")`` (or decorates it with ``@traced("akave")``), and
+the elapsed time is added to the current request's trace. Outside a request
+a span costs one ContextVar lookup.
+
+Requests slower than ``slow_threshold`` produce one structured log record
+with wall time and time per external category. A sampled fraction of
+requests, or any request sending the debug header with the configured token,
+is profiled by a stack sampler. The profile is written in collapsed-stack
+format (``frame;frame;frame count``), which flamegraph.pl, speedscope and
+inferno read directly.
+"""
+import functools
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Client-supplied request IDs end up in headers and file names
+_REQUEST_ID_PATTERN = re.compile(rb"^[A-Za-z0-9_.-]{1,64}$")
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """Timing accumulated for one request"""
+
+    __slots__ = ("request_id", "method", "path", "started", "spans", "calls")
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def add(self, category: str, elapsed: float) -> None:
+        self.spans[category] = self.spans.get(category, 0.0) + elapsed
+        self.calls[category] = self.calls.get(category, 0) + 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+class span:
+    """
+    Add the time spent in a block to the current request under ``category``.
+
+    Works with ``with`` and ``async with``. Concurrent spans inside one request
+    are summed, so span totals can exceed the request's wall time.
+    """
+
+    __slots__ = ("category", "trace", "started")
+
+    def __init__(self, category: str):
+        self.category = category
+
+    def __enter__(self):
+        self.trace = _current_trace.get()
+        if self.trace is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.trace is not None:
+            self.trace.add(self.category, time.perf_counter() - self.started)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return self.__exit__(exc_type, exc_val, exc_tb)
+
+
+def traced(category: str) -> Callable:
+    """Decorator form of ``span`` for coroutine functions"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(category):
+                return await func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of all threads at a fixed interval while running.
+
+    The event loop interleaves requests, so samples from the loop thread can
+    include other requests' frames; stacks are rooted at the thread name so
+    executor work (inference, uploads) shows up separately.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack: List[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack (folded) format"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware recording wall time and external-call time per request.
+
+    Adds ``X-Request-ID`` and a ``Server-Timing`` header (total plus one entry
+    per span category) to every response.
+    """
+
+    def __init__(
+        self,
+        app,
+        slow_threshold: float = 1.0,
+        sample_rate: float = 0.0,
+        profile_token: Optional[str] = None,
+        profile_dir: Union[str, Path] = "profiles",
+        profile_interval: float = 0.005,
+        debug_header: str = "x-debug-profile"
+    ):
+        """
+        Args:
+            app: ASGI application to wrap
+            slow_threshold (float): Seconds above which a request is logged as slow
+            sample_rate (float): Fraction of requests to profile (0 disables sampling)
+            profile_token (Optional[str]): Value of the debug header that forces
+                profiling of a request; the header is ignored when unset
+            profile_dir (Union[str, Path]): Where collapsed-stack profiles are written
+            profile_interval (float): Seconds between stack samples while profiling
+            debug_header (str): Request header carrying the profile token
+        """
+        self.app = app
+        self.slow_threshold = slow_threshold
+        self.sample_rate = sample_rate
+        self.profile_token = profile_token.encode() if profile_token else None
+        self.profile_dir = Path(profile_dir)
+        self.profile_interval = profile_interval
+        self.debug_header = debug_header.lower().encode()
+
+    def _should_profile(self, headers: List) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self.profile_token is not None:
+            for name, value in headers:
+                if name == self.debug_header:
+                    return hmac.compare_digest(value, self.profile_token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = scope.get("headers", [])
+        request_id = None
+        for name, value in headers:
+            if name == b"x-request-id":
+                if _REQUEST_ID_PATTERN.match(value) and not value.startswith(b"."):
+                    request_id = value.decode("ascii")
+                break
+        trace = RequestTrace(request_id or os.urandom(8).hex(), scope["method"], scope["path"])
+        sampler = StackSampler(self.profile_interval).start() if self._should_profile(headers) else None
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = [f"app;dur={trace.elapsed * 1000:.1f}"]
+                timing += [f"{name};dur={value * 1000:.1f}" for name, value in trace.spans.items()]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", trace.request_id.encode("latin-1")),
+                    (b"server-timing", ", ".join(timing).encode("latin-1")),
+                ]
+            await send(message)
+
+        token = _current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            elapsed = trace.elapsed
+            profile_path = self._write_profile(trace, sampler) if sampler is not None else None
+            if elapsed >= self.slow_threshold or profile_path is not None:
+                self._log(trace, elapsed, status, profile_path)
+
+    def _write_profile(self, trace: RequestTrace, sampler: StackSampler) -> Optional[str]:
+        sampler.stop()
+        try:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            slug = trace.path.strip("/").replace("/", "_")[:60] or "root"
+            path = self.profile_dir / f"{int(time.time())}-{trace.method}-{slug}-{trace.request_id}.folded"
+            path.write_text(sampler.collapsed())
+            return str(path)
+        except OSError as e:
+            logger.warning(f"Could not write profile for request {trace.request_id}: {str(e)}")
+            return None
+
+    def _log(self, trace: RequestTrace, elapsed: float, status: int, profile_path: Optional[str]) -> None:
+        record: Dict[str, Any] = {
+            "event": "slow_request" if elapsed >= self.slow_threshold else "profiled_request",
+            "request_id": trace.request_id,
+            "method": trace.method,
+            "path": trace.path,
+            "status": status,
+            "wall_ms": round(elapsed * 1000, 1),
+            "external_ms": {name: round(value * 1000, 1) for name, value in trace.spans.items()},
+            "external_calls": trace.calls,
+        }
+        if profile_path:
+            record["profile"] = profile_path
+        level = logging.WARNING if elapsed >= self.slow_threshold else logging.INFO
+        logger.log(level, json.dumps(record), extra={"trace": record})
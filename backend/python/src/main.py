@@ -1,8 +1,40 @@
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .api.routes.storage import storage_router
+from .api.routes.ml import ml_router
+from .api.serialization import FastJSONResponse
+from .core.admission import AdmissionControl, AdmissionLimiter, AdmissionMiddleware
+from .core.config import settings
+from .core.tracing import TracingMiddleware
 
-app = FastAPI()
+logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+app = FastAPI(default_response_class=FastJSONResponse)
+
+# Concurrency limits and bounded wait queues per route class; the first matching rule wins
+admission = AdmissionControl(
+    [
+        AdmissionLimiter("upload", settings.ADMISSION_UPLOAD_LIMIT,
+                         settings.ADMISSION_UPLOAD_QUEUE, settings.ADMISSION_UPLOAD_TIMEOUT),
+        AdmissionLimiter("listing", settings.ADMISSION_LISTING_LIMIT,
+                         settings.ADMISSION_LISTING_QUEUE, settings.ADMISSION_LISTING_TIMEOUT),
+        AdmissionLimiter("inference", settings.ADMISSION_INFERENCE_LIMIT,
+                         settings.ADMISSION_INFERENCE_QUEUE, settings.ADMISSION_INFERENCE_TIMEOUT),
+    ],
+    [
+        ("POST", r"/api/storage/upload", "upload"),
+        ("*", r"/api/storage/direct-upload", "upload"),
+        # Clips run in the video pipeline's own workers, not the live-frame executor
+        ("POST", r"/api/ml/video", "upload"),
+        ("POST", r"/api/ml/.+", "inference"),
+        ("GET", r"/api/storage/buckets/[^/]+/files", "listing"),
+        ("GET", r"/api/storage/media/.+", "listing"),
+    ],
+)
+if settings.ADMISSION_CONTROL:
+    # Innermost, so shed responses still get CORS and tracing headers
+    app.add_middleware(AdmissionMiddleware, control=admission)
 
 # Configure CORS
 app.add_middleware(
@@ -16,12 +48,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
+)
+
+# Added last so it wraps everything else, including CORS
+app.add_middleware(
+    TracingMiddleware,
+    slow_threshold=settings.SLOW_REQUEST_MS / 1000,
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+    profile_token=settings.PROFILE_TOKEN,
+    profile_dir=settings.PROFILE_DIR,
 )
 
 # Mount routes
-app.include_router(health_router)
 app.include_router(storage_router)
+app.include_router(ml_router)
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/metrics/admission")
+async def admission_metrics():
+    """Active requests, queue depth, shed counts and wait/service latency per route class"""
+    return admission.metrics()
\ No newline at end of file
@@ -1,27 +1,230 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Set, Tuple
 import aiohttp
+import asyncio
+import contextvars
 import json
+import random
+from ...core.tracing import traced
+
+
+class LilypadError(Exception):
+    """Custom exception for Lilypad job errors"""
+    pass
+
 
 class LilypadService:
-    def __init__(self, api_key: str):
+    """
+    Long-lived Lilypad client that packs many inference inputs into one job.
+
+    Callers use ``infer``; inputs are queued and a dispatcher packs whatever is
+    waiting (up to ``max_batch_size``, waiting at most ``max_batch_delay`` to
+    fill) into a single job once a job slot is free. While every slot is busy
+    inputs keep accumulating, so batches grow with load. Each job is polled with
+    jittered, backed-off intervals and its outputs are fanned back out to the
+    waiting callers in input order.
+
+    Job contract: ``POST /jobs`` returns ``{"id": ...}``; ``GET /jobs/{id}``
+    returns ``{"status": "pending" | "running" | "completed" | "failed", ...}``
+    with ``result.outputs`` (one per input) on completion and ``error`` on
+    failure.
+    """
+
+    TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.lilypad.network",
+        max_batch_size: int = 32,
+        max_batch_delay: float = 0.05,
+        max_concurrent_jobs: int = 4,
+        poll_interval: float = 0.5,
+        max_poll_interval: float = 5.0,
+        poll_jitter: float = 0.2,
+        job_timeout: float = 300.0
+    ):
         self.api_key = api_key
-        self.base_url = "https://api.lilypad.network"
-
-    async def submit_job(self, model_input: Dict[str, Any]) -> str:
-        async with aiohttp.ClientSession() as session:
-            job_config = {
-                "module": "asl-detection",
-                "input": model_input,
-                "resources": {
-                    "gpu": True,
-                    "cpu": 1,
-                    "memory": "4Gi"
-                }
+        self.base_url = base_url
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.poll_jitter = poll_jitter
+        self.job_timeout = job_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._job_slots = asyncio.Semaphore(max_concurrent_jobs)
+        self._jobs: Set[asyncio.Task] = set()
+        self._stats = {"jobs": 0, "failed_jobs": 0, "items": 0, "polls": 0, "running_jobs": 0}
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                connector=aiohttp.TCPConnector(limit=self.max_concurrent_jobs * 2)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Stop dispatching, fail queued callers and close the session"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for task in list(self._jobs):
+            task.cancel()
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(LilypadError("Lilypad client closed"))
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        session = await self._get_session()
+        try:
+            async with session.request(method, endpoint, **kwargs) as response:
+                text = await response.text()
+                if not response.ok:
+                    raise LilypadError(f"API request failed ({response.status}): {text}")
+                return json.loads(text)
+        except aiohttp.ClientError as e:
+            raise LilypadError(f"Network error: {str(e)}")
+
+    async def submit_job(self, model_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Submit a single job and return the submit response"""
+        job_config = {
+            "module": "asl-detection",
+            "input": model_input,
+            "resources": {
+                "gpu": True,
+                "cpu": 1,
+                "memory": "4Gi"
             }
-            
-            async with session.post(
-                f"{self.base_url}/jobs",
-                json=job_config,
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            ) as response:
-                return await response.json()
\ No newline at end of file
+        }
+        return await self._request("POST", "/jobs", json=job_config)
+
+    async def get_job(self, job_id: str) -> Dict[str, Any]:
+        return await self._request("GET", f"/jobs/{job_id}")
+
+    async def wait_for_job(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Poll a job until it finishes, with jittered exponential backoff between polls"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.job_timeout)
+        interval = self.poll_interval
+        while True:
+            job = await self.get_job(job_id)
+            self._stats["polls"] += 1
+            status = job.get("status")
+            if status == "completed":
+                return job
+            if status in self.TERMINAL_STATUSES:
+                raise LilypadError(f"Job {job_id} {status}: {job.get('error', 'unknown error')}")
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise LilypadError(f"Job {job_id} timed out after {timeout or self.job_timeout}s")
+            # Jitter spreads polls from concurrent jobs so they do not arrive in lockstep
+            delay = interval * (1 + random.uniform(-self.poll_jitter, self.poll_jitter))
+            await asyncio.sleep(min(delay, remaining))
+            interval = min(self.max_poll_interval, interval * 1.5)
+
+    @traced("lilypad")
+    async def infer(self, model_input: Dict[str, Any]) -> Any:
+        """Queue one inference input and wait for its output from a batched job"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._dispatcher is None or self._dispatcher.done():
+            # A fresh context keeps the long-lived dispatcher and its jobs out of
+            # the trace of whichever request happened to start it
+            self._dispatcher = asyncio.create_task(self._dispatch_loop(), context=contextvars.Context())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((model_input, future))
+        return await future
+
+    async def infer_many(self, model_inputs: List[Dict[str, Any]]) -> List[Any]:
+        return await asyncio.gather(*[self.infer(model_input) for model_input in model_inputs])
+
+    async def _dispatch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            holding_slot = False
+            try:
+                # Inputs that arrive while we wait for a slot join this batch
+                await self._job_slots.acquire()
+                holding_slot = True
+                deadline = loop.time() + self.max_batch_delay
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Inputs already taken off the queue are invisible to close(); fail them here
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(LilypadError("Lilypad client closed"))
+                if holding_slot:
+                    self._job_slots.release()
+                raise
+            batch = [(model_input, future) for model_input, future in batch if not future.done()]
+            if not batch:
+                self._job_slots.release()
+                continue
+            task = asyncio.create_task(self._run_batch(batch))
+            self._jobs.add(task)
+            task.add_done_callback(self._jobs.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        self._stats["jobs"] += 1
+        self._stats["items"] += len(batch)
+        self._stats["running_jobs"] += 1
+        try:
+            submitted = await self.submit_job({"batch": [model_input for model_input, _ in batch]})
+            job = await self.wait_for_job(submitted["id"])
+            outputs = (job.get("result") or {}).get("outputs", [])
+            if len(outputs) != len(batch):
+                raise LilypadError(
+                    f"Job {submitted['id']} returned {len(outputs)} outputs for {len(batch)} inputs"
+                )
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+        except BaseException as e:
+            self._stats["failed_jobs"] += 1
+            error = e if isinstance(e, Exception) else LilypadError("Job cancelled")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self._stats["running_jobs"] -= 1
+            self._job_slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Job, item and poll counters plus current queue depth"""
+        queued = self._queue.qsize() if self._queue is not None else 0
+        jobs = self._stats["jobs"]
+        return {
+            **self._stats,
+            "queued": queued,
+            "mean_batch_size": self._stats["items"] / jobs if jobs else 0.0,
+        }
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from ...core.metrics import RollingLatency
+from ...core.tracing import span
+from .lilypad import LilypadService
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+class InferenceError(Exception):
+    """Raised when a backend ran a request but could not produce a prediction"""
+    pass
+
+
+class InferenceBackend(ABC):
+    """
+    A place inference can run, with live latency and queue-depth estimates.
+
+    ``capacity`` is how many requests the backend works on at once; requests
+    beyond it queue. The expected completion time for a new request is the
+    service-time estimate scaled by the backlog ahead of it.
+    """
+
+    def __init__(self, name: str, capacity: int, prior_latency: float):
+        """
+        Args:
+            name (str): Backend name used in routing decisions and metrics
+            capacity (int): Requests served concurrently before new ones queue
+            prior_latency (float): Service-time estimate used until samples exist
+        """
+        self.name = name
+        self.capacity = capacity
+        self.prior_latency = prior_latency
+        self.latency = RollingLatency()
+        self.in_flight = 0
+
+    @abstractmethod
+    async def _infer(self, payload: Any) -> Any:
+        pass
+
+    async def infer(self, payload: Any) -> Any:
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            with span("inference"):
+                result = await self._infer(payload)
+        except Exception:
+            self.latency.record_error()
+            raise
+        finally:
+            self.in_flight -= 1
+        self.latency.record(time.perf_counter() - started)
+        return result
+
+    def service_time(self) -> float:
+        """Typical time to serve one request once it has a slot"""
+        return self.latency.p50 or self.prior_latency
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting for a slot"""
+        return max(0, self.in_flight - self.capacity)
+
+    def expected_completion(self) -> float:
+        """Estimated seconds until a request submitted now would finish"""
+        # Requests ahead of us that must finish before a slot frees up
+        backlog = max(0, self.in_flight - self.capacity + 1)
+        return self.service_time() * (1 + backlog / self.capacity)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "capacity": self.capacity,
+            "queue_depth": self.queue_depth,
+            "service_time": self.service_time(),
+            "expected_completion": self.expected_completion(),
+            "latency": self.latency.snapshot(),
+        }
+
+
+class LocalBackend(InferenceBackend):
+    """Runs ``ASLService.process_image`` in a bounded thread pool on this host"""
+
+    def __init__(self, asl_service, workers: int = 2, prior_latency: float = 0.05, name: str = "local"):
+        super().__init__(name, workers, prior_latency)
+        self.asl_service = asl_service
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asl-infer")
+        # Time spent in the worker, excluding queueing; end-to-end latency includes the queue
+        self.service = RollingLatency()
+
+    def _process(self, image_data: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        # ASLService reports failures as {"error": ...} rather than raising
+        result = self.asl_service.process_image(image_data)
+        if isinstance(result, dict) and "error" in result:
+            self.service.record_error()
+            raise InferenceError(f"Local inference failed: {result['error']}")
+        self.service.record(time.perf_counter() - started)
+        return result
+
+    async def _infer(self, payload: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._process, payload)
+
+    def service_time(self) -> float:
+        return self.service.p50 or self.prior_latency
+
+
+class LilypadBackend(InferenceBackend):
+    """Runs inference remotely through batched Lilypad jobs"""
+
+    def __init__(self, lilypad: LilypadService, prior_latency: float = 2.0, name: str = "lilypad"):
+        # A slot is one input inside a concurrently running batched job
+        super().__init__(name, lilypad.max_concurrent_jobs * lilypad.max_batch_size, prior_latency)
+        self.lilypad = lilypad
+
+    async def _infer(self, payload: Any) -> Any:
+        return await self.lilypad.infer({"image": payload})
+
+
+@dataclass
+class RoutingDecision:
+    backend: str
+    kind: str
+    expected_completion: Dict[str, float]
+
+
+class RoutingPolicy(ABC):
+    """Chooses a backend for each request from the backends' live estimates"""
+
+    @abstractmethod
+    def choose(self, kind: str, backends: Dict[str, InferenceBackend]) -> str:
+        pass
+
+
+class LatencyAwarePolicy(RoutingPolicy):
+    """
+    Interactive requests go to the backend with the lowest expected completion
+    time. Bulk/offline requests go to the remote backend once the local queue
+    exceeds ``offload_threshold``, and stay local otherwise.
+    """
+
+    def __init__(self, local: str = "local", remote: str = "lilypad", offload_threshold: int = 4):
+        self.local = local
+        self.remote = remote
+        self.offload_threshold = offload_threshold
+
+    def choose(self, kind: str, backends: Dict[str, InferenceBackend]) -> str:
+        if kind == BULK and self.local in backends and self.remote in backends:
+            if backends[self.local].queue_depth >= self.offload_threshold:
+                return self.remote
+            return self.local
+        return min(backends, key=lambda name: backends[name].expected_completion())
+
+
+class InferenceScheduler:
+    """
+    Routes ASL inference between backends (local workers and Lilypad) through
+    a pluggable policy, and records every decision for observability.
+    """
+
+    def __init__(
+        self,
+        backends: List[InferenceBackend],
+        policy: Optional[RoutingPolicy] = None,
+        fallback: bool = True
+    ):
+        """
+        Args:
+            backends (List[InferenceBackend]): Candidate backends
+            policy (Optional[RoutingPolicy]): Routing policy, LatencyAwarePolicy by default
+            fallback (bool): Retry once on the next-best backend when the chosen one fails
+        """
+        self.backends: Dict[str, InferenceBackend] = {b.name: b for b in backends}
+        self.policy = policy or LatencyAwarePolicy()
+        self.fallback = fallback
+        self.decisions: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.fallbacks = 0
+        self.last_decision: Optional[RoutingDecision] = None
+
+    async def submit(self, payload: Any, kind: str = INTERACTIVE) -> Any:
+        """Run one inference request on the backend chosen by the policy"""
+        chosen = self.policy.choose(kind, self.backends)
+        self.decisions[kind][chosen] += 1
+        self.last_decision = RoutingDecision(
+            backend=chosen,
+            kind=kind,
+            expected_completion={n: b.expected_completion() for n, b in self.backends.items()}
+        )
+        logger.debug(f"Routing {kind} request to {chosen}: {self.last_decision.expected_completion}")
+        try:
+            return await self.backends[chosen].infer(payload)
+        except Exception as e:
+            others = {n: b for n, b in self.backends.items() if n != chosen}
+            if not self.fallback or not others:
+                raise
+            retry_on = min(others, key=lambda n: others[n].expected_completion())
+            logger.warning(f"Inference on {chosen} failed ({str(e)}), falling back to {retry_on}")
+            self.fallbacks += 1
+            return await self.backends[retry_on].infer(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        """Routing counts per request kind plus live backend estimates"""
+        return {
+            "decisions": {kind: dict(counts) for kind, counts in self.decisions.items()},
+            "fallbacks": self.fallbacks,
+            "backends": {name: backend.snapshot() for name, backend in self.backends.items()},
+        }
@@ -2,6 +2,7 @@
 import base64
 import os
 import string
+from functools import lru_cache
 
 import cv2
 import numpy as np
@@ -13,16 +14,21 @@ from asl.models.coords_model import CoordsModel
 from asl.pipeline import ASLPipeline
 
 
+@lru_cache(maxsize=None)
+def load_model(model_path):
+    """Load model weights once per process; every ASLService shares them read-only"""
+    # Check if model exists
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found at {model_path}")
+    return CoordsModel.load(model_path)
+
+
 class ASLService:
     def __init__(self, model_path):
-        # Check if model exists
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model not found at {model_path}")
-
-        # Initialize components
+        # Initialize components (the detector is per instance, the model is shared)
+        self.model = load_model(model_path)
         self.detector = HandDetector(min_detection_confidence=0.7)
         self.preprocessor = ASLPreprocessor(normalize=True, flatten=True)
-        self.model = CoordsModel.load(model_path)
         self.pipeline = ASLPipeline(self.detector, self.preprocessor, self.model)
 
         # Create letter mapping
@@ -35,7 +41,7 @@ class ASLService:
             mapping[i + 1] = letter
         return mapping
 
-    def process_image(self, image_data):
+    def process_image(self, image_data, as_array=False):
         """Process base64 encoded image and return prediction"""
         try:
             # Decode base64 image
@@ -46,6 +52,16 @@ class ASLService:
             if image is None:
                 return {"error": "Invalid image data"}
 
+            return self.process_frame(image, as_array=as_array)
+        except Exception as e:
+            return {"error": str(e)}
+
+    def process_frame(self, image, as_array=False):
+        """
+        Process an already decoded BGR frame and return prediction.
+        With ``as_array`` landmarks stay a float32 array for compact serializers.
+        """
+        try:
             # Process image through pipeline
             prediction, landmarks, _ = self.pipeline.process_image(image)
 
@@ -56,10 +72,10 @@ class ASLService:
             class_idx = prediction["class_index"]
             letter = self.letter_mapping.get(class_idx, f"Unknown ({class_idx})")
 
-            # Convert landmarks to list for JSON serialization
+            # Convert landmarks to list for JSON serialization, unless the caller packs the array itself
             landmarks_list = None
             if landmarks is not None:
-                landmarks_list = landmarks.tolist()
+                landmarks_list = np.asarray(landmarks, dtype=np.float32) if as_array else landmarks.tolist()
 
             return {
                 "detected": True,
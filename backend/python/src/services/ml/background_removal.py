@@ -0,0 +1,330 @@
+"""
+Crop-aware background removal for contributed training images.
+
+Segmenting a whole photo spends almost all of the model's fixed 320x320
+input on background and resizes millions of irrelevant pixels on the way in
+and out. ``CutoutStage`` first finds the hand on a downscaled copy, crops a
+padded square around it from the full-resolution image and segments only
+that crop. Crops from concurrent uploads are batched into one ONNX run.
+The segmentation session (a rembg model) is loaded once per process,
+preferably at worker startup, and shared by all threads; ONNX Runtime
+sessions are safe to run concurrently.
+
+The result is an RGBA cutout of the hand crop, with the crop box in the
+original image's coordinates.
+"""
+import asyncio
+import io
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageOps
+from ...core.metrics import RollingLatency
+
+logger = logging.getLogger(__name__)
+
+# Normalization of rembg's U2-Net family
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+Box = Tuple[int, int, int, int]
+HandLocator = Callable[[np.ndarray], Optional[np.ndarray]]
+
+
+class BackgroundRemovalError(Exception):
+    """Raised when an image cannot be decoded or segmented"""
+    pass
+
+
+@dataclass
+class CutoutOptions:
+    """Where to crop and how to segment"""
+    model: str = "u2netp"
+    input_size: int = 320
+    # Added on every side of the hand's bounding box, as a fraction of its longest side
+    padding: float = 0.3
+    min_crop: int = 96
+    # Crops are downscaled to this edge before segmentation and in the output
+    max_crop_edge: int = 1024
+    # Longest edge of the copy the hand detector sees
+    detect_edge: int = 640
+    batch_size: int = 8
+    # Seconds a partial batch waits for crops from other images
+    max_wait: float = 0.01
+    # Segment the whole image when no hand is found, instead of skipping it
+    whole_image_fallback: bool = False
+
+
+@dataclass
+class Cutout:
+    data: bytes
+    width: int
+    height: int
+    box: Box
+    hand: bool
+
+
+def hand_box(points: np.ndarray, width: int, height: int, padding: float, min_size: int) -> Optional[Box]:
+    """
+    Padded square box around landmarks, clipped to the image.
+
+    Args:
+        points (np.ndarray): (N, 2+) landmarks, normalized to [0, 1] or in pixels
+        width (int): Image width
+        height (int): Image height
+        padding (float): Margin per side as a fraction of the landmarks' longest extent
+        min_size (int): Smallest box edge in pixels
+    """
+    points = np.asarray(points, dtype=np.float32)
+    points = points.reshape(-1, points.shape[-1])[:, :2]
+    if not len(points):
+        return None
+    if points.max() <= 1.5:  # normalized, as MediaPipe reports them
+        points = points * np.array([width, height], dtype=np.float32)
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    side = max(x1 - x0, y1 - y0)
+    side = min(max(side * (1 + 2 * padding), min_size), width, height)
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    left = int(round(min(max(cx - side / 2, 0), width - side)))
+    top = int(round(min(max(cy - side / 2, 0), height - side)))
+    return left, top, left + int(side), top + int(side)
+
+
+class SegmentationSession:
+    """A rembg salient-object model, run on batches of RGB crops"""
+
+    def __init__(self, inner_session, input_size: int = 320):
+        """
+        Args:
+            inner_session: ONNX Runtime ``InferenceSession`` (e.g. a rembg session's ``inner_session``)
+            input_size (int): Square model input size
+        """
+        self.inner_session = inner_session
+        self.input_size = input_size
+        model_input = inner_session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Exported models with a fixed batch dimension take one crop per run
+        batch = model_input.shape[0]
+        self.max_batch = batch if isinstance(batch, int) and batch > 0 else None
+        self.latency = RollingLatency()
+
+    @classmethod
+    def load(cls, model_name: str, input_size: int = 320) -> "SegmentationSession":
+        from rembg import new_session  # optional dependency; downloads the model on first use
+        return cls(new_session(model_name).inner_session, input_size)
+
+    def _normalize(self, crop: np.ndarray) -> np.ndarray:
+        size = (self.input_size, self.input_size)
+        resized = np.asarray(Image.fromarray(crop).resize(size, Image.Resampling.BILINEAR), dtype=np.float32)
+        resized /= max(float(resized.max()), 1.0)
+        return ((resized - MEAN) / STD).transpose(2, 0, 1)
+
+    def masks(self, crops: List[np.ndarray]) -> List[np.ndarray]:
+        """Alpha masks (uint8, crop-sized) for RGB uint8 crops"""
+        batch = np.stack([self._normalize(crop) for crop in crops])
+        step = self.max_batch or len(crops)
+        with self.latency.time():
+            predictions = np.concatenate([
+                self.inner_session.run(None, {self.input_name: batch[i:i + step]})[0][:, 0]
+                for i in range(0, len(crops), step)
+            ])
+        masks = []
+        for crop, prediction in zip(crops, predictions):
+            low, high = float(prediction.min()), float(prediction.max())
+            scaled = (prediction - low) / (high - low) if high > low else np.zeros_like(prediction)
+            mask = Image.fromarray((scaled * 255).astype(np.uint8), mode="L")
+            masks.append(np.asarray(mask.resize((crop.shape[1], crop.shape[0]), Image.Resampling.BILINEAR)))
+        return masks
+
+
+@lru_cache(maxsize=None)
+def load_session(model_name: str, input_size: int = 320) -> SegmentationSession:
+    """One session per process, shared by every thread that segments"""
+    started = time.perf_counter()
+    session = SegmentationSession.load(model_name, input_size)
+    logger.info(f"Loaded segmentation model {model_name} in {time.perf_counter() - started:.1f}s")
+    return session
+
+
+def asl_hand_locator(model_path: str) -> HandLocator:
+    """Landmarks of the hand found by asl's HandDetector, through the live-frame pipeline"""
+    from .asl_service import ASLService
+    service = ASLService(model_path)
+
+    def locate(image: np.ndarray) -> Optional[np.ndarray]:
+        result = service.process_frame(image, as_array=True)
+        return result.get("landmarks") if result.get("detected") else None
+    return locate
+
+
+class CutoutStage:
+    """
+    Hand detection, cropping and batched background removal.
+
+    ``cut`` decodes and crops on the detection pool, whose threads each own a
+    hand locator (MediaPipe is not thread-safe), then queues the crop for
+    the batching thread. That thread waits up to ``max_wait`` for up to
+    ``batch_size`` crops and segments them in one run. Compositing and PNG
+    encoding go back to the detection pool.
+    """
+
+    def __init__(
+        self,
+        locator_factory: Callable[[], HandLocator],
+        session_factory: Optional[Callable[[], SegmentationSession]] = None,
+        options: Optional[CutoutOptions] = None,
+        workers: int = 1
+    ):
+        """
+        Args:
+            locator_factory (Callable[[], HandLocator]): Creates a per-thread function
+                returning hand landmarks for a BGR image, or None
+            session_factory (Optional[Callable[[], SegmentationSession]]): Shared session;
+                ``load_session(options.model)`` by default
+            options (Optional[CutoutOptions]): Cropping and batching settings
+            workers (int): Detection and encoding threads
+        """
+        self.options = options or CutoutOptions()
+        self.locator_factory = locator_factory
+        self.session_factory = session_factory or (
+            lambda: load_session(self.options.model, self.options.input_size)
+        )
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cutout")
+        self._local = threading.local()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._batcher: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._session: Optional[SegmentationSession] = None
+        self.batch_sizes = RollingLatency()  # records crops per run, not seconds
+        self.latency = RollingLatency()
+        self.counts = {"images": 0, "no_hand": 0, "pixels": 0, "segmented_pixels": 0}
+
+    def start(self) -> None:
+        """Start the batching thread, which loads the session before taking crops"""
+        with self._start_lock:
+            if self._batcher is None:
+                self._batcher = threading.Thread(target=self._batch_loop, name="cutout-batch", daemon=True)
+                self._batcher.start()
+
+    def _locator(self) -> HandLocator:
+        locator = getattr(self._local, "locator", None)
+        if locator is None:
+            locator = self._local.locator = self.locator_factory()
+        return locator
+
+    def _prepare(self, data: bytes) -> Tuple[Optional[np.ndarray], Optional[Box], bool, int]:
+        try:
+            image = ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB")
+        except Exception as e:
+            raise BackgroundRemovalError(f"Cannot decode image: {e}")
+        width, height = image.size
+
+        scale = min(1.0, self.options.detect_edge / max(width, height))
+        small = image
+        if scale < 1:
+            small = image.resize((round(width * scale), round(height * scale)), Image.Resampling.BILINEAR)
+        landmarks = self._locator()(np.asarray(small)[..., ::-1].copy())  # the detector takes BGR
+        box = None
+        if landmarks is not None:
+            points = np.asarray(landmarks, dtype=np.float32)
+            if points.max() > 1.5:  # pixel landmarks of the small copy
+                points = points[..., :2] / scale
+            box = hand_box(points, width, height, self.options.padding, self.options.min_crop)
+        hand = box is not None
+        if not hand:
+            if not self.options.whole_image_fallback:
+                return None, None, False, width * height
+            box = (0, 0, width, height)
+
+        crop = image.crop(box)
+        if max(crop.size) > self.options.max_crop_edge:
+            crop.thumbnail((self.options.max_crop_edge, self.options.max_crop_edge), Image.Resampling.BILINEAR)
+        return np.asarray(crop), box, hand, width * height
+
+    @staticmethod
+    def _compose(crop: np.ndarray, mask: np.ndarray, box: Box, hand: bool) -> Cutout:
+        rgba = np.dstack([crop, mask])
+        out = io.BytesIO()
+        Image.fromarray(rgba, mode="RGBA").save(out, format="PNG", compress_level=3)
+        return Cutout(out.getvalue(), crop.shape[1], crop.shape[0], box, hand)
+
+    async def cut(self, data: bytes) -> Optional[Cutout]:
+        """
+        Cutout of the hand in an encoded image, or None if no hand was found.
+
+        Raises:
+            BackgroundRemovalError: If the image cannot be decoded or segmented
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        crop, box, hand, pixels = await loop.run_in_executor(self._executor, self._prepare, data)
+        self.counts["images"] += 1
+        self.counts["pixels"] += pixels
+        if not hand:
+            self.counts["no_hand"] += 1
+        if crop is None:
+            return None
+        self.counts["segmented_pixels"] += (box[2] - box[0]) * (box[3] - box[1])
+        future = loop.create_future()
+        self._queue.put((crop, future, loop))
+        mask = await future
+        cutout = await loop.run_in_executor(self._executor, self._compose, crop, mask, box, hand)
+        self.latency.record(time.perf_counter() - started)
+        return cutout
+
+    def _batch_loop(self) -> None:
+        try:
+            self._session = self.session_factory()
+        except Exception as e:
+            logger.exception("Segmentation model failed to load")
+            error = BackgroundRemovalError(f"Segmentation model unavailable: {e}")
+            while True:
+                _, future, loop = self._queue.get()
+                loop.call_soon_threadsafe(_settle, future, None, error)
+
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.options.max_wait
+            while len(batch) < self.options.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self.batch_sizes.record(len(batch))
+            try:
+                masks = self._session.masks([crop for crop, _, _ in batch])
+                for (_, future, loop), mask in zip(batch, masks):
+                    loop.call_soon_threadsafe(_settle, future, mask, None)
+            except Exception as e:
+                logger.exception("Segmentation failed")
+                for _, future, loop in batch:
+                    loop.call_soon_threadsafe(_settle, future, None, BackgroundRemovalError(str(e)))
+
+    def metrics(self) -> Dict[str, Any]:
+        pixels = self.counts["pixels"]
+        return {
+            **self.counts,
+            "segmented_share": self.counts["segmented_pixels"] / pixels if pixels else None,
+            "mean_batch": self.batch_sizes.mean,
+            "latency": self.latency.snapshot(),
+            "segment": self._session.latency.snapshot() if self._session else None,
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _settle(future: asyncio.Future, result: Any, error: Optional[Exception]) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
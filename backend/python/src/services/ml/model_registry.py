@@ -0,0 +1,266 @@
+"""
+Several model versions served side by side, with weighted routing and shadow runs.
+
+Each ``ModelVersion`` has a routing ``weight`` (its share of live traffic)
+and a ``shadow`` rate (the fraction of live requests that are also run on it
+in the background). Services are created lazily, per version and per thread,
+because the MediaPipe detector inside ``ASLService`` is not thread-safe; the
+model weights behind them are loaded once per process by ``load_model`` and
+shared read-only, including between versions pointing at the same path.
+
+Shadow runs happen on their own executor after the live response is
+computed, so they add no latency to it. When the shadow queue is full a sample
+is dropped rather than queued. Each shadow result is compared with the live
+one, and agreement and latency are recorded per version.
+"""
+import logging
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from ...core.metrics import RollingLatency
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelVersion:
+    """A model and how much live and shadow traffic it gets"""
+    name: str
+    path: str
+    weight: float = 1.0
+    shadow: float = 0.0
+
+
+def parse_versions(spec: str, default_path: str) -> List[ModelVersion]:
+    """
+    Versions from ``name:path:weight[:shadow]`` entries separated by commas,
+    e.g. ``stable:models/asl_coords_model:1,fast:models/asl_fast:0:0.1``.
+    An empty spec is one version, ``default``, at ``default_path``.
+    """
+    if not spec.strip():
+        return [ModelVersion("default", default_path)]
+    versions = []
+    for entry in spec.split(","):
+        parts = entry.strip().split(":")
+        if len(parts) not in (3, 4):
+            raise ValueError(f"Model version must be name:path:weight[:shadow], got {entry!r}")
+        versions.append(ModelVersion(
+            name=parts[0],
+            path=parts[1],
+            weight=float(parts[2]),
+            shadow=float(parts[3]) if len(parts) == 4 else 0.0,
+        ))
+    return versions
+
+
+class ShadowStats:
+    """How a shadow version's results compare with the live ones on the same requests"""
+
+    def __init__(self):
+        self.latency = RollingLatency()
+        self.live_latency = RollingLatency()  # the live run of the same requests
+        self.compared = 0
+        self.agreed = 0
+        self.detection_agreed = 0
+        self.confidence_delta = 0.0
+        self.dropped = 0
+        self.disagreements: Counter = Counter()
+
+    def record(self, live: Dict[str, Any], shadow: Dict[str, Any], live_seconds: float, shadow_seconds: float) -> None:
+        self.compared += 1
+        self.live_latency.record(live_seconds)
+        self.latency.record(shadow_seconds)
+        if bool(live.get("detected")) == bool(shadow.get("detected")):
+            self.detection_agreed += 1
+        if live.get("letter") == shadow.get("letter") and "error" not in shadow:
+            self.agreed += 1
+        else:
+            shadow_letter = "error" if "error" in shadow else shadow.get("letter")
+            self.disagreements[f"{live.get('letter')}->{shadow_letter}"] += 1
+        if live.get("confidence") is not None and shadow.get("confidence") is not None:
+            self.confidence_delta += shadow["confidence"] - live["confidence"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        compared = self.compared or None
+        return {
+            "compared": self.compared,
+            "dropped": self.dropped,
+            "agreement": self.agreed / compared if compared else None,
+            "detection_agreement": self.detection_agreed / compared if compared else None,
+            "mean_confidence_delta": self.confidence_delta / compared if compared else None,
+            "top_disagreements": dict(self.disagreements.most_common(10)),
+            "latency": self.latency.snapshot(),
+            "live_latency": self.live_latency.snapshot(),
+        }
+
+
+class ModelRegistry:
+    """Routes each request to one version and mirrors a sample of them to shadow versions"""
+
+    def __init__(
+        self,
+        versions: List[ModelVersion],
+        service_factory: Callable[[ModelVersion], Any],
+        shadow_workers: int = 1,
+        shadow_queue: int = 16,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            versions (List[ModelVersion]): Versions by name; at least one needs a positive weight
+            service_factory (Callable[[ModelVersion], Any]): Creates an object with
+                ``process_image`` and ``process_frame`` (e.g. ``ASLService``) for a version
+            shadow_workers (int): Threads running shadow inference
+            shadow_queue (int): Shadow runs waiting at most; further samples are dropped
+            seed (Optional[int]): Seed for routing and shadow sampling of requests without a key
+        """
+        names = [version.name for version in versions]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate model version names: {names}")
+        if not any(version.weight > 0 for version in versions):
+            raise ValueError("At least one model version needs a positive weight")
+        if any(version.weight < 0 or not 0 <= version.shadow <= 1 for version in versions):
+            raise ValueError("Weights must be >= 0 and shadow rates between 0 and 1")
+        self.versions: Dict[str, ModelVersion] = {version.name: version for version in versions}
+        self.service_factory = service_factory
+        self.shadow_queue = shadow_queue
+        self._live = [version for version in versions if version.weight > 0]
+        self._total_weight = sum(version.weight for version in self._live)
+        self._rng = random.Random(seed)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shadow_executor = ThreadPoolExecutor(max_workers=shadow_workers, thread_name_prefix="asl-shadow")
+        self._shadow_pending = 0
+        self._closed = False
+        self.served: Dict[str, RollingLatency] = {name: RollingLatency() for name in self.versions}
+        self.shadow: Dict[str, ShadowStats] = {
+            version.name: ShadowStats() for version in versions if version.shadow > 0
+        }
+        self._loaded = set()
+
+    @property
+    def primary(self) -> ModelVersion:
+        """The version with the largest share of live traffic"""
+        return max(self._live, key=lambda version: version.weight)
+
+    def service(self, name: str):
+        """This thread's service for a version, created on first use"""
+        services = getattr(self._local, "services", None)
+        if services is None:
+            services = self._local.services = {}
+        service = services.get(name)
+        if service is None:
+            started = time.perf_counter()
+            service = services[name] = self.service_factory(self.versions[name])
+            logger.info(f"Loaded model version {name} in {time.perf_counter() - started:.2f}s")
+            with self._lock:
+                self._loaded.add(name)
+        return service
+
+    def choose(self, key: Optional[str] = None) -> ModelVersion:
+        """
+        Pick a live version by weight.
+        With a ``key`` (e.g. a session id) the choice is stable, so one
+        session is not split between versions.
+        """
+        if key is None:
+            with self._lock:
+                point = self._rng.random()
+        else:
+            point = zlib.crc32(key.encode()) / 2 ** 32
+        point *= self._total_weight
+        for version in self._live:
+            point -= version.weight
+            if point < 0:
+                return version
+        return self._live[-1]
+
+    def process_image(self, image_data: str, key: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """``process_image`` on the chosen version; the result names the version in ``model``"""
+        return self._run("process_image", image_data, key, kwargs)
+
+    def process_frame(self, image, key: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """``process_frame`` on the chosen version; the result names the version in ``model``"""
+        return self._run("process_frame", image, key, kwargs)
+
+    def _run(self, method: str, payload: Any, key: Optional[str], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        version = self.choose(key)
+        started = time.perf_counter()
+        result = getattr(self.service(version.name), method)(payload, **kwargs)
+        elapsed = time.perf_counter() - started
+        if "error" in result:
+            self.served[version.name].record_error()
+        else:
+            self.served[version.name].record(elapsed)
+            self._mirror(version, method, payload, result, elapsed)
+        result["model"] = version.name
+        return result
+
+    def _mirror(self, live: ModelVersion, method: str, payload: Any, result: Dict[str, Any], elapsed: float) -> None:
+        for name, stats in self.shadow.items():
+            if name == live.name:
+                continue
+            with self._lock:
+                if self._rng.random() >= self.versions[name].shadow:
+                    continue
+                if self._closed:
+                    return
+                if self._shadow_pending >= self.shadow_queue:
+                    stats.dropped += 1
+                    continue
+                self._shadow_pending += 1
+                # Submitted under the lock so close() cannot shut the pool down in between
+                future = self._shadow_executor.submit(
+                    self._run_shadow, name, method, payload, dict(result), elapsed
+                )
+            # Runs on completion and on cancellation by close(), so drain() always returns
+            future.add_done_callback(self._shadow_done)
+
+    def _shadow_done(self, future) -> None:
+        with self._lock:
+            self._shadow_pending -= 1
+
+    def _run_shadow(self, name: str, method: str, payload: Any, live: Dict[str, Any], live_seconds: float) -> None:
+        try:
+            started = time.perf_counter()
+            shadow = getattr(self.service(name), method)(payload)
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.shadow[name].record(live, shadow, live_seconds, elapsed)
+        except Exception:
+            logger.exception(f"Shadow run of model version {name} failed")
+            with self._lock:
+                self.shadow[name].latency.record_error()
+
+    def drain(self) -> None:
+        """Wait for queued shadow runs (tests and benchmarks)"""
+        while self._shadow_pending:
+            time.sleep(0.001)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "shadow_pending": self._shadow_pending,
+                "versions": {
+                    name: {
+                        "path": version.path,
+                        "weight": version.weight,
+                        "shadow": version.shadow,
+                        "loaded": name in self._loaded,
+                        "served": self.served[name].snapshot(),
+                        **({"shadow_stats": self.shadow[name].snapshot()} if name in self.shadow else {}),
+                    }
+                    for name, version in self.versions.items()
+                },
+            }
+
+    def close(self) -> None:
+        """Stop mirroring and drop queued shadow runs; live requests keep working"""
+        with self._lock:
+            self._closed = True
+        self._shadow_executor.shutdown(wait=False, cancel_futures=True)
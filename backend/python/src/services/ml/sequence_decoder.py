@@ -0,0 +1,214 @@
+import string
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Hashable, List, Optional
+
+import numpy as np
+
+BLANK_CLASS = 0
+# Class 0 is blank/neutral, 1..26 are A..Z (same mapping as ASLService)
+DEFAULT_LABELS = ["0"] + list(string.ascii_uppercase)
+
+
+@dataclass
+class DecoderUpdate:
+    """Result of feeding one frame to a session; the full text is ``FingerspellingDecoder.text``"""
+    committed: Optional[str]
+    word: str
+    candidate: Optional[str]
+    candidate_score: float
+
+
+class _SessionState:
+    """
+    Bounded per-session state: a probability ring buffer plus its running sum,
+    the letters of the current word and a capped history of finished words
+    """
+
+    __slots__ = (
+        "ring", "total", "pos", "filled", "candidate", "streak",
+        "latched", "blank_streak", "word", "words", "last_seen",
+    )
+
+    def __init__(self, window: int, num_classes: int, max_words: int, now: float):
+        self.ring = np.zeros((window, num_classes), dtype=np.float32)
+        self.total = np.zeros(num_classes, dtype=np.float32)
+        self.pos = 0
+        self.filled = 0
+        self.candidate = -1
+        self.streak = 0
+        # Class that was last committed and must be released before it can repeat
+        self.latched = -1
+        self.blank_streak = 0
+        self.word: List[str] = []
+        self.words: Deque[str] = deque(maxlen=max_words)
+        self.last_seen = now
+
+    def end_word(self) -> None:
+        if self.word:
+            self.words.append("".join(self.word))
+            self.word.clear()
+
+
+class FingerspellingDecoder:
+    """
+    Incremental fingerspelling decoder over per-frame class probabilities.
+
+    Each session keeps a ring buffer of the last ``window`` probability vectors
+    and their running sum, so the smoothed distribution is updated in O(1) per
+    frame (independent of history length). A letter is committed once it has
+    been the smoothed top class for ``min_frames`` consecutive frames with a
+    mean probability of at least ``commit_threshold`` (debounce). The same
+    letter can only be committed again after its probability falls below
+    ``release_threshold`` (hysteresis), so held signs produce one letter while
+    deliberate doubles still work. ``space_frames`` consecutive blank frames end
+    the current word.
+
+    Per-frame work and state are bounded too: an update only returns the
+    committed letter and the current word (at most ``max_word_length`` letters,
+    longer runs are split), and only the last ``max_words`` finished words are
+    kept. ``text`` joins them on demand.
+
+    Sessions idle for longer than ``session_ttl`` are dropped; activity order
+    is kept in an OrderedDict so expiry is amortised O(1) per update.
+    """
+
+    def __init__(
+        self,
+        labels: Optional[List[str]] = None,
+        window: int = 8,
+        min_frames: int = 4,
+        commit_threshold: float = 0.6,
+        release_threshold: float = 0.3,
+        space_frames: int = 15,
+        session_ttl: float = 300.0,
+        max_sessions: int = 10000,
+        max_word_length: int = 32,
+        max_words: int = 256
+    ):
+        self.labels = labels or DEFAULT_LABELS
+        self.num_classes = len(self.labels)
+        self.window = window
+        self.min_frames = min_frames
+        self.commit_threshold = commit_threshold
+        self.release_threshold = release_threshold
+        self.space_frames = space_frames
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.max_word_length = max_word_length
+        self.max_words = max_words
+        self._sessions: "OrderedDict[Hashable, _SessionState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _session(self, session_id: Hashable, now: float) -> _SessionState:
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = _SessionState(self.window, self.num_classes, self.max_words, now)
+            self._sessions[session_id] = state
+        else:
+            self._sessions.move_to_end(session_id)
+        state.last_seen = now
+        return state
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop idle sessions (and the oldest ones beyond max_sessions)"""
+        now = time.monotonic() if now is None else now
+        dropped = 0
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state.last_seen <= self.session_ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            dropped += 1
+        return dropped
+
+    def reset(self, session_id: Hashable) -> None:
+        self._sessions.pop(session_id, None)
+
+    def text(self, session_id: Hashable) -> str:
+        """Text spelled so far in a session (its last ``max_words`` words)"""
+        state = self._sessions.get(session_id)
+        if state is None:
+            return ""
+        words = list(state.words)
+        if state.word:
+            words.append("".join(state.word))
+        return " ".join(words)
+
+    def update(
+        self,
+        session_id: Hashable,
+        probabilities: np.ndarray,
+        now: Optional[float] = None
+    ) -> DecoderUpdate:
+        """Feed one frame's class probabilities to a session"""
+        now = time.monotonic() if now is None else now
+        state = self._session(session_id, now)
+        self.expire(now)
+
+        frame = np.asarray(probabilities, dtype=np.float32)
+        # Replace the oldest slot and keep the running sum in step
+        state.total += frame - state.ring[state.pos]
+        state.ring[state.pos] = frame
+        state.pos = (state.pos + 1) % self.window
+        state.filled = min(state.filled + 1, self.window)
+
+        mean = state.total / state.filled
+        top = int(mean.argmax())
+        score = float(mean[top])
+
+        if state.latched >= 0 and mean[state.latched] < self.release_threshold:
+            state.latched = -1
+
+        state.streak = state.streak + 1 if top == state.candidate else 1
+        state.candidate = top
+
+        committed = None
+        if top == BLANK_CLASS:
+            state.blank_streak += 1
+            state.latched = -1
+            if state.blank_streak == self.space_frames:
+                state.end_word()
+        else:
+            state.blank_streak = 0
+            if (
+                state.streak >= self.min_frames
+                and score >= self.commit_threshold
+                and top != state.latched
+            ):
+                committed = self.labels[top]
+                if len(state.word) >= self.max_word_length:
+                    state.end_word()
+                state.word.append(committed)
+                state.latched = top
+
+        return DecoderUpdate(
+            committed=committed,
+            word="".join(state.word),
+            candidate=self.labels[top] if top != BLANK_CLASS else None,
+            candidate_score=score,
+        )
+
+    def update_prediction(
+        self,
+        session_id: Hashable,
+        class_index: Optional[int],
+        confidence: float = 1.0,
+        now: Optional[float] = None
+    ) -> DecoderUpdate:
+        """Feed a single (class, confidence) prediction; no detection counts as blank"""
+        probabilities = np.zeros(self.num_classes, dtype=np.float32)
+        if class_index is None:
+            probabilities[BLANK_CLASS] = 1.0
+        else:
+            probabilities[class_index] = confidence
+            # Spread the remaining mass on blank so weak frames do not look confident
+            probabilities[BLANK_CLASS] += 1.0 - confidence
+        return self.update(session_id, probabilities, now)
+
+    def stats(self) -> Dict[str, int]:
+        per_session = self.window * self.num_classes * 4 * 2 + self.max_words * self.max_word_length
+        return {"sessions": len(self._sessions), "approx_state_bytes": per_session * len(self._sessions)}
@@ -0,0 +1,251 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+_END = object()
+
+
+class VideoProcessingError(Exception):
+    """Raised when a clip cannot be decoded or processed"""
+    pass
+
+
+class StrideSampler:
+    """Keep every ``stride``-th frame; skipped frames are grabbed but never decoded"""
+
+    def __init__(self, stride: int = 5):
+        if stride < 1:
+            raise ValueError("stride must be >= 1")
+        self.stride = stride
+
+    def should_decode(self, index: int) -> bool:
+        return index % self.stride == 0
+
+    def accept(self, index: int, frame: np.ndarray) -> bool:
+        return True
+
+
+class MotionSampler:
+    """
+    Keep frames that differ enough from the last kept frame (motion or scene change).
+
+    Frames are compared as small grayscale thumbnails by mean absolute
+    difference. ``max_gap`` forces a sample during long still stretches and
+    ``check_every`` limits how many frames are decoded for the comparison.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 6.0,
+        check_every: int = 2,
+        min_gap: int = 2,
+        max_gap: int = 30,
+        thumb_size: Tuple[int, int] = (64, 64)
+    ):
+        self.threshold = threshold
+        self.check_every = check_every
+        self.min_gap = min_gap
+        self.max_gap = max_gap
+        self.thumb_size = thumb_size
+        self._last_thumb: Optional[np.ndarray] = None
+        self._last_index = -max_gap
+
+    def should_decode(self, index: int) -> bool:
+        return index % self.check_every == 0 or index - self._last_index >= self.max_gap
+
+    def accept(self, index: int, frame: np.ndarray) -> bool:
+        gap = index - self._last_index
+        if gap < self.min_gap:
+            return False
+        thumb = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.thumb_size, interpolation=cv2.INTER_AREA)
+        changed = (
+            self._last_thumb is None
+            or gap >= self.max_gap
+            or float(cv2.absdiff(thumb, self._last_thumb).mean()) >= self.threshold
+        )
+        if changed:
+            self._last_thumb = thumb
+            self._last_index = index
+        return changed
+
+
+@dataclass
+class TimelineEntry:
+    frame_index: int
+    timestamp_ms: float
+    detected: bool
+    letter: Optional[str] = None
+    confidence: Optional[float] = None
+    landmarks: Optional[List[Any]] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ClipTimeline:
+    source: str
+    fps: float
+    frame_count: int = 0
+    frames_decoded: int = 0
+    entries: List[TimelineEntry] = field(default_factory=list)
+
+    @property
+    def letters(self) -> str:
+        """Detected letters with consecutive repeats collapsed"""
+        out: List[str] = []
+        for entry in self.entries:
+            if entry.detected and entry.letter and entry.letter != "0":
+                if not out or out[-1] != entry.letter:
+                    out.append(entry.letter)
+        return "".join(out)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["letters"] = self.letters
+        data["frames_sampled"] = len(self.entries)
+        return data
+
+
+class VideoPipeline:
+    """
+    Incremental video inference: decode, sample, batch and infer with bounded memory.
+
+    A decoder thread reads the clip frame by frame and pushes sampled frames
+    into a bounded queue; batches of ``batch_size`` frames are handed to a
+    worker pool while decoding continues, with at most ``max_pending_batches``
+    batches in flight. Memory is therefore bounded by
+    ``queue_size + batch_size * (max_pending_batches + 1)`` frames regardless of
+    clip length.
+
+    ``service_factory`` must return an object with ``process_frame(frame)``
+    (e.g. ``ASLService``). One instance is created per worker thread because
+    the MediaPipe detector inside the pipeline is not thread-safe.
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable[[], Any],
+        workers: int = 1,
+        batch_size: int = 8,
+        queue_size: int = 4,
+        max_pending_batches: Optional[int] = None
+    ):
+        self.service_factory = service_factory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_pending_batches = max_pending_batches or workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="video-infer")
+        self._local = threading.local()
+
+    def _service(self):
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self.service_factory()
+        return service
+
+    def _infer_batch(self, batch: List[Tuple[int, float, np.ndarray]]) -> List[TimelineEntry]:
+        service = self._service()
+        entries = []
+        for index, timestamp_ms, frame in batch:
+            result = service.process_frame(frame)
+            entries.append(TimelineEntry(
+                frame_index=index,
+                timestamp_ms=timestamp_ms,
+                detected=bool(result.get("detected")),
+                letter=result.get("letter"),
+                confidence=result.get("confidence"),
+                landmarks=result.get("landmarks"),
+                error=result.get("error"),
+            ))
+        return entries
+
+    def _decode(
+        self,
+        path: Path,
+        sampler,
+        frames: "queue.Queue",
+        timeline: ClipTimeline,
+        stop: threading.Event
+    ) -> None:
+        capture = cv2.VideoCapture(str(path))
+        try:
+            if not capture.isOpened():
+                raise VideoProcessingError(f"Cannot open video: {path.name}")
+            timeline.fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+            index = 0
+            while not stop.is_set():
+                # grab() demuxes without converting pixels; only sampled frames are decoded
+                if not capture.grab():
+                    break
+                if sampler.should_decode(index):
+                    ok, frame = capture.retrieve()
+                    if ok:
+                        timeline.frames_decoded += 1
+                        if sampler.accept(index, frame):
+                            timestamp_ms = capture.get(cv2.CAP_PROP_POS_MSEC)
+                            frames.put((index, timestamp_ms, frame))
+                index += 1
+            timeline.frame_count = index
+            frames.put(_END)
+        except BaseException as e:
+            frames.put(e)
+        finally:
+            capture.release()
+
+    def process(self, path: Union[str, Path], sampler=None) -> ClipTimeline:
+        """Process a clip on disk and return its timeline (blocking)"""
+        path = Path(path)
+        sampler = sampler or StrideSampler()
+        timeline = ClipTimeline(source=path.name, fps=0.0)
+        frames: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        decoder = threading.Thread(
+            target=self._decode, args=(path, sampler, frames, timeline, stop), daemon=True
+        )
+        decoder.start()
+
+        pending: List[Future] = []
+        batch: List[Tuple[int, float, np.ndarray]] = []
+        try:
+            while True:
+                item = frames.get()
+                if item is _END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    pending.append(self._executor.submit(self._infer_batch, batch))
+                    batch = []
+                    # Backpressure: wait for the oldest batch before queueing more
+                    while sum(not f.done() for f in pending) >= self.max_pending_batches:
+                        next(f for f in pending if not f.done()).result()
+            if batch:
+                pending.append(self._executor.submit(self._infer_batch, batch))
+            for future in pending:
+                timeline.entries.extend(future.result())
+        except VideoProcessingError:
+            raise
+        except Exception as e:
+            raise VideoProcessingError(f"Failed to process {path.name}: {str(e)}")
+        finally:
+            stop.set()
+            # Unblock the decoder if it is waiting on a full queue
+            while decoder.is_alive():
+                try:
+                    frames.get_nowait()
+                except queue.Empty:
+                    decoder.join(timeout=0.05)
+        timeline.entries.sort(key=lambda entry: entry.frame_index)
+        return timeline
+
+    async def process_async(self, path: Union[str, Path], sampler=None) -> ClipTimeline:
+        """Run ``process`` off the event loop"""
+        return await asyncio.to_thread(self.process, path, sampler)
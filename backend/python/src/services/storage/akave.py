@@ -14,6 +14,10 @@ class AkaveStorageService(StorageProvider):
             host=f"http://localhost:4000",  # Docker container port
         )
         self.sdk = AkaveSDK(self.config)
+
+    def _client(self) -> AkaveSDK:
+        # One SDK (and session) per call: the service is shared across concurrent requests
+        return AkaveSDK(self.config)
     
     async def upload_file(
         self,
@@ -23,7 +27,7 @@ class AkaveStorageService(StorageProvider):
     ) -> str:
         """Upload file and return CID"""
         try:
-            async with self.sdk as client:
+            async with self._client() as client:
                 result = await client.upload_file(
                     bucket_name=bucket_name,
                     file_data=file_data,
@@ -36,14 +40,20 @@ class AkaveStorageService(StorageProvider):
     async def list_files(self, bucket_name: str) -> list[str]:
         """List files in bucket"""
         try:
-            async with self.sdk as client:
+            async with self._client() as client:
                 result = await client.list_files(bucket_name)
                 return result['files']
         except AkaveError as e:
             raise Exception(f"Akave list failed: {e}")
 
-    async def download_file(self, bucket_name, file_name, destination):
-        return await super().download_file(bucket_name, file_name, destination)
+    async def download_file(self, bucket_name: str, file_name: str, destination: str) -> str:
+        """Download file to destination"""
+        try:
+            async with self._client() as client:
+                path = await client.download_file(bucket_name, file_name, destination)
+                return str(path)
+        except AkaveError as e:
+            raise Exception(f"Akave download failed: {e}")
 
     # def __init__(self, PrivateKey: str, NodeAddress: str, DefaultBucket: str):
     #     # set private key
@@ -4,6 +4,7 @@ import aiohttp
 import asyncio
 from dataclasses import dataclass
 import json
+from ...core.tracing import traced
 
 @dataclass
 class AkaveConfig:
@@ -29,6 +30,7 @@ class AkaveSDK:
         if self._session:
             await self._session.close()
     
+    @traced("akave")
     async def _request(
         self, 
         method: str, 
@@ -84,6 +86,7 @@ class AkaveSDK:
         """Get file metadata"""
         return await self._request('GET', f'/buckets/{bucket_name}/files/{file_name}')
     
+    @traced("akave")
     async def upload_file(
         self, 
         bucket_name: str, 
@@ -129,6 +132,7 @@ class AkaveSDK:
         except Exception as e:
             raise AkaveError(f"Upload error: {str(e)}")
     
+    @traced("akave")
     async def download_file(
         self, 
         bucket_name: str, 
@@ -0,0 +1,242 @@
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+
+class CIDCache:
+    """
+    Persistent on-disk cache for immutable content keyed by CID.
+
+    Objects live under ``root/objects`` and are indexed in a SQLite database
+    (WAL mode), which keeps the LRU order, the size budget and the hit/miss
+    counters consistent between worker processes. New objects are written to a
+    temp file in the cache directory and renamed into place, so readers never
+    see partial content. Hits are served without reading through Python file
+    objects: ``open`` returns a read-only memory map and ``copy_path`` uses
+    ``sendfile``.
+    """
+
+    def __init__(self, root: Union[str, Path], max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Args:
+            root (Union[str, Path]): Cache directory, shared by all processes using it
+            max_bytes (int): Size budget; least recently used objects are evicted above it
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.objects_dir = self.root / "objects"
+        self.tmp_dir = self.root / "tmp"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self._db_path = self.root / "index.sqlite3"
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+        with self._db() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    cid TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access);
+                CREATE TABLE IF NOT EXISTS stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total_bytes INTEGER NOT NULL DEFAULT 0,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0,
+                    bytes_saved INTEGER NOT NULL DEFAULT 0
+                );
+                INSERT OR IGNORE INTO stats (id) VALUES (0);
+                """
+            )
+
+    def _db(self) -> sqlite3.Connection:
+        """Return this process's connection; connections are never shared across fork"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(
+                self._db_path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def object_path(self, cid: str) -> Path:
+        """Location of a cached object, fanned out by CID suffix to keep directories small"""
+        if not cid or not cid.isalnum():
+            raise ValueError(f"Invalid CID: {cid!r}")
+        return self.objects_dir / cid[-2:] / cid
+
+    def temp_path(self) -> Path:
+        """Unique temp file on the cache filesystem, for writes that are later committed"""
+        fd, name = tempfile.mkstemp(dir=self.tmp_dir, suffix=".part")
+        os.close(fd)
+        return Path(name)
+
+    def lookup(self, cid: str) -> Optional[Path]:
+        """Return the cached object's path and record a hit, or record a miss"""
+        path = self.object_path(cid)
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT size FROM entries WHERE cid = ?", (cid,)).fetchone()
+                if row is not None and path.exists():
+                    conn.execute(
+                        "UPDATE entries SET last_access = ? WHERE cid = ?", (time.time(), cid)
+                    )
+                    conn.execute(
+                        "UPDATE stats SET hits = hits + 1, bytes_saved = bytes_saved + ? WHERE id = 0",
+                        (row[0],)
+                    )
+                    result = path
+                else:
+                    if row is not None:
+                        # Index entry outlived its file; drop it
+                        self._remove_entry(conn, cid, row[0])
+                    conn.execute("UPDATE stats SET misses = misses + 1 WHERE id = 0")
+                    result = None
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def commit(self, cid: str, tmp_path: Path) -> Path:
+        """Atomically move a fully written temp file into the cache and enforce the budget"""
+        path = self.object_path(cid)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size = tmp_path.stat().st_size
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            # The rename happens inside the write transaction, so no other
+            # process can evict or index this CID between the file and its row
+            renamed = False
+            try:
+                row = conn.execute("SELECT size FROM entries WHERE cid = ?", (cid,)).fetchone()
+                previous = row[0] if row is not None else 0
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (cid, size, last_access) VALUES (?, ?, ?)",
+                    (cid, size, time.time())
+                )
+                conn.execute(
+                    "UPDATE stats SET total_bytes = total_bytes + ? WHERE id = 0",
+                    (size - previous,)
+                )
+                self._evict(conn, keep=cid)
+                os.replace(tmp_path, path)
+                renamed = True
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                if renamed:
+                    # Never leave a file behind that the index does not account for
+                    path.unlink(missing_ok=True)
+                raise
+        return path
+
+    def put(self, cid: str, data: bytes) -> Path:
+        """Store in-memory content under its CID"""
+        tmp_path = self.temp_path()
+        try:
+            tmp_path.write_bytes(data)
+            return self.commit(cid, tmp_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def open(self, cid: str) -> Optional[Union[mmap.mmap, bytes]]:
+        """Read-only memory map of a cached object, or None on a miss"""
+        path = self.lookup(cid)
+        if path is None:
+            return None
+        return self.map_path(path)
+
+    @staticmethod
+    def map_path(path: Path) -> Union[mmap.mmap, bytes]:
+        """Map a cached object read-only; the mapping stays valid if the file is evicted"""
+        with open(path, "rb") as f:
+            # mmap cannot map empty files
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def read_path(path: Path) -> bytes:
+        """Materialise a cached object as bytes with a single copy out of the page cache"""
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm[:]
+
+    @staticmethod
+    def copy_path(path: Path, destination: Path) -> Path:
+        """Copy a cached object to ``destination`` in-kernel with sendfile"""
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        tmp_destination = destination.with_name(f".{destination.name}.{os.getpid()}.part")
+        try:
+            with open(path, "rb") as src, open(tmp_destination, "wb") as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                offset = 0
+                while remaining > 0:
+                    sent = os.sendfile(dst.fileno(), src.fileno(), offset, remaining)
+                    if sent == 0:
+                        break
+                    offset += sent
+                    remaining -= sent
+            os.replace(tmp_destination, destination)
+        except BaseException:
+            tmp_destination.unlink(missing_ok=True)
+            raise
+        return destination
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics aggregated across every process sharing this directory"""
+        with self._lock:
+            conn = self._db()
+            total_bytes, hits, misses, bytes_saved = conn.execute(
+                "SELECT total_bytes, hits, misses, bytes_saved FROM stats WHERE id = 0"
+            ).fetchone()
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "total_bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "bytes_saved": bytes_saved,
+        }
+
+    def _evict(self, conn: sqlite3.Connection, keep: Optional[str] = None) -> None:
+        """Drop least recently used objects until the cache fits its budget"""
+        total = conn.execute("SELECT total_bytes FROM stats WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for cid, size in conn.execute(
+            "SELECT cid, size FROM entries ORDER BY last_access"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            if cid == keep:
+                continue
+            self._remove_entry(conn, cid, size)
+            total -= size
+
+    def _remove_entry(self, conn: sqlite3.Connection, cid: str, size: int) -> None:
+        # Unlinking is safe while other processes hold the file open or mapped
+        self.object_path(cid).unlink(missing_ok=True)
+        conn.execute("DELETE FROM entries WHERE cid = ?", (cid,))
+        conn.execute("UPDATE stats SET total_bytes = total_bytes - ? WHERE id = 0", (size,))
@@ -0,0 +1,347 @@
+"""
+Upload-time image derivatives: normalized display copies and thumbnails.
+
+``render_derivatives`` decodes an upload once, bakes in the EXIF orientation,
+drops all metadata except the colour profile and re-encodes a display copy
+plus fixed-size square thumbnails. ``MediaPipeline`` runs it in a worker pool
+after the original has been stored, optionally adds a background-removed
+cutout of the hand, uploads every derivative to the same storage provider and
+writes a manifest that links them to the original's CID.
+Derivatives are also kept in a ``CIDCache`` shared by all server processes,
+so previews are served from local disk rather than fetched from storage.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+from PIL import Image, ImageOps
+from .base import StorageProvider
+from .cid_cache import CIDCache
+from .gateways import compute_raw_cid
+from ..ml.background_removal import BackgroundRemovalError, CutoutStage
+from ...core.metrics import RollingLatency
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name and media type for each output format
+OUTPUT_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+
+class DerivativeError(Exception):
+    """Raised when derivatives cannot be produced or found"""
+    pass
+
+
+@dataclass
+class DerivativeOptions:
+    """How derivatives are rendered"""
+    format: str = "webp"
+    quality: int = 80
+    # Longest edge of the display copy; smaller images keep their size
+    max_edge: int = 2048
+    thumbnail_sizes: Tuple[int, ...] = (128, 320)
+    thumbnail_quality: int = 70
+
+
+@dataclass
+class RenderedImage:
+    variant: str
+    data: bytes
+    width: int
+    height: int
+
+
+def _open(data: bytes, target_edge: int) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.seek(0)  # first frame of animated GIF/WebP
+    if image.format == "JPEG":
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the output is that much smaller
+        width, height = image.size
+        scale = target_edge / max(width, height)
+        if scale < 1:
+            image.draft("RGB", (int(width * scale) + 1, int(height * scale) + 1))
+    return image
+
+
+def _encode(image: Image.Image, options: DerivativeOptions, quality: int, icc_profile: Optional[bytes]) -> bytes:
+    pil_format, _ = OUTPUT_FORMATS[options.format]
+    buffer = io.BytesIO()
+    save_options: Dict[str, Any] = {"quality": quality}
+    if icc_profile:
+        save_options["icc_profile"] = icc_profile
+    if pil_format == "WEBP":
+        save_options["method"] = 4
+    else:
+        save_options["optimize"] = True
+        save_options["progressive"] = True
+    # Nothing else from the source (EXIF, XMP, comments) is passed to the encoder
+    image.save(buffer, pil_format, **save_options)
+    return buffer.getvalue()
+
+
+def render_derivatives(data: bytes, options: Optional[DerivativeOptions] = None) -> Dict[str, RenderedImage]:
+    """
+    Decode an image once and render its display copy and thumbnails.
+
+    Args:
+        data (bytes): Encoded source image (JPEG, PNG, GIF or WebP)
+        options (Optional[DerivativeOptions]): Output format, quality and sizes
+
+    Returns:
+        Dict[str, RenderedImage]: Keyed by variant, "display" and "thumb-<size>"
+
+    Raises:
+        DerivativeError: If the image cannot be decoded
+    """
+    options = options or DerivativeOptions()
+    if options.format not in OUTPUT_FORMATS:
+        raise DerivativeError(f"Unsupported derivative format: {options.format}")
+    try:
+        with _open(data, options.max_edge) as source:
+            icc_profile = source.info.get("icc_profile")
+            image = ImageOps.exif_transpose(source)
+            has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+            mode = "RGBA" if has_alpha and options.format == "webp" else "RGB"
+            image = image.convert(mode)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise DerivativeError(f"Cannot decode image: {str(e)}")
+
+    if max(image.size) > options.max_edge:
+        image.thumbnail((options.max_edge, options.max_edge), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    rendered = {
+        "display": RenderedImage(
+            "display", _encode(image, options, options.quality, icc_profile), *image.size
+        )
+    }
+    # Thumbnails share one centre crop, so each is cut from the next larger one
+    for size in sorted(options.thumbnail_sizes, reverse=True):
+        thumb = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        variant = f"thumb-{size}"
+        rendered[variant] = RenderedImage(
+            variant, _encode(thumb, options, options.thumbnail_quality, icc_profile), size, size
+        )
+        image = thumb
+    return rendered
+
+
+@dataclass
+class DerivativeManifest:
+    """Links derivatives to the original upload they were rendered from"""
+    original_cid: str
+    original_name: str
+    original_bytes: int
+    status: str = "pending"
+    error: Optional[str] = None
+    variants: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def to_json(self) -> bytes:
+        return json.dumps(asdict(self)).encode()
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "DerivativeManifest":
+        return cls(**json.loads(data))
+
+
+class MediaPipeline:
+    """
+    Renders, stores and serves derivatives of uploaded images.
+
+    ``schedule`` returns immediately; rendering runs in the executor and the
+    uploads on the event loop. Each derivative is stored as
+    ``<original cid>.<variant>.<ext>`` next to a ``<original cid>.derivatives.json``
+    manifest, so any process can find them from the original's CID alone.
+    """
+
+    def __init__(
+        self,
+        storage: StorageProvider,
+        bucket_name: str,
+        cache: CIDCache,
+        options: Optional[DerivativeOptions] = None,
+        executor: Optional[Executor] = None,
+        workers: int = 2,
+        cutouts: Optional[CutoutStage] = None
+    ):
+        """
+        Args:
+            storage (StorageProvider): Where derivatives and manifests are stored
+            bucket_name (str): Bucket for derivatives and manifests, kept apart from the originals'
+            cache (CIDCache): Local cache that derivatives are served from
+            options (Optional[DerivativeOptions]): Output format, quality and sizes
+            executor (Optional[Executor]): Pool for rendering; a thread pool of ``workers`` by default
+            workers (int): Size of the default thread pool
+            cutouts (Optional[CutoutStage]): Adds a ``cutout`` variant with the background removed
+        """
+        self.storage = storage
+        self.bucket_name = bucket_name
+        self.cache = cache
+        self.options = options or DerivativeOptions()
+        self.executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media")
+        self.cutouts = cutouts
+        self.manifest_dir = cache.root / "manifests"
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        self._tasks: Set[asyncio.Task] = set()
+        self._render_latency = RollingLatency()
+        self._serve_latency = RollingLatency()
+        self._bytes = {"originals": 0, "display": 0, "thumbnails": 0, "cutouts": 0}
+
+    @staticmethod
+    def _check_cid(cid: str) -> str:
+        if not cid or not cid.isalnum():
+            raise DerivativeError(f"Invalid CID: {cid!r}")
+        return cid
+
+    def _manifest_path(self, original_cid: str) -> Path:
+        return self.manifest_dir / f"{self._check_cid(original_cid)}.json"
+
+    def _save_manifest(self, manifest: DerivativeManifest) -> None:
+        path = self._manifest_path(manifest.original_cid)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.part")
+        tmp_path.write_bytes(manifest.to_json())
+        os.replace(tmp_path, path)
+
+    # Producing derivatives
+
+    def schedule(self, original_cid: str, data: bytes, file_name: str) -> DerivativeManifest:
+        """Start rendering derivatives of a stored original in the background"""
+        manifest = DerivativeManifest(original_cid, file_name, len(data))
+        self._save_manifest(manifest)
+        task = asyncio.create_task(self.process(manifest, data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return manifest
+
+    async def process(self, manifest: DerivativeManifest, data: bytes) -> DerivativeManifest:
+        """Render, store and cache every derivative, then publish the manifest"""
+        _, media_type = OUTPUT_FORMATS[self.options.format]
+        loop = asyncio.get_running_loop()
+        try:
+            with self._render_latency.time():
+                rendered = await loop.run_in_executor(self.executor, render_derivatives, data, self.options)
+            for variant, image in rendered.items():
+                await self._store_variant(
+                    manifest, variant, self.options.format, media_type, image.data, image.width, image.height
+                )
+            if self.cutouts is not None:
+                try:
+                    cutout = await self.cutouts.cut(data)
+                    if cutout is not None:
+                        await self._store_variant(
+                            manifest, "cutout", "png", "image/png", cutout.data, cutout.width, cutout.height,
+                            box=list(cutout.box), hand=cutout.hand,
+                        )
+                except BackgroundRemovalError as e:
+                    # The display copy and thumbnails are still useful without it
+                    logger.warning(f"Cutout for {manifest.original_cid} failed: {str(e)}")
+            manifest.status = "ready"
+            await self.storage.upload_file(
+                self.bucket_name, manifest.to_json(), f"{manifest.original_cid}.derivatives.json"
+            )
+            self._bytes["originals"] += manifest.original_bytes
+            for variant, info in manifest.variants.items():
+                kind = {"display": "display", "cutout": "cutouts"}.get(variant, "thumbnails")
+                self._bytes[kind] += info["bytes"]
+        except Exception as e:
+            logger.warning(f"Derivatives for {manifest.original_cid} failed: {str(e)}")
+            manifest.status = "failed"
+            manifest.error = str(e)
+        self._save_manifest(manifest)
+        return manifest
+
+    async def _store_variant(
+        self,
+        manifest: DerivativeManifest,
+        variant: str,
+        ext: str,
+        media_type: str,
+        data: bytes,
+        width: int,
+        height: int,
+        **extra: Any
+    ) -> None:
+        name = f"{manifest.original_cid}.{variant}.{ext}"
+        cid = await self.storage.upload_file(self.bucket_name, data, name)
+        content_cid = compute_raw_cid(data)
+        await asyncio.to_thread(self.cache.put, content_cid, data)
+        manifest.variants[variant] = {
+            "name": name,
+            "cid": cid,
+            "content_cid": content_cid,
+            "media_type": media_type,
+            "bytes": len(data),
+            "width": width,
+            "height": height,
+            **extra,
+        }
+
+    async def drain(self) -> None:
+        """Wait for in-flight derivative jobs, e.g. on shutdown"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    # Serving derivatives
+
+    async def manifest(self, original_cid: str) -> Optional[DerivativeManifest]:
+        """Local manifest, falling back to the one stored next to the derivatives"""
+        path = self._manifest_path(original_cid)
+        try:
+            return DerivativeManifest.from_json(await asyncio.to_thread(path.read_bytes))
+        except FileNotFoundError:
+            pass
+        tmp_path = self.cache.temp_path()
+        try:
+            await self.storage.download_file(
+                self.bucket_name, f"{original_cid}.derivatives.json", str(tmp_path)
+            )
+            manifest = DerivativeManifest.from_json(tmp_path.read_bytes())
+        except Exception:
+            return None
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self._save_manifest(manifest)
+        return manifest
+
+    async def variant_path(self, original_cid: str, variant: str) -> Tuple[Path, Dict[str, Any]]:
+        """
+        Local file holding one derivative, fetched from storage on a cache miss.
+
+        Raises:
+            DerivativeError: If the original has no such derivative (yet)
+        """
+        with self._serve_latency.time():
+            manifest = await self.manifest(original_cid)
+            if manifest is None:
+                raise DerivativeError(f"No derivatives for {original_cid}")
+            info = manifest.variants.get(variant)
+            if info is None:
+                raise DerivativeError(f"Derivative {variant} of {original_cid} is {manifest.status}")
+            path = await asyncio.to_thread(self.cache.lookup, info["content_cid"])
+            if path is None:
+                tmp_path = self.cache.temp_path()
+                try:
+                    await self.storage.download_file(self.bucket_name, info["name"], str(tmp_path))
+                    path = await asyncio.to_thread(self.cache.commit, info["content_cid"], tmp_path)
+                finally:
+                    tmp_path.unlink(missing_ok=True)
+            return path, info
+
+    def metrics(self) -> Dict[str, Any]:
+        """Bytes stored for previews versus originals, and render/serve latency"""
+        originals = self._bytes["originals"]
+        return {
+            "bytes": dict(self._bytes),
+            "display_reduction": 1 - self._bytes["display"] / originals if originals else None,
+            "render": self._render_latency.snapshot(),
+            "serve": self._serve_latency.snapshot(),
+            "pending": len(self._tasks),
+            "cutouts": self.cutouts.metrics() if self.cutouts is not None else None,
+        }
+
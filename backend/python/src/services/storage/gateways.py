@@ -0,0 +1,273 @@
+import asyncio
+import base64
+import hashlib
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Multicodec / multihash codes needed to check raw-block CIDs
+_RAW_CODEC = 0x55
+_SHA2_256 = 0x12
+_IDENTITY = 0x00
+
+
+class ContentVerificationError(Exception):
+    """Raised when content returned by a gateway does not hash to the requested CID"""
+    pass
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def expected_digest(cid: str) -> Optional[Tuple[str, bytes]]:
+    """
+    Return (hash name, digest) that the raw content of ``cid`` must match.
+
+    Only CIDv1 raw-codec CIDs in base32 address the file bytes directly. dag-pb
+    (UnixFS) CIDs hash an encoded DAG root, which cannot be checked against the
+    plain file body, so None is returned for those.
+    """
+    if not cid.startswith("b"):
+        return None
+    encoded = cid[1:].upper()
+    try:
+        raw = base64.b32decode(encoded + "=" * (-len(encoded) % 8))
+        version, pos = _read_varint(raw, 0)
+        codec, pos = _read_varint(raw, pos)
+        hash_code, pos = _read_varint(raw, pos)
+        length, pos = _read_varint(raw, pos)
+    except (ValueError, IndexError):
+        return None
+    digest = raw[pos:pos + length]
+    if version != 1 or codec != _RAW_CODEC or len(digest) != length:
+        return None
+    if hash_code == _SHA2_256:
+        return "sha256", digest
+    if hash_code == _IDENTITY:
+        return "identity", digest
+    return None
+
+
+def verify_cid(cid: str, content: bytes) -> Optional[bool]:
+    """True/False for verifiable CIDs, None when the CID type cannot be checked"""
+    expected = expected_digest(cid)
+    if expected is None:
+        return None
+    name, digest = expected
+    if name == "identity":
+        return bytes(content) == digest
+    return hashlib.sha256(content).digest() == digest
+
+
+def compute_raw_cid(content: bytes) -> str:
+    """CIDv1 (raw codec, sha2-256, base32) for a byte string"""
+    digest = hashlib.sha256(content).digest()
+    raw = (
+        _encode_varint(1) + _encode_varint(_RAW_CODEC)
+        + _encode_varint(_SHA2_256) + _encode_varint(len(digest)) + digest
+    )
+    return "b" + base64.b32encode(raw).decode().lower().rstrip("=")
+
+
+class GatewayStats:
+    """Rolling latency samples and error rate for one gateway"""
+
+    def __init__(self, window: int = 100, error_decay: float = 0.2):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.error_rate = 0.0
+        self.loss_rate = 0.0
+        self.error_decay = error_decay
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+
+    def _quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self._quantile(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self._quantile(0.95)
+
+    def record_success(self, latency: float) -> None:
+        self.requests += 1
+        self.wins += 1
+        self.latencies.append(latency)
+        self.error_rate *= 1 - self.error_decay
+        self.loss_rate *= 1 - self.error_decay
+
+    def record_error(self) -> None:
+        self.requests += 1
+        self.errors += 1
+        self.error_rate = self.error_rate * (1 - self.error_decay) + self.error_decay
+
+    def record_cancelled(self, elapsed: float, winner_latency: Optional[float] = None) -> None:
+        """
+        A hedged attempt was cancelled before it answered.
+
+        Its elapsed time is only a lower bound, and a loser that was hedged late
+        is cancelled almost at once, so it is not a latency sample by itself.
+        When another gateway won, the loser is recorded as at least as slow as
+        the winner and its loss rate rises; when the whole race was cancelled
+        nothing is learned.
+        """
+        self.requests += 1
+        if winner_latency is not None:
+            self.latencies.append(max(elapsed, winner_latency))
+            self.loss_rate = self.loss_rate * (1 - self.error_decay) + self.error_decay
+
+    def score(self, penalty: float = 4.0) -> float:
+        """Lower is better: median latency inflated by the recent error and hedge-loss rates"""
+        p50 = self.p50
+        return (p50 if p50 is not None else 0.0) * (1 + penalty * self.error_rate + self.loss_rate) + self.error_rate
+
+
+class GatewayPool:
+    """
+    Ranks a set of IPFS gateways and races hedged requests across them.
+
+    The best-ranked gateway is tried first. If it has not answered within its
+    own observed p95 (clamped to [min_hedge_delay, max_hedge_delay]), the next
+    gateway is started as well; whichever answers first with acceptable content
+    wins and the others are cancelled. Failures fail over to the next gateway
+    immediately.
+    """
+
+    def __init__(
+        self,
+        gateways: List[str],
+        initial_hedge_delay: float = 0.5,
+        min_hedge_delay: float = 0.05,
+        max_hedge_delay: float = 2.0,
+        max_parallel: int = 2
+    ):
+        """
+        Args:
+            gateways (List[str]): URL templates containing ``{cid}``
+            initial_hedge_delay (float): Hedge delay used before a gateway has samples
+            min_hedge_delay (float): Lower bound for the adaptive hedge delay
+            max_hedge_delay (float): Upper bound for the adaptive hedge delay
+            max_parallel (int): Maximum concurrent attempts for one retrieval
+        """
+        if not gateways:
+            raise ValueError("At least one gateway is required")
+        self.gateways = list(dict.fromkeys(gateways))
+        self.stats: Dict[str, GatewayStats] = {gateway: GatewayStats() for gateway in self.gateways}
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.max_parallel = max_parallel
+
+    def ranked(self) -> List[str]:
+        """Gateways ordered best first; configuration order breaks ties"""
+        order = {gateway: index for index, gateway in enumerate(self.gateways)}
+        return sorted(self.gateways, key=lambda g: (self.stats[g].score(), order[g]))
+
+    def hedge_delay(self, gateway: str) -> float:
+        p95 = self.stats[gateway].p95
+        if p95 is None:
+            return self.initial_hedge_delay
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, p95))
+
+    async def race(self, fetch: Callable[[str], Awaitable[T]]) -> T:
+        """
+        Run ``fetch(gateway)`` with hedging and failover and return the first success.
+
+        ``fetch`` should raise (for example ContentVerificationError) to reject a
+        response; the next gateway is then tried.
+
+        Raises:
+            Exception: The last error when every gateway fails
+        """
+        candidates = self.ranked()
+        running: Dict[asyncio.Task, Tuple[str, float]] = {}
+        last_error: Optional[BaseException] = None
+
+        def launch() -> str:
+            gateway = candidates.pop(0)
+            running[asyncio.create_task(fetch(gateway))] = (gateway, time.monotonic())
+            return gateway
+
+        winner_latency: Optional[float] = None
+        primary = launch()
+        try:
+            while running:
+                timeout = None
+                if candidates and len(running) < self.max_parallel:
+                    timeout = self.hedge_delay(primary)
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Primary is slower than its usual tail: hedge on the next gateway
+                    primary = launch()
+                    continue
+                # Score every finished task, even when two succeed in the same wakeup
+                winner: Optional[asyncio.Task] = None
+                for task in done:
+                    gateway, started = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        latency = time.monotonic() - started
+                        self.stats[gateway].record_success(latency)
+                        if winner is None:
+                            winner, winner_latency = task, latency
+                        continue
+                    self.stats[gateway].record_error()
+                    last_error = error
+                if winner is not None:
+                    return winner.result()
+                if candidates and len(running) < self.max_parallel:
+                    primary = launch()
+            raise last_error
+        finally:
+            now = time.monotonic()
+            for task, (gateway, started) in running.items():
+                task.cancel()
+                self.stats[gateway].record_cancelled(now - started, winner_latency)
+            # Let the losers unwind (close their responses) before returning
+            await asyncio.gather(*running, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-gateway metrics for logging or an admin endpoint"""
+        return {
+            gateway: {
+                "p50": stats.p50,
+                "p95": stats.p95,
+                "error_rate": stats.error_rate,
+                "loss_rate": stats.loss_rate,
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "wins": stats.wins,
+                "score": stats.score(),
+            }
+            for gateway, stats in self.stats.items()
+        }
@@ -0,0 +1,182 @@
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Optional, Tuple, Union
+from .base import StorageProvider
+from .gateways import compute_raw_cid
+
+
+class LocalStorageError(Exception):
+    """Custom exception for local storage errors"""
+    pass
+
+
+class LocalStorageService(StorageProvider):
+    """
+    Disk-backed storage provider, used as the hot tier in front of remote storage.
+
+    Files live at ``root/<bucket>/<file name>`` and are written atomically. The
+    tier is bounded by total size and file age; reads refresh a file's mtime so
+    size eviction drops the least recently used files first. Files reported by
+    ``is_pinned`` (for example ones still replicating) are never evicted.
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path],
+        max_bytes: int = 10 * 1024 * 1024 * 1024,
+        max_age: Optional[float] = 7 * 24 * 3600,
+        is_pinned: Optional[Callable[[str, str], bool]] = None,
+        scan_interval: float = 60.0
+    ):
+        """
+        Args:
+            root (Union[str, Path]): Directory holding the tier
+            max_bytes (int): Size budget for the tier
+            max_age (Optional[float]): Seconds since last access after which files are evicted
+            is_pinned (Optional[Callable[[str, str], bool]]): Returns True for (bucket, name)
+                pairs that must not be evicted
+            scan_interval (float): Minimum seconds between directory scans while under budget
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.is_pinned = is_pinned or (lambda bucket, name: False)
+        self.scan_interval = scan_interval
+        # Running estimate of tier size so writes only trigger a full scan when needed
+        self._approx_bytes: Optional[int] = None
+        self._last_scan = 0.0
+
+    @staticmethod
+    def _check_part(part: str) -> str:
+        if not part or part.startswith(".") or "/" in part or "\\" in part:
+            raise LocalStorageError(f"Invalid storage key: {part!r}")
+        return part
+
+    def path_for(self, bucket_name: str, file_name: str) -> Path:
+        return self.root / self._check_part(bucket_name) / self._check_part(file_name)
+
+    def exists(self, bucket_name: str, file_name: str) -> bool:
+        return self.path_for(bucket_name, file_name).is_file()
+
+    async def upload_file(
+        self,
+        bucket_name: str,
+        file_data: Union[bytes, BinaryIO],
+        file_name: str
+    ) -> str:
+        """Write file atomically and return its raw-content CID"""
+        data = file_data if isinstance(file_data, bytes) else file_data.read()
+        await asyncio.to_thread(self._write, bucket_name, file_name, data)
+        return compute_raw_cid(data)
+
+    async def list_files(self, bucket_name: str) -> list[str]:
+        """List files in bucket"""
+        bucket_dir = self.root / self._check_part(bucket_name)
+        if not bucket_dir.is_dir():
+            return []
+        return sorted(
+            entry.name for entry in bucket_dir.iterdir()
+            if entry.is_file() and not entry.name.startswith(".")
+        )
+
+    async def download_file(self, bucket_name: str, file_name: str, destination: str) -> str:
+        """Copy a file to destination (in-kernel via sendfile where available)"""
+        source = self.touch(bucket_name, file_name)
+        if source is None:
+            raise LocalStorageError(f"File not found: {bucket_name}/{file_name}")
+        Path(destination).parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(shutil.copyfile, source, destination)
+        return str(destination)
+
+    def touch(self, bucket_name: str, file_name: str) -> Optional[Path]:
+        """Return the local path of a file and mark it recently used, or None"""
+        path = self.path_for(bucket_name, file_name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    async def read_file(self, bucket_name: str, file_name: str) -> bytes:
+        source = self.touch(bucket_name, file_name)
+        if source is None:
+            raise LocalStorageError(f"File not found: {bucket_name}/{file_name}")
+        return await asyncio.to_thread(source.read_bytes)
+
+    async def store_path(self, bucket_name: str, file_name: str, source: Path) -> Path:
+        """Move an already written file into the tier (used for read-through fills)"""
+        path = self.path_for(bucket_name, file_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size = source.stat().st_size
+        await asyncio.to_thread(os.replace, source, path)
+        await asyncio.to_thread(self._maybe_evict, size)
+        return path
+
+    def _write(self, bucket_name: str, file_name: str, data: bytes) -> None:
+        path = self.path_for(bucket_name, file_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{file_name}.{uuid.uuid4().hex}.part")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self._maybe_evict(len(data))
+
+    def _maybe_evict(self, added_bytes: int) -> None:
+        if self._approx_bytes is not None:
+            self._approx_bytes += added_bytes
+        due = time.monotonic() - self._last_scan >= self.scan_interval
+        if self._approx_bytes is None or self._approx_bytes > self.max_bytes or due:
+            self.evict()
+
+    def temp_path(self, bucket_name: str, file_name: str) -> Path:
+        """Temp location on the tier's filesystem, so store_path can rename atomically"""
+        path = self.path_for(bucket_name, file_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f".{file_name}.{uuid.uuid4().hex}.part")
+
+    def evict(self) -> List[Tuple[str, str]]:
+        """Drop expired files, then least recently used files until under budget"""
+        entries = []
+        total = 0
+        for bucket_dir in self.root.iterdir():
+            if not bucket_dir.is_dir() or bucket_dir.name.startswith("."):
+                continue
+            for entry in bucket_dir.iterdir():
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, bucket_dir.name, entry))
+                total += stat.st_size
+
+        now = time.time()
+        evicted = []
+        for mtime, size, bucket_name, path in sorted(entries, key=lambda e: e[0]):
+            expired = self.max_age is not None and now - mtime > self.max_age
+            if not expired and total <= self.max_bytes:
+                break
+            if self.is_pinned(bucket_name, path.name):
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted.append((bucket_name, path.name))
+        self._approx_bytes = total
+        self._last_scan = time.monotonic()
+        return evicted
+
+    def usage(self) -> int:
+        return sum(
+            entry.stat().st_size
+            for bucket_dir in self.root.iterdir()
+            if bucket_dir.is_dir() and not bucket_dir.name.startswith(".")
+            for entry in bucket_dir.iterdir() if not entry.name.startswith(".")
+        )
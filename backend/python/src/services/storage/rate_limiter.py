@@ -0,0 +1,99 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class AsyncTokenBucket:
+    """
+    Token-bucket rate limiter that is safe to share between coroutines.
+
+    Tokens refill continuously at ``rate`` per second up to ``burst``. Waiters
+    queue on a lock, so refill-and-take happens atomically and callers are served
+    in arrival order. The rate adapts to server feedback: a throttle response
+    halves it and pauses the bucket (honouring ``Retry-After`` when given), and
+    each success adds back a fraction of the configured rate.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[int] = None,
+        min_rate: Optional[float] = None,
+        recovery_step: float = 0.05
+    ):
+        """
+        Args:
+            rate (float): Target (and maximum) tokens per second
+            burst (Optional[int]): Bucket capacity. Defaults to one second's worth of tokens
+            min_rate (Optional[float]): Floor for the adaptive rate. Defaults to 10% of rate
+            recovery_step (float): Fraction of the target rate restored per success
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self.min_rate = min_rate if min_rate is not None else self.max_rate * 0.1
+        self.recovery_step = recovery_step
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until ``tokens`` are available and take them"""
+        if tokens > self.capacity:
+            raise ValueError("Cannot acquire more tokens than the bucket capacity")
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                else:
+                    wait = (tokens - self._tokens) / self.rate
+                await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        """Additively restore the rate after a successful request"""
+        if self.rate < self.max_rate:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery_step)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Back off after a 429: halve the rate, drain the bucket and pause if asked"""
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = 0.0
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,605 @@
+"""
+Sharded training-data export and a streaming shard reader.
+
+``export_shards`` groups the objects of a bucket into samples, downloads them
+with bounded concurrency and packs whole samples into numbered tar shards of
+about ``shard_bytes`` each, written locally and optionally uploaded back to
+storage. A sample is a media file plus its sidecars: ``a_017.png``,
+``a_017.label`` and ``a_017.landmarks.json`` become the tar members
+``a_017.png``, ``a_017.label`` and ``a_017.landmarks.json``, stored next to
+each other. A JSON index lists every shard with its size, SHA-256, sample keys
+and label counts.
+
+``ShardReader`` fetches shards ``prefetch`` at a time in background threads,
+reads each one sequentially and yields samples through a shuffle buffer, so a
+training loader makes a few large sequential reads per epoch instead of one
+small request per object.
+"""
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import tarfile
+import tempfile
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
+from .base import StorageProvider
+
+logger = logging.getLogger(__name__)
+
+SHARD_INDEX_VERSION = 1
+MEDIA_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".webp", ".mp4"})
+# Sidecars holding a sample's label as plain text; packed as "<key>.label"
+LABEL_SIDECARS = ("label", "label.txt", "cls")
+# Shard exports, and media pipeline derivatives written to the training bucket before
+# they moved to MEDIA_BUCKET, are not training data
+_EXCLUDED = re.compile(r".*(\.(display|cutout|thumb-\d+)\.\w+|\.derivatives\.json|\.index\.json|\.tar)$")
+# PAX header on the first member of each sample, so keys may contain dots
+SAMPLE_KEY_HEADER = "ASL.sample"
+
+
+class ShardError(Exception):
+    """Raised when a shard is missing, corrupt or does not match the index"""
+    pass
+
+
+@dataclass
+class SampleGroup:
+    """Objects of one sample, by the extension they are packed under"""
+    key: str
+    members: Dict[str, str]
+
+
+def object_name(entry: Union[str, Dict[str, Any]]) -> str:
+    """File name from a ``list_files`` entry (plain names, or Akave's file records)"""
+    if isinstance(entry, str):
+        return entry
+    for field_name in ("name", "Name", "fileName", "file_name"):
+        if entry.get(field_name):
+            return entry[field_name]
+    raise ValueError(f"No file name in listing entry: {entry!r}")
+
+
+def group_samples(names: List[str]) -> Tuple[List[SampleGroup], List[str]]:
+    """
+    Group object names into samples.
+
+    Each media file starts a sample keyed by its name without the extension;
+    any other object named ``<key>.<ext>`` joins that sample as a sidecar.
+    Returns the samples sorted by key and the names that belong to none.
+    """
+    groups: Dict[str, SampleGroup] = {}
+    rest = []
+    for name in names:
+        if _EXCLUDED.fullmatch(name):
+            continue
+        suffix = Path(name).suffix
+        if suffix.lower() in MEDIA_EXTENSIONS:
+            key = name[:-len(suffix)]
+            group = groups.setdefault(key, SampleGroup(key, {}))
+            if suffix[1:].lower() in group.members:
+                rest.append(name)  # same key in two media files; keep the first
+            else:
+                group.members[suffix[1:].lower()] = name
+        else:
+            rest.append(name)
+
+    skipped = []
+    for name in rest:
+        # Longest key first, so "a.b.label" joins "a.b.png" rather than "a.png"
+        parts = name.split(".")
+        for cut in range(len(parts) - 1, 0, -1):
+            group = groups.get(".".join(parts[:cut]))
+            if group is not None and ".".join(parts[cut:]) not in group.members:
+                group.members[".".join(parts[cut:])] = name
+                break
+        else:
+            skipped.append(name)
+    return [groups[key] for key in sorted(groups)], skipped
+
+
+def load_labels(path: Union[str, Path]) -> Dict[str, str]:
+    """Labels from a CSV of ``key,label`` rows (a header row is ignored)"""
+    labels = {}
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and row[0].strip() and row[0].strip().lower() != "key":
+                labels[row[0].strip()] = row[1].strip()
+    return labels
+
+
+def label_from_pattern(pattern: str) -> Callable[[str], Optional[str]]:
+    """Label taken from the first group of ``pattern`` matched against the sample key"""
+    compiled = re.compile(pattern)
+
+    def label_for(key: str) -> Optional[str]:
+        match = compiled.search(key)
+        return match.group(1) if match else None
+    return label_for
+
+
+@dataclass
+class ShardInfo:
+    """One tar shard as recorded in the index"""
+    name: str
+    size: int
+    sha256: str
+    samples: int
+    keys: List[str]
+    labels: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class ShardIndex:
+    """Every shard of an export, in write order"""
+    prefix: str
+    source_bucket: str
+    created: float
+    shards: List[ShardInfo] = field(default_factory=list)
+    version: int = SHARD_INDEX_VERSION
+
+    @property
+    def samples(self) -> int:
+        return sum(shard.samples for shard in self.shards)
+
+    @property
+    def labels(self) -> Dict[str, int]:
+        counts: Counter = Counter()
+        for shard in self.shards:
+            counts.update(shard.labels)
+        return dict(sorted(counts.items()))
+
+    def to_json(self) -> bytes:
+        data = asdict(self)
+        data.update(samples=self.samples, labels=self.labels)
+        return json.dumps(data, indent=1).encode()
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "ShardIndex":
+        raw = json.loads(data)
+        if raw.get("version") != SHARD_INDEX_VERSION:
+            raise ShardError(f"Unsupported shard index version: {raw.get('version')}")
+        return cls(
+            prefix=raw["prefix"],
+            source_bucket=raw["source_bucket"],
+            created=raw["created"],
+            shards=[ShardInfo(**shard) for shard in raw["shards"]],
+        )
+
+
+def index_name(prefix: str) -> str:
+    return f"{prefix}.index.json"
+
+
+class _HashingWriter:
+    """File wrapper that hashes and counts everything written through it"""
+
+    def __init__(self, f: BinaryIO):
+        self._f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    def tell(self) -> int:
+        return self.size
+
+
+class ShardWriter:
+    """
+    Packs samples into ``<prefix>-NNNNN.tar`` files in ``directory``.
+
+    A new shard starts when the next sample would take the current one past
+    ``shard_bytes`` or ``max_samples``; samples are never split across shards,
+    so only a single sample larger than ``shard_bytes`` makes a bigger shard.
+    Member headers carry no owner or time, so the same samples give the same
+    bytes.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        prefix: str,
+        shard_bytes: int = 256 * 1024 * 1024,
+        max_samples: Optional[int] = None
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.shard_bytes = shard_bytes
+        self.max_samples = max_samples
+        self.shards: List[ShardInfo] = []
+        self._tar: Optional[tarfile.TarFile] = None
+        self._file: Optional[BinaryIO] = None
+        self._writer: Optional[_HashingWriter] = None
+        self._keys: List[str] = []
+        self._labels: Counter = Counter()
+
+    @property
+    def path(self) -> Path:
+        return self.directory / f"{self.prefix}-{len(self.shards):05d}.tar"
+
+    @staticmethod
+    def _member_bytes(size: int) -> int:
+        return 512 + -(-size // 512) * 512  # header plus padded data
+
+    @staticmethod
+    def _archive_bytes(size: int) -> int:
+        # End-of-archive blocks, then padding to a whole tar record
+        return -(-(size + 1024) // tarfile.RECORDSIZE) * tarfile.RECORDSIZE
+
+    def add(self, key: str, members: Dict[str, Union[bytes, Path]], label: Optional[str] = None) -> Optional[ShardInfo]:
+        """
+        Append one sample; returns the shard closed to make room for it, if any.
+
+        Args:
+            key (str): Sample key; members are stored as ``<key>.<ext>``
+            members (Dict[str, Union[bytes, Path]]): Content by extension, in memory or on disk
+            label (Optional[str]): Stored as ``<key>.label``
+        """
+        if label is not None:
+            members = {**members, "label": label.encode()}
+        sizes = {
+            ext: len(content) if isinstance(content, bytes) else content.stat().st_size
+            for ext, content in members.items()
+        }
+        # Members plus the key header of the first one
+        sample_bytes = sum(self._member_bytes(size) for size in sizes.values()) + 1024
+
+        closed = None
+        if self._tar is not None and (
+            self._archive_bytes(self._writer.size + sample_bytes) > self.shard_bytes
+            or (self.max_samples is not None and len(self._keys) >= self.max_samples)
+        ):
+            closed = self.close()
+        if self._tar is None:
+            self._file = open(self.path.with_suffix(".tar.part"), "wb")
+            self._writer = _HashingWriter(self._file)
+            self._tar = tarfile.open(fileobj=self._writer, mode="w", format=tarfile.PAX_FORMAT)
+
+        for position, ext in enumerate(sorted(members)):
+            info = tarfile.TarInfo(f"{key}.{ext}")
+            info.size = sizes[ext]
+            info.mode = 0o644
+            if position == 0:
+                info.pax_headers = {SAMPLE_KEY_HEADER: key}
+            content = members[ext]
+            if isinstance(content, bytes):
+                self._tar.addfile(info, io.BytesIO(content))
+            else:
+                with open(content, "rb") as f:
+                    self._tar.addfile(info, f)
+        self._keys.append(key)
+        if label is not None:
+            self._labels[label] += 1
+        return closed
+
+    def close(self) -> Optional[ShardInfo]:
+        """Finish the current shard, if one is open, and return its index entry"""
+        if self._tar is None:
+            return None
+        self._tar.close()  # writes the end-of-archive blocks through the hashing writer
+        self._file.close()
+        path = self.path
+        os.replace(path.with_suffix(".tar.part"), path)
+        shard = ShardInfo(
+            name=path.name,
+            size=self._writer.size,
+            sha256=self._writer.sha256.hexdigest(),
+            samples=len(self._keys),
+            keys=self._keys,
+            labels=dict(sorted(self._labels.items())),
+        )
+        self.shards.append(shard)
+        self._tar = self._file = self._writer = None
+        self._keys, self._labels = [], Counter()
+        return shard
+
+
+async def export_shards(
+    storage: StorageProvider,
+    bucket_name: str,
+    directory: Union[str, Path],
+    prefix: str = "asl-train",
+    shard_bytes: int = 256 * 1024 * 1024,
+    max_samples: Optional[int] = None,
+    labels: Optional[Callable[[str], Optional[str]]] = None,
+    require_label: bool = False,
+    concurrency: int = 8,
+    seed: Optional[int] = None,
+    upload_bucket: Optional[str] = None,
+    keep_local: bool = True
+) -> ShardIndex:
+    """
+    Pack the samples in ``bucket_name`` into tar shards.
+
+    Up to ``concurrency`` samples are downloaded at once while shards are
+    written in sample order. A label comes from the sample's label sidecar,
+    otherwise from ``labels(key)``; unlabeled samples are skipped when
+    ``require_label`` is set. With ``seed`` the sample order is shuffled so
+    every shard mixes classes. With ``upload_bucket`` each shard is uploaded
+    as soon as it is complete, followed by the index.
+
+    Args:
+        storage (StorageProvider): Source of the samples, and target of uploads
+        bucket_name (str): Bucket holding the training data
+        directory (Union[str, Path]): Where shards and the index are written
+        prefix (str): Shard and index name prefix
+        shard_bytes (int): Target shard size
+        max_samples (Optional[int]): Maximum samples per shard
+        labels (Optional[Callable[[str], Optional[str]]]): Label for a sample key without a sidecar
+        require_label (bool): Skip samples that have no label
+        concurrency (int): Samples downloaded at once
+        seed (Optional[int]): Shuffle seed for the sample order
+        upload_bucket (Optional[str]): Bucket to upload shards and index to
+        keep_local (bool): Keep local shard files after they are uploaded
+    """
+    directory = Path(directory)
+    started = time.perf_counter()
+    names = [object_name(entry) for entry in await storage.list_files(bucket_name)]
+    groups, skipped = group_samples(names)
+    if skipped:
+        logger.info(f"{len(skipped)} objects in {bucket_name} belong to no sample")
+    if seed is not None:
+        random.Random(seed).shuffle(groups)
+
+    writer = ShardWriter(directory, prefix, shard_bytes=shard_bytes, max_samples=max_samples)
+    staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=directory))
+    uploads: List[asyncio.Task] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(position: int, group: SampleGroup) -> Dict[str, Path]:
+        async with semaphore:
+            sample_dir = staging / str(position)
+            sample_dir.mkdir()
+            paths = {}
+            for ext, name in group.members.items():
+                paths[ext] = Path(await storage.download_file(bucket_name, name, str(sample_dir / ext)))
+            return paths
+
+    async def upload(shard: ShardInfo) -> None:
+        path = directory / shard.name
+        with open(path, "rb") as f:
+            await storage.upload_file(upload_bucket, f, shard.name)
+        if not keep_local:
+            path.unlink()
+
+    def closed(shard: Optional[ShardInfo]) -> None:
+        if shard is not None:
+            logger.info(f"Wrote {shard.name}: {shard.samples} samples, {shard.size} bytes")
+            if upload_bucket:
+                uploads.append(asyncio.create_task(upload(shard)))
+
+    unlabeled = 0
+    # A bounded window of downloads runs ahead of the writer
+    window: Deque[Tuple[int, SampleGroup, asyncio.Task]] = deque()
+    pending = iter(enumerate(groups))
+    try:
+        while True:
+            while len(window) < concurrency * 2:
+                item = next(pending, None)
+                if item is None:
+                    break
+                window.append((*item, asyncio.create_task(fetch(*item))))
+            if not window:
+                break
+            position, group, task = window.popleft()
+            paths = await task
+
+            label = None
+            for ext in LABEL_SIDECARS:
+                if ext in paths:
+                    label = (await asyncio.to_thread(paths.pop(ext).read_text)).strip() or None
+            if label is None and labels is not None:
+                label = labels(group.key)
+            if label is None:
+                unlabeled += 1
+            if label is not None or not require_label:
+                closed(await asyncio.to_thread(writer.add, group.key, paths, label))
+            await asyncio.to_thread(shutil.rmtree, staging / str(position), True)
+        closed(await asyncio.to_thread(writer.close))
+        await asyncio.gather(*uploads)
+    finally:
+        for _, _, task in window:
+            task.cancel()
+        for task in uploads:
+            task.cancel()
+        shutil.rmtree(staging, ignore_errors=True)
+
+    index = ShardIndex(prefix=prefix, source_bucket=bucket_name, created=time.time(), shards=writer.shards)
+    (directory / index_name(prefix)).write_bytes(index.to_json())
+    if upload_bucket:
+        await storage.upload_file(upload_bucket, index.to_json(), index_name(prefix))
+    logger.info(
+        f"Exported {index.samples} samples in {len(index.shards)} shards from {bucket_name} "
+        f"in {time.perf_counter() - started:.1f}s ({unlabeled} unlabeled)"
+    )
+    return index
+
+
+def _verify(path: Path, shard: ShardInfo) -> None:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            sha256.update(chunk)
+    if sha256.hexdigest() != shard.sha256:
+        raise ShardError(f"Checksum mismatch for {shard.name}")
+
+
+def local_shards(directory: Union[str, Path]) -> Callable[[ShardInfo], Path]:
+    """Fetcher for shards already on a local or mounted filesystem"""
+    directory = Path(directory)
+
+    def fetch(shard: ShardInfo) -> Path:
+        path = directory / shard.name
+        if not path.is_file() or path.stat().st_size != shard.size:
+            raise ShardError(f"Shard missing or truncated: {path}")
+        return path
+    return fetch
+
+
+def storage_shards(
+    storage: StorageProvider,
+    bucket_name: str,
+    cache_dir: Union[str, Path]
+) -> Callable[[ShardInfo], Path]:
+    """
+    Fetcher that downloads shards from storage into ``cache_dir``.
+
+    Downloads are checked against the index checksum; a shard already in the
+    cache with the right size is reused, so later epochs read from disk.
+    Runs in reader threads, each with its own event loop.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def fetch(shard: ShardInfo) -> Path:
+        path = cache_dir / shard.name
+        if path.is_file() and path.stat().st_size == shard.size:
+            return path
+        part = path.with_name(f".{shard.name}.{os.getpid()}.{id(shard)}.part")
+        try:
+            asyncio.run(storage.download_file(bucket_name, shard.name, str(part)))
+            _verify(part, shard)
+            os.replace(part, path)
+        finally:
+            part.unlink(missing_ok=True)
+        return path
+    return fetch
+
+
+async def load_index(storage: StorageProvider, bucket_name: str, prefix: str) -> ShardIndex:
+    """Download and parse an export's index from storage"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = await storage.download_file(bucket_name, index_name(prefix), str(Path(tmp) / "index.json"))
+        return ShardIndex.from_json(Path(path).read_bytes())
+
+
+class ShardReader:
+    """
+    Iterates the samples of an export, shard by shard.
+
+    Each epoch visits this reader's shards in a seeded random order; while one
+    shard is read, the next ``prefetch`` are fetched in background threads.
+    Samples pass through a buffer of ``shuffle_buffer`` from which they are
+    drawn at random, mixing samples across shards. With ``partition=(i, n)``
+    only every n-th shard from the i-th is read, which splits an epoch between
+    data-loader workers or hosts.
+
+    Samples are dicts of member bytes by extension plus ``__key__`` and
+    ``__shard__``; the label, if any, is decoded to ``str``.
+    """
+
+    def __init__(
+        self,
+        index: ShardIndex,
+        fetch: Callable[[ShardInfo], Path],
+        prefetch: int = 4,
+        shuffle_buffer: int = 1000,
+        seed: Optional[int] = None,
+        partition: Tuple[int, int] = (0, 1)
+    ):
+        """
+        Args:
+            index (ShardIndex): Export to read
+            fetch (Callable[[ShardInfo], Path]): Makes a shard available locally, e.g. ``storage_shards(...)``
+            prefetch (int): Shards fetched ahead of the one being read
+            shuffle_buffer (int): Samples held for shuffling; 1 keeps shard order
+            seed (Optional[int]): Base seed for shard order and sample shuffling
+            partition (Tuple[int, int]): (this reader, number of readers)
+        """
+        rank, count = partition
+        if not 0 <= rank < count:
+            raise ValueError(f"Invalid partition {partition}")
+        self.index = index
+        self.fetch = fetch
+        self.prefetch = max(1, prefetch)
+        self.shuffle_buffer = max(1, shuffle_buffer)
+        self.seed = seed
+        self.shards = index.shards[rank::count]
+        self.epoch = 0
+
+    def __len__(self) -> int:
+        return sum(shard.samples for shard in self.shards)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        epoch = self.epoch
+        self.epoch += 1
+        return self.samples(epoch)
+
+    def samples(self, epoch: int = 0) -> Iterator[Dict[str, Any]]:
+        """Samples of one epoch; the same seed and epoch give the same order"""
+        rng = random.Random(None if self.seed is None else f"{self.seed}:{epoch}")
+        order = list(self.shards)
+        rng.shuffle(order)
+
+        buffer: List[Dict[str, Any]] = []
+        for sample in self._read(order):
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(sample)
+                continue
+            slot = rng.randrange(len(buffer))
+            buffer[slot], sample = sample, buffer[slot]
+            yield sample
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def _read(self, order: List[ShardInfo]) -> Iterator[Dict[str, Any]]:
+        executor = ThreadPoolExecutor(max_workers=self.prefetch, thread_name_prefix="shard-fetch")
+        futures: Deque[Tuple[ShardInfo, Future]] = deque()
+        try:
+            upcoming = iter(order)
+            for shard in upcoming:
+                futures.append((shard, executor.submit(self.fetch, shard)))
+                if len(futures) >= self.prefetch:
+                    break
+            while futures:
+                shard, future = futures.popleft()
+                path = future.result()
+                following = next(upcoming, None)
+                if following is not None:
+                    futures.append((following, executor.submit(self.fetch, following)))
+                yield from read_shard(path, shard.name)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def read_shard(path: Union[str, Path], name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Samples of one shard, read front to back in a single pass"""
+    name = name or Path(path).name
+    sample: Dict[str, Any] = {}
+    try:
+        with tarfile.open(path, mode="r|") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                key = member.pax_headers.get(SAMPLE_KEY_HEADER)
+                if key is None and sample and member.name.startswith(sample["__key__"] + "."):
+                    key = sample["__key__"]
+                elif key is None:
+                    key = member.name.partition(".")[0]  # tars from elsewhere: key up to the first dot
+                if sample and key != sample["__key__"]:
+                    yield sample
+                    sample = {}
+                if not sample:
+                    sample = {"__key__": key, "__shard__": name}
+                ext = member.name[len(key) + 1:]
+                data = tar.extractfile(member).read()
+                sample[ext] = data.decode() if ext == "label" else data
+    except tarfile.TarError as e:
+        raise ShardError(f"Corrupt shard {name}: {e}")
+    if sample:
+        yield sample
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+from .base import StorageProvider
+from ...storacha_client import StorachaClient, StorachaError
+
+
+class StorachaStorageService(StorageProvider):
+    """
+    StorageProvider adapter over the content-addressed StorachaClient.
+
+    Storacha has no buckets or file names, so a small SQLite index maps
+    ``bucket/file name`` to the uploaded CID. Like ``CIDCache``, the index is
+    shared by every worker process using the same path, and each lookup reads
+    it, so an upload made by one worker is visible to the others.
+    """
+
+    def __init__(self, client: StorachaClient, index_path: Union[str, Path]):
+        self.client = client
+        self.index_path = Path(index_path)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+        with self._lock:
+            self._db().execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    bucket TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    cid TEXT NOT NULL,
+                    PRIMARY KEY (bucket, name)
+                )
+                """
+            )
+
+    def _db(self) -> sqlite3.Connection:
+        """Return this process's connection; connections are never shared across fork"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(
+                self.index_path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def get_cid(self, bucket_name: str, file_name: str) -> str:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT cid FROM files WHERE bucket = ? AND name = ?", (bucket_name, file_name)
+            ).fetchone()
+        if row is None:
+            raise StorachaError(f"File not found: {bucket_name}/{file_name}")
+        return row[0]
+
+    async def upload_file(
+        self,
+        bucket_name: str,
+        file_data: Union[bytes, BinaryIO],
+        file_name: str
+    ) -> str:
+        """Upload file and return CID"""
+        data = file_data if isinstance(file_data, bytes) else file_data.read()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # StorachaClient names uploads after the file on disk
+            file_path = Path(tmp_dir) / file_name
+            await asyncio.to_thread(file_path.write_bytes, data)
+            cid = await self.client.upload_file(file_path)
+        await asyncio.to_thread(self._record, bucket_name, file_name, cid)
+        return cid
+
+    async def list_files(self, bucket_name: str) -> list[str]:
+        """List files in bucket"""
+        return await asyncio.to_thread(self._names, bucket_name)
+
+    async def download_file(self, bucket_name: str, file_name: str, destination: str) -> str:
+        cid = self.get_cid(bucket_name, file_name)
+        await self.client.retrieve_file(cid, save_path=Path(destination))
+        return str(destination)
+
+    def _record(self, bucket_name: str, file_name: str, cid: str) -> None:
+        # A single upsert row: concurrent writers only ever touch their own entry
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO files (bucket, name, cid) VALUES (?, ?, ?)",
+                (bucket_name, file_name, cid)
+            )
+
+    def _names(self, bucket_name: str) -> list[str]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT name FROM files WHERE bucket = ? ORDER BY name", (bucket_name,)
+            ).fetchall()
+        return [row[0] for row in rows]
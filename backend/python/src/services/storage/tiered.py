@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import shutil
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Set, Union
+from .base import StorageProvider
+from .local import LocalStorageService
+from ...core.metrics import RollingLatency
+
+logger = logging.getLogger(__name__)
+
+HOT_TIER = "local"
+
+
+class TieredStorageError(Exception):
+    """Raised when no tier can serve a request"""
+    pass
+
+
+class TieredStorageService(StorageProvider):
+    """
+    Composite provider: a local hot tier in front of replicated remote tiers.
+
+    Uploads are written to the hot tier and return immediately; replication to
+    every remote tier (e.g. Akave and Storacha) runs in the background with
+    retries. Files stay pinned in the hot tier until every replica has them, and
+    a pending marker on disk lets ``resume_pending`` finish replication after a
+    restart. Reads are served from the hot tier when possible, otherwise from
+    the remote tier with the lowest observed download latency, falling back
+    through the others; remote reads fill the hot tier.
+    """
+
+    def __init__(
+        self,
+        hot: LocalStorageService,
+        replicas: Dict[str, StorageProvider],
+        replication_attempts: int = 5,
+        retry_delay: float = 2.0
+    ):
+        """
+        Args:
+            hot (LocalStorageService): Local tier that takes every write
+            replicas (Dict[str, StorageProvider]): Remote tiers by name, e.g. {"akave": ..., "storacha": ...}
+            replication_attempts (int): Attempts per replica before giving up until resume_pending
+            retry_delay (float): Base delay in seconds for exponential replication backoff
+        """
+        self.hot = hot
+        self.replicas = replicas
+        self.replication_attempts = replication_attempts
+        self.retry_delay = retry_delay
+        self.hot.is_pinned = self.is_pending
+        self._pending_dir = self.hot.root / ".pending"
+        self._tasks: Set[asyncio.Task] = set()
+        self._metrics: Dict[str, Dict[str, RollingLatency]] = defaultdict(
+            lambda: defaultdict(RollingLatency)
+        )
+
+    # Replication bookkeeping
+
+    def _marker(self, bucket_name: str, file_name: str) -> Path:
+        self.hot.path_for(bucket_name, file_name)  # validates the key
+        return self._pending_dir / bucket_name / file_name
+
+    def is_pending(self, bucket_name: str, file_name: str) -> bool:
+        return self._marker(bucket_name, file_name).exists()
+
+    def _pending_tiers(self, bucket_name: str, file_name: str) -> Set[str]:
+        try:
+            return set(json.loads(self._marker(bucket_name, file_name).read_text()))
+        except FileNotFoundError:
+            return set()
+
+    def _write_marker(self, bucket_name: str, file_name: str, tiers: Set[str]) -> None:
+        marker = self._marker(bucket_name, file_name)
+        if not tiers:
+            marker.unlink(missing_ok=True)
+            return
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.write_text(json.dumps(sorted(tiers)))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _replicate(self, tier: str, bucket_name: str, file_name: str) -> None:
+        for attempt in range(self.replication_attempts):
+            try:
+                data = await self.hot.read_file(bucket_name, file_name)
+                with self._metrics[tier]["upload"].time():
+                    await self.replicas[tier].upload_file(bucket_name, data, file_name)
+                remaining = self._pending_tiers(bucket_name, file_name) - {tier}
+                self._write_marker(bucket_name, file_name, remaining)
+                return
+            except Exception as e:
+                logger.warning(
+                    f"Replication of {bucket_name}/{file_name} to {tier} failed "
+                    f"(attempt {attempt + 1}/{self.replication_attempts}): {str(e)}"
+                )
+                if attempt + 1 < self.replication_attempts:
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+        logger.error(f"Giving up replicating {bucket_name}/{file_name} to {tier} until resume_pending")
+
+    async def resume_pending(self) -> int:
+        """Restart replication for every file left pending by a previous process"""
+        resumed = 0
+        if not self._pending_dir.is_dir():
+            return resumed
+        for bucket_dir in self._pending_dir.iterdir():
+            for marker in bucket_dir.iterdir():
+                for tier in self._pending_tiers(bucket_dir.name, marker.name) & set(self.replicas):
+                    self._spawn(self._replicate(tier, bucket_dir.name, marker.name))
+                    resumed += 1
+        return resumed
+
+    async def drain(self) -> None:
+        """Wait for in-flight replication, e.g. on shutdown"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    # StorageProvider interface
+
+    async def upload_file(
+        self,
+        bucket_name: str,
+        file_data: Union[bytes, BinaryIO],
+        file_name: str
+    ) -> str:
+        """
+        Write to the hot tier, schedule replication and return the hot tier's CID.
+
+        The returned CID is the raw-content CID the local tier computes. Remote
+        tiers assign their own identifiers (Storacha wraps uploads in a UnixFS
+        DAG, Akave uses its own), so callers address files by bucket and name,
+        not by this CID.
+        """
+        data = file_data if isinstance(file_data, bytes) else file_data.read()
+        # Mark pending before the write so eviction can never race the new file
+        self._write_marker(bucket_name, file_name, set(self.replicas))
+        with self._metrics[HOT_TIER]["upload"].time():
+            cid = await self.hot.upload_file(bucket_name, data, file_name)
+        for tier in self.replicas:
+            self._spawn(self._replicate(tier, bucket_name, file_name))
+        return cid
+
+    async def list_files(self, bucket_name: str) -> list[str]:
+        """Union of the files known to every reachable tier"""
+        results = await asyncio.gather(
+            self.hot.list_files(bucket_name),
+            *[self._timed(tier, "list", provider.list_files(bucket_name))
+              for tier, provider in self.replicas.items()],
+            return_exceptions=True
+        )
+        files: Set[str] = set()
+        for tier, result in zip([HOT_TIER, *self.replicas], results):
+            if isinstance(result, Exception):
+                logger.warning(f"Listing {bucket_name} on {tier} failed: {str(result)}")
+                continue
+            files.update(result)
+        return sorted(files)
+
+    async def download_file(self, bucket_name: str, file_name: str, destination: str) -> str:
+        """Serve from the fastest tier holding the file, filling the hot tier on remote reads"""
+        if self.hot.exists(bucket_name, file_name):
+            with self._metrics[HOT_TIER]["download"].time():
+                return await self.hot.download_file(bucket_name, file_name, destination)
+
+        errors: List[str] = []
+        for tier in self._ranked_replicas():
+            tmp_path = self.hot.temp_path(bucket_name, file_name)
+            try:
+                await self._timed(
+                    tier, "download",
+                    self.replicas[tier].download_file(bucket_name, file_name, str(tmp_path))
+                )
+                cached = await self.hot.store_path(bucket_name, file_name, tmp_path)
+                Path(destination).parent.mkdir(parents=True, exist_ok=True)
+                await asyncio.to_thread(shutil.copyfile, cached, destination)
+                return str(destination)
+            except Exception as e:
+                errors.append(f"{tier}: {str(e)}")
+            finally:
+                tmp_path.unlink(missing_ok=True)
+        raise TieredStorageError(
+            f"No tier could serve {bucket_name}/{file_name}: {'; '.join(errors) or 'no replicas'}"
+        )
+
+    def _ranked_replicas(self) -> List[str]:
+        """Remote tiers ordered by median download latency; untried tiers keep config order"""
+        order = {tier: index for index, tier in enumerate(self.replicas)}
+
+        def key(tier: str):
+            stats = self._metrics[tier]["download"]
+            penalty = stats.errors / (stats.count + stats.errors) if stats.errors else 0.0
+            return (penalty > 0.5, stats.p50 or 0.0, order[tier])
+
+        return sorted(self.replicas, key=key)
+
+    async def _timed(self, tier: str, operation: str, awaitable) -> Any:
+        with self._metrics[tier][operation].time():
+            return await awaitable
+
+    def metrics(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Per-tier, per-operation latency and error counts"""
+        snapshot = {
+            tier: {operation: stats.snapshot() for operation, stats in operations.items()}
+            for tier, operations in self._metrics.items()
+        }
+        snapshot["replication"] = {"in_flight": {"count": len(self._tasks)}}
+        return snapshot
@@ -0,0 +1,120 @@
+"""
+Short-lived signed upload tokens.
+
+A token is ``<payload>.<signature>``: the base64url JSON grant (bucket, size
+limit, allowed media types, optional stored file name, expiry) and its
+HMAC-SHA256 under a server secret. Any process holding the secret can verify
+a token without shared state, and the signature is checked with a
+constant-time comparison before the payload is parsed.
+
+Tokens are not single-use: within its lifetime a token can be presented more
+than once, each time limited to the grant. Keep the lifetime short.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, Optional
+
+TOKEN_VERSION = 1
+
+
+class InvalidUploadToken(Exception):
+    """Raised when a token is malformed, forged or expired"""
+    pass
+
+
+@dataclass(frozen=True)
+class UploadGrant:
+    """What the holder of a token may upload"""
+    bucket: str
+    max_bytes: int
+    allowed_types: FrozenSet[str]
+    expires: int
+    filename: Optional[str] = None
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class UploadTokenSigner:
+    """Issues and verifies upload tokens with one HMAC key"""
+
+    def __init__(self, secret: bytes, ttl: int = 300):
+        """
+        Args:
+            secret (bytes): HMAC key shared by every process that verifies tokens
+            ttl (int): Default token lifetime in seconds
+        """
+        if len(secret) < 16:
+            raise ValueError("Upload token secret must be at least 16 bytes")
+        self._secret = secret
+        self.ttl = ttl
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()
+
+    def issue(
+        self,
+        bucket: str,
+        max_bytes: int,
+        allowed_types: Iterable[str],
+        filename: Optional[str] = None,
+        ttl: Optional[int] = None,
+        now: Optional[float] = None
+    ) -> str:
+        """Signed token granting uploads of at most ``max_bytes`` of ``allowed_types`` to ``bucket``"""
+        expires = int((now if now is not None else time.time()) + (ttl or self.ttl))
+        claims = {
+            "v": TOKEN_VERSION,
+            "b": bucket,
+            "m": max_bytes,
+            "t": sorted(allowed_types),
+            "e": expires,
+            "n": _b64encode(os.urandom(9)),  # distinct tokens for identical grants
+        }
+        if filename is not None:
+            claims["f"] = filename
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        return f"{payload}.{_b64encode(self._sign(payload.encode('ascii')))}"
+
+    def verify(self, token: str, now: Optional[float] = None) -> UploadGrant:
+        """
+        Check a token's signature and expiry.
+
+        Raises:
+            InvalidUploadToken: If the token is malformed, not signed with this key or expired
+        """
+        payload, _, signature = token.partition(".")
+        try:
+            given = _b64decode(signature)
+            payload_bytes = payload.encode("ascii")
+        except (ValueError, UnicodeEncodeError):
+            raise InvalidUploadToken("Malformed upload token")
+        if not hmac.compare_digest(given, self._sign(payload_bytes)):
+            raise InvalidUploadToken("Invalid upload token signature")
+
+        try:
+            claims = json.loads(_b64decode(payload))
+            grant = UploadGrant(
+                bucket=claims["b"],
+                max_bytes=int(claims["m"]),
+                allowed_types=frozenset(claims["t"]),
+                expires=int(claims["e"]),
+                filename=claims.get("f"),
+            )
+        except (ValueError, KeyError, TypeError):
+            raise InvalidUploadToken("Malformed upload token")
+        if claims.get("v") != TOKEN_VERSION:
+            raise InvalidUploadToken("Unsupported upload token version")
+        if grant.expires < (now if now is not None else time.time()):
+            raise InvalidUploadToken("Upload token expired")
+        return grant
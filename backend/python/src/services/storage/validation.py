@@ -0,0 +1,214 @@
+"""
+Incremental validation of uploaded media from the first bytes of the stream.
+
+``UploadValidator.feed`` is called with each chunk as it arrives. The media
+type is sniffed from magic bytes (the client's declared type is not trusted),
+image dimensions are read from the format header without decoding pixels, and
+the running size is checked against the limit, so a bad upload is rejected
+as soon as the offending bytes have been seen.
+"""
+import struct
+from dataclasses import dataclass, field
+from typing import FrozenSet, Optional, Tuple
+
+IMAGE_TYPES = frozenset({"image/jpeg", "image/png", "image/gif", "image/webp"})
+VIDEO_TYPES = frozenset({"video/mp4", "video/quicktime", "video/webm", "video/x-msvideo"})
+
+# Enough for every signature below
+SNIFF_BYTES = 16
+
+# Major brands of ISO base media files that are video; the same container also
+# holds audio (M4A), HEIF and AVIF images, which must not pass as video
+VIDEO_BRANDS = frozenset({
+    b"isom", b"iso2", b"iso3", b"iso4", b"iso5", b"iso6",
+    b"mp41", b"mp42", b"avc1", b"M4V ", b"qt  ",
+})
+
+
+def format_size(size: int) -> str:
+    """Human-readable limit for error messages"""
+    for unit, factor in (("MB", 1024 * 1024), ("KB", 1024)):
+        if size >= factor:
+            return f"{size / factor:.3g}{unit}"
+    return f"{size} bytes"
+
+
+class UploadRejected(Exception):
+    """Raised when an upload fails validation; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    """Media type from magic bytes, or None if the signature is not recognised"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "video/x-msvideo"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand not in VIDEO_BRANDS:
+            return None
+        return "video/quicktime" if brand == b"qt  " else "video/mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    return None
+
+
+def _jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    # Walk marker segments up to the first start-of-frame, which holds the size
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            raise UploadRejected(400, "Corrupt JPEG header")
+        marker = data[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # markers without a length
+            offset += 2
+            continue
+        (length,) = struct.unpack(">H", data[offset + 2:offset + 4])
+        if length < 2:
+            raise UploadRejected(400, "Corrupt JPEG header")
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return width, height
+        if marker == 0xDA:  # image data before any frame header
+            raise UploadRejected(400, "Corrupt JPEG header")
+        offset += 2 + length
+    return None
+
+
+def _webp_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    if len(data) >= 30:
+        raise UploadRejected(400, "Unsupported WebP encoding")
+    return None
+
+
+def image_dimensions(media_type: str, data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) from the image header, or None if more bytes are needed.
+
+    Raises:
+        UploadRejected: If the header is malformed
+    """
+    if media_type == "image/png":
+        if len(data) < 24:
+            return None
+        if data[12:16] != b"IHDR":
+            raise UploadRejected(400, "Corrupt PNG header")
+        return struct.unpack(">II", data[16:24])
+    if media_type == "image/gif":
+        return struct.unpack("<HH", data[6:10]) if len(data) >= 10 else None
+    if media_type == "image/webp":
+        return _webp_dimensions(data)
+    if media_type == "image/jpeg":
+        return _jpeg_dimensions(data)
+    return None
+
+
+@dataclass
+class UploadPolicy:
+    """What an upload endpoint accepts"""
+    allowed_types: FrozenSet[str] = IMAGE_TYPES | VIDEO_TYPES
+    min_bytes: int = 127
+    max_bytes: int = 100 * 1024 * 1024
+    max_image_bytes: int = 20 * 1024 * 1024
+    max_width: int = 8192
+    max_height: int = 8192
+    max_pixels: int = 40_000_000
+    # How far into the file an image header may end (JPEG EXIF/ICC segments come first)
+    max_header_bytes: int = 256 * 1024
+
+
+@dataclass
+class UploadValidator:
+    """Validates one upload chunk by chunk; raises UploadRejected on the first violation"""
+    policy: UploadPolicy = field(default_factory=UploadPolicy)
+    media_type: Optional[str] = None
+    dimensions: Optional[Tuple[int, int]] = None
+    size: int = 0
+    _head: bytearray = field(default_factory=bytearray)
+
+    def check_declared_length(self, content_length: Optional[int], overhead: int = 0) -> None:
+        """Reject on the declared Content-Length before reading any of the body"""
+        if content_length is not None and content_length - overhead > self.policy.max_bytes:
+            raise UploadRejected(413, f"File size must not exceed {format_size(self.policy.max_bytes)}")
+
+    @property
+    def _header_done(self) -> bool:
+        return self.media_type is not None and (
+            self.dimensions is not None or self.media_type not in IMAGE_TYPES
+        )
+
+    def feed(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        limit = self.policy.max_image_bytes if self.media_type in IMAGE_TYPES else self.policy.max_bytes
+        if self.size > limit:
+            raise UploadRejected(413, f"File size must not exceed {format_size(limit)}")
+        if self._header_done:
+            return
+
+        self._head += chunk[:self.policy.max_header_bytes - len(self._head)]
+        if self.media_type is None:
+            if len(self._head) < SNIFF_BYTES:
+                return
+            self._set_media_type()
+        if self.media_type in IMAGE_TYPES:
+            self._check_image_header()
+
+    def _set_media_type(self) -> None:
+        media_type = sniff_media_type(bytes(self._head[:SNIFF_BYTES]))
+        if media_type is None or media_type not in self.policy.allowed_types:
+            if self.policy.allowed_types <= VIDEO_TYPES:
+                raise UploadRejected(415, "Unsupported file type; upload an MP4, MOV, WebM or AVI video")
+            raise UploadRejected(415, "Unsupported file type; upload a JPEG, PNG, GIF or WebP image or an MP4, MOV, WebM or AVI video")
+        self.media_type = media_type
+        if media_type in IMAGE_TYPES and self.size > self.policy.max_image_bytes:
+            raise UploadRejected(413, f"Image size must not exceed {format_size(self.policy.max_image_bytes)}")
+
+    def _check_image_header(self) -> None:
+        dimensions = image_dimensions(self.media_type, bytes(self._head))
+        if dimensions is None:
+            if len(self._head) >= self.policy.max_header_bytes:
+                raise UploadRejected(400, "Image header not found")
+            return
+        width, height = dimensions
+        if not width or not height:
+            raise UploadRejected(400, "Image has no pixels")
+        if width > self.policy.max_width or height > self.policy.max_height or width * height > self.policy.max_pixels:
+            raise UploadRejected(
+                413, f"Image is {width}x{height}; the limit is {self.policy.max_width}x{self.policy.max_height}"
+            )
+        self.dimensions = dimensions
+        self._head = bytearray()
+
+    def finish(self) -> None:
+        """Checks that need the whole upload (or its end)"""
+        if self.size < self.policy.min_bytes:
+            raise UploadRejected(400, f"File size must be at least {self.policy.min_bytes} bytes")
+        if self.media_type is None:
+            self._set_media_type()
+        if self.media_type in IMAGE_TYPES and self.dimensions is None:
+            raise UploadRejected(400, "Truncated image header")
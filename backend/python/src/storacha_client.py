@@ -1,17 +1,26 @@
 import json
 import aiohttp
 import asyncio
-from typing import Any, Dict, List, Optional, Union, Tuple
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Union, Tuple
 from pathlib import Path
 import logging
 from web3.storage import Web3Storage
 from pydantic import BaseModel
 import os
 from datetime import datetime
-import time
+import uuid
+import hashlib
+import tarfile
+import tempfile
 from asyncio import Semaphore
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from aiohttp import ClientTimeout
 from tenacity import retry, stop_after_attempt, wait_exponential
+from .core.tracing import span, traced
+from .services.storage.cid_cache import CIDCache
+from .services.storage.gateways import ContentVerificationError, GatewayPool, expected_digest
+from .services.storage.rate_limiter import AsyncTokenBucket, parse_retry_after
 
 # Configure logging
 logging.basicConfig(
@@ -26,12 +35,33 @@ class StorachaError(Exception):
 
 class RateLimitError(StorachaError):
     """Exception raised when rate limit is hit"""
-    pass
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 class BatchProcessingError(StorachaError):
     """Exception raised when batch processing fails"""
     pass
 
+@dataclass(frozen=True)
+class PackedFile:
+    """Location of one file inside an uploaded batch archive"""
+    archive_cid: str
+    name: str
+    offset: int
+    size: int
+
+    @property
+    def byte_range(self) -> str:
+        """HTTP Range header value selecting this file from the archive"""
+        return f"bytes={self.offset}-{self.offset + self.size - 1}"
+
+def _retry_wait(retry_state) -> float:
+    """Skip tenacity's backoff for 429s; the limiter already holds requests until Retry-After"""
+    if isinstance(retry_state.outcome.exception(), RateLimitError):
+        return 0
+    return wait_exponential(multiplier=1, min=4, max=10)(retry_state)
+
 class StorachaClient:
     def __init__(
         self,
@@ -39,7 +69,13 @@ class StorachaClient:
         max_concurrent_requests: int = 10,
         rate_limit_per_second: int = 5,
         timeout: int = 30,
-        retry_attempts: int = 3
+        retry_attempts: int = 3,
+        max_in_flight: Optional[int] = None,
+        chunk_size: int = 64 * 1024,
+        burst: Optional[int] = None,
+        cache: Optional[CIDCache] = None,
+        max_upload_workers: int = 4,
+        gateways: Optional[List[str]] = None
     ):
         """
         Initialize the Storacha client with rate limiting and concurrency controls
@@ -50,58 +86,201 @@ class StorachaClient:
             rate_limit_per_second (int): Maximum requests per second
             timeout (int): Request timeout in seconds
             retry_attempts (int): Number of retry attempts for failed requests
+            max_in_flight (Optional[int]): Maximum number of retrieval tasks kept alive by
+                streaming batch retrieval. Defaults to twice max_concurrent_requests
+            chunk_size (int): Chunk size in bytes used when streaming bodies to disk
+            burst (Optional[int]): Token-bucket capacity, i.e. how many requests may be sent
+                back to back. Defaults to rate_limit_per_second
+            cache (Optional[CIDCache]): Persistent CID cache consulted before the gateway.
+                CIDs are immutable, so cached content never needs revalidation
+            max_upload_workers (int): Size of the thread pool that runs blocking uploads
+            gateways (Optional[List[str]]): Gateway URL templates containing ``{cid}``, raced
+                with hedging. Defaults to the comma-separated IPFS_GATEWAYS env var, then w3s.link
         """
         self.api_token = api_token or os.getenv('WEB3_STORAGE_TOKEN')
         if not self.api_token:
             raise StorachaError("API token not provided and WEB3_STORAGE_TOKEN not set")
             
         self.client = Web3Storage(self.api_token)
-        self.gateway_base = "https://{cid}.ipfs.w3s.link"
+        # Path-style gateway URLs share one host, so pooled connections are reused across CIDs
+        self.gateway_base = "https://w3s.link/ipfs/{cid}"
+        if gateways is None and os.getenv('IPFS_GATEWAYS'):
+            gateways = [g.strip() for g in os.getenv('IPFS_GATEWAYS').split(',') if g.strip()]
+        self.gateway_pool = GatewayPool(gateways or [self.gateway_base])
+        self.max_concurrent_requests = max_concurrent_requests
         self.semaphore = Semaphore(max_concurrent_requests)
         self.rate_limit = rate_limit_per_second
+        self.limiter = AsyncTokenBucket(rate_limit_per_second, burst=burst)
         self.timeout = ClientTimeout(total=timeout)
         self.retry_attempts = retry_attempts
-        self.last_request_time = 0
-        self._request_count = 0
-        self._window_start = time.time()
-
-    async def _rate_limit(self):
-        """Implement rate limiting"""
-        current_time = time.time()
-        if current_time - self._window_start >= 1.0:
-            self._request_count = 0
-            self._window_start = current_time
-            
-        if self._request_count >= self.rate_limit:
-            wait_time = 1.0 - (current_time - self._window_start)
-            if wait_time > 0:
-                await asyncio.sleep(wait_time)
-                self._request_count = 0
-                self._window_start = time.time()
-        
-        self._request_count += 1
+        self.max_in_flight = max_in_flight or max_concurrent_requests * 2
+        self.chunk_size = chunk_size
+        self.cache = cache
+        # Web3Storage.put is synchronous; uploads run in a bounded pool so they never block the event loop
+        self.max_upload_workers = max_upload_workers
+        self._upload_executor: Optional[ThreadPoolExecutor] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
 
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared pooled session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrent_requests,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared session, its pooled connections and the upload pool"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._upload_executor is not None:
+            self._upload_executor.shutdown(wait=False)
+            self._upload_executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the upload pool, creating it on first use or after ``close``"""
+        if self._upload_executor is None:
+            self._upload_executor = ThreadPoolExecutor(
+                max_workers=self.max_upload_workers, thread_name_prefix="storacha-upload"
+            )
+        return self._upload_executor
+
+    async def _run_blocking(self, func, *args):
+        """Run a blocking call in the bounded upload pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    @traced("storacha")
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
+        wait=_retry_wait,
         reraise=True
     )
-    async def _make_request(self, cid: str) -> bytes:
-        """Make a single request with retry logic"""
-        await self._rate_limit()
+    async def _make_request(self, cid: str, headers: Optional[Dict[str, str]] = None) -> bytes:
+        """Make a single request with retry logic, racing the configured gateways"""
+        try:
+            return await self.gateway_pool.race(
+                lambda gateway: self._fetch_from(gateway, cid, headers)
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving file with CID {cid}: {str(e)}")
+            raise
+
+    @traced("storacha")
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=_retry_wait,
+        reraise=True
+    )
+    async def _download_to_path(self, cid: str, save_path: Path) -> Path:
+        """Stream a single file to disk in chunks with retry logic, racing the configured gateways"""
+        try:
+            return await self.gateway_pool.race(
+                lambda gateway: self._download_from(gateway, cid, save_path)
+            )
+        except Exception as e:
+            logger.error(f"Error downloading file with CID {cid}: {str(e)}")
+            raise
+
+    async def _fetch_from(
+        self,
+        gateway: str,
+        cid: str,
+        headers: Optional[Dict[str, str]] = None
+    ) -> bytes:
+        """Fetch a CID's body from one gateway, verifying it when the CID allows"""
+        async with self.semaphore:
+            await self.limiter.acquire()
+            session = await self._get_session()
+            async with session.get(gateway.format(cid=cid), headers=headers) as response:
+                self._check_response(response, ok_statuses=(200, 206) if headers else (200,))
+                content = await response.read()
+        # Range responses are a slice of the object and cannot be hashed against the CID
+        if not headers or response.status == 200:
+            self._verify(cid, gateway, _hasher_for(cid), content)
+        return content
+
+    async def _download_from(self, gateway: str, cid: str, save_path: Path) -> Path:
+        """Stream a CID's body from one gateway to disk, verifying it when the CID allows"""
         async with self.semaphore:
+            await self.limiter.acquire()
+            # Each racer writes its own temp file so a failed or cancelled download leaves nothing behind
+            tmp_path = save_path.with_name(f".{save_path.name}.{uuid.uuid4().hex}.part")
             try:
-                gateway_url = self.gateway_base.format(cid=cid)
-                async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                    async with session.get(gateway_url) as response:
-                        if response.status == 429:
-                            raise RateLimitError("Rate limit exceeded")
-                        if response.status != 200:
-                            raise StorachaError(f"Failed to retrieve file: {response.status}")
-                        return await response.read()
-            except Exception as e:
-                logger.error(f"Error retrieving file with CID {cid}: {str(e)}")
-                raise
+                session = await self._get_session()
+                async with session.get(gateway.format(cid=cid)) as response:
+                    self._check_response(response)
+                    save_path.parent.mkdir(parents=True, exist_ok=True)
+                    hasher = _hasher_for(cid)
+                    with open(tmp_path, 'wb') as f:
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            if hasher is not None:
+                                hasher.update(chunk)
+                            f.write(chunk)
+                self._verify(cid, gateway, hasher, None)
+                os.replace(tmp_path, save_path)
+                return save_path
+            finally:
+                tmp_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _verify(cid: str, gateway: str, hasher, content: Optional[bytes]) -> None:
+        """Reject content whose hash does not match a verifiable CID"""
+        if hasher is None:
+            return
+        if content is not None:
+            hasher.update(content)
+        _, digest = expected_digest(cid)
+        if hasher.digest() != digest:
+            raise ContentVerificationError(f"Content from {gateway} does not match CID {cid}")
+
+    def gateway_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Rolling latency, error rate and win counts per gateway"""
+        return self.gateway_pool.snapshot()
+
+    async def _fetch_cached(self, cid: str) -> Path:
+        """Return the cached path for a CID, downloading it into the cache on a miss"""
+        # Index access may wait on other processes' locks, so keep it off the event loop
+        cached_path = await asyncio.to_thread(self.cache.lookup, cid)
+        if cached_path is None:
+            tmp_path = self.cache.temp_path()
+            try:
+                await self._download_to_path(cid, tmp_path)
+                cached_path = await asyncio.to_thread(self.cache.commit, cid, tmp_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+        return cached_path
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit ratio, bytes saved and occupancy of the CID cache, if one is configured"""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def _check_response(
+        self,
+        response: aiohttp.ClientResponse,
+        ok_statuses: Tuple[int, ...] = (200,)
+    ) -> None:
+        """Feed the limiter and raise the matching client error for a non-200 response"""
+        throttled = response.status == 429 or (
+            response.status == 503 and "Retry-After" in response.headers
+        )
+        if throttled:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            self.limiter.on_throttle(retry_after)
+            raise RateLimitError("Rate limit exceeded", retry_after=retry_after)
+        if response.status not in ok_statuses:
+            raise StorachaError(f"Failed to retrieve file: {response.status}")
+        self.limiter.on_success()
 
     async def retrieve_file(
         self,
@@ -113,7 +292,8 @@ class StorachaClient:
         
         Args:
             cid (str): Content Identifier of the file
-            save_path (Optional[Path]): If provided, save the file to this path
+            save_path (Optional[Path]): If provided, stream the file to this path
+                instead of holding it in memory
             
         Returns:
             Union[bytes, Path]: The file content or the path where it was saved
@@ -122,14 +302,14 @@ class StorachaClient:
             StorachaError: If retrieval fails
         """
         try:
-            content = await self._make_request(cid)
-            
+            if self.cache is not None:
+                cached_path = await self._fetch_cached(cid)
+                if save_path:
+                    return await asyncio.to_thread(CIDCache.copy_path, cached_path, save_path)
+                return await asyncio.to_thread(CIDCache.read_path, cached_path)
             if save_path:
-                save_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(save_path, 'wb') as f:
-                    f.write(content)
-                return save_path
-            return content
+                return await self._download_to_path(cid, save_path)
+            return await self._make_request(cid)
         except Exception as e:
             logger.error(f"Error retrieving file with CID {cid}: {str(e)}")
             raise StorachaError(f"Failed to retrieve file: {str(e)}")
@@ -148,15 +328,78 @@ class StorachaClient:
             StorachaError: If retrieval or parsing fails
         """
         try:
-            content = await self._make_request(cid)
+            if self.cache is not None:
+                cached_path = await self._fetch_cached(cid)
+                content = await asyncio.to_thread(CIDCache.read_path, cached_path)
+            else:
+                content = await self._make_request(cid)
             return json.loads(content)
         except json.JSONDecodeError as e:
             logger.error(f"Error parsing JSON from CID {cid}: {str(e)}")
             raise StorachaError(f"Failed to parse JSON data: {str(e)}")
 
+    async def retrieve_stream(
+        self,
+        cids: Union[Iterable[str], AsyncIterable[str]],
+        output_dir: Optional[Path] = None,
+        max_in_flight: Optional[int] = None
+    ) -> AsyncIterator[Tuple[str, Union[bytes, Path, Exception]]]:
+        """
+        Retrieve files with a bounded window of in-flight tasks
+        
+        CIDs are pulled from the source lazily, so the number of live tasks and
+        buffered results never exceeds the window regardless of input size.
+        
+        Args:
+            cids (Union[Iterable[str], AsyncIterable[str]]): CIDs to retrieve
+            output_dir (Optional[Path]): If provided, stream files into this directory
+            max_in_flight (Optional[int]): Window size, defaults to the client setting
+            
+        Yields:
+            Tuple[str, Union[bytes, Path, Exception]]: CID and its result or error,
+                in completion order
+        """
+        window = max_in_flight or self.max_in_flight
+        source = _iterate_cids(cids)
+        pending: Dict[asyncio.Task, str] = {}
+        exhausted = False
+
+        try:
+            while True:
+                # Top the window up before waiting on the next completion
+                while not exhausted and len(pending) < window:
+                    try:
+                        cid = await source.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    save_path = output_dir / f"{cid}" if output_dir else None
+                    task = asyncio.create_task(self.retrieve_file(cid, save_path))
+                    pending[task] = cid
+
+                if not pending:
+                    return
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    cid = pending.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        logger.error(f"Error processing CID {cid}: {str(error)}")
+                        yield cid, error
+                    else:
+                        yield cid, task.result()
+        finally:
+            # A consumer that stops early must not leave requests running or responses open
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            await source.aclose()
+
     async def retrieve_batch(
         self,
-        cids: List[str],
+        cids: Union[Iterable[str], AsyncIterable[str]],
         output_dir: Optional[Path] = None,
         return_results: bool = True
     ) -> Dict[str, Union[bytes, Path, Exception]]:
@@ -164,7 +407,7 @@ class StorachaClient:
         Retrieve multiple files concurrently
         
         Args:
-            cids (List[str]): List of CIDs to retrieve
+            cids (Union[Iterable[str], AsyncIterable[str]]): CIDs to retrieve
             output_dir (Optional[Path]): If provided, save files to this directory
             return_results (bool): Whether to return the results or just save files
             
@@ -175,28 +418,9 @@ class StorachaClient:
             BatchProcessingError: If batch processing fails
         """
         results = {}
-        tasks = []
-        
-        for cid in cids:
-            if output_dir:
-                save_path = output_dir / f"{cid}"
-            else:
-                save_path = None
-                
-            task = asyncio.create_task(
-                self.retrieve_file(cid, save_path)
-            )
-            tasks.append((cid, task))
-        
-        for cid, task in tasks:
-            try:
-                result = await task
-                if return_results:
-                    results[cid] = result
-            except Exception as e:
-                logger.error(f"Error processing CID {cid}: {str(e)}")
-                results[cid] = e
-                
+        async for cid, result in self.retrieve_stream(cids, output_dir):
+            if return_results or isinstance(result, Exception):
+                results[cid] = result
         return results
 
     async def upload_file(self, file_path: Path) -> str:
@@ -216,9 +440,8 @@ class StorachaClient:
             if not file_path.exists():
                 raise StorachaError(f"File not found: {file_path}")
             
-            with open(file_path, 'rb') as f:
-                cid = self.client.put(file_path.name, f)
-            return cid
+            with span("storacha"):
+                return await self._run_blocking(self._put_path, file_path.name, file_path)
         except Exception as e:
             logger.error(f"Error uploading file {file_path}: {str(e)}")
             raise StorachaError(f"Failed to upload file: {str(e)}")
@@ -239,12 +462,117 @@ class StorachaClient:
         """
         try:
             json_str = json.dumps(data)
-            cid = self.client.put(filename, json_str.encode())
-            return cid
+            with span("storacha"):
+                return await self._run_blocking(self.client.put, filename, json_str.encode())
         except Exception as e:
             logger.error(f"Error uploading JSON data: {str(e)}")
             raise StorachaError(f"Failed to upload JSON data: {str(e)}")
 
+    async def upload_batch(
+        self,
+        file_paths: Iterable[Path],
+        archive_name: str = "batch",
+        max_archive_bytes: int = 64 * 1024 * 1024,
+        max_pending_archives: int = 2
+    ) -> Dict[Path, PackedFile]:
+        """
+        Upload many small files (e.g. training frames) as a few packed archives
+        
+        Files are packed into uncompressed tar archives of up to max_archive_bytes,
+        and each archive is uploaded once. Every file stays addressable on its own
+        through its archive CID and byte range, see retrieve_packed. Archives are
+        packed only as upload slots free up, so temporary disk use stays around
+        max_pending_archives * max_archive_bytes however large the batch is.
+        
+        Args:
+            file_paths (Iterable[Path]): Files to upload
+            archive_name (str): Name prefix for the uploaded archives
+            max_archive_bytes (int): Approximate size at which a new archive is started
+            max_pending_archives (int): Archives packed or uploading at the same time
+            
+        Returns:
+            Dict[Path, PackedFile]: Location of each input file
+            
+        Raises:
+            StorachaError: If packing or any archive upload fails
+        """
+        groups: List[List[Path]] = [[]]
+        group_bytes = 0
+        for file_path in file_paths:
+            if not file_path.exists():
+                raise StorachaError(f"File not found: {file_path}")
+            size = file_path.stat().st_size
+            if groups[-1] and group_bytes + size > max_archive_bytes:
+                groups.append([])
+                group_bytes = 0
+            groups[-1].append(file_path)
+            group_bytes += size
+
+        pipeline = Semaphore(max_pending_archives)
+
+        async def pack_and_upload(group: List[Path], name: str) -> Dict[Path, PackedFile]:
+            async with pipeline:
+                return await self._upload_archive(group, name)
+
+        try:
+            packed = await asyncio.gather(*[
+                pack_and_upload(group, f"{archive_name}-{index:04d}.tar")
+                for index, group in enumerate(groups) if group
+            ])
+        except Exception as e:
+            logger.error(f"Error uploading batch {archive_name}: {str(e)}")
+            raise StorachaError(f"Failed to upload batch: {str(e)}")
+
+        results: Dict[Path, PackedFile] = {}
+        for archive in packed:
+            results.update(archive)
+        return results
+
+    async def retrieve_packed(self, packed: PackedFile) -> bytes:
+        """
+        Retrieve a single file from a batch archive with an HTTP range request
+        
+        Args:
+            packed (PackedFile): Location returned by upload_batch
+            
+        Returns:
+            bytes: The file content
+            
+        Raises:
+            StorachaError: If retrieval fails
+        """
+        try:
+            content = await self._make_request(
+                packed.archive_cid, headers={"Range": packed.byte_range}
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving {packed.name} from {packed.archive_cid}: {str(e)}")
+            raise StorachaError(f"Failed to retrieve file: {str(e)}")
+        # Gateways that ignore Range return the whole archive
+        if len(content) != packed.size:
+            content = content[packed.offset:packed.offset + packed.size]
+        return content
+
+    async def _upload_archive(self, file_paths: List[Path], archive_name: str) -> Dict[Path, PackedFile]:
+        """Pack one group of files and upload it as a single request"""
+        fd, tmp_name = tempfile.mkstemp(suffix=".tar")
+        os.close(fd)
+        archive_path = Path(tmp_name)
+        try:
+            members = await self._run_blocking(_pack_tar, file_paths, archive_path)
+            with span("storacha"):
+                archive_cid = await self._run_blocking(self._put_path, archive_name, archive_path)
+        finally:
+            archive_path.unlink(missing_ok=True)
+        return {
+            file_path: PackedFile(archive_cid, name, offset, size)
+            for file_path, (name, offset, size) in zip(file_paths, members)
+        }
+
+    def _put_path(self, name: str, file_path: Path) -> str:
+        with open(file_path, 'rb') as f:
+            return self.client.put(name, f)
+
     def get_gateway_url(self, cid: str) -> str:
         """
         Get the IPFS HTTP gateway URL for a CID
@@ -257,32 +585,104 @@ class StorachaClient:
         """
         return self.gateway_base.format(cid=cid)
 
-# Initialize with custom settings
-client = StorachaClient(
-    api_token="your-token",  # or set WEB3_STORAGE_TOKEN env var
-    max_concurrent_requests=15,
-    rate_limit_per_second=10,
-    timeout=60,
-    retry_attempts=3
-)
+async def _iterate_cids(
+    cids: Union[Iterable[str], AsyncIterable[str]]
+) -> AsyncIterator[str]:
+    """Adapt a sync or async iterable of CIDs to a single async iterator"""
+    if hasattr(cids, "__aiter__"):
+        iterator = cids.__aiter__()
+        try:
+            async for cid in iterator:
+                yield cid
+        finally:
+            # Closing the adapter closes an async generator source as well
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+    else:
+        for cid in cids:
+            yield cid
 
-# Single file retrieval
-content = await client.retrieve_file("your-cid")
 
-# Save file to disk
-saved_path = await client.retrieve_file("your-cid", save_path=Path("output/image.jpg"))
+def _hasher_for(cid: str):
+    """Incremental hasher for CIDs whose digest covers the raw bytes, else None"""
+    expected = expected_digest(cid)
+    if expected is None:
+        return None
+    name, _ = expected
+    return hashlib.sha256() if name == "sha256" else _IdentityHasher()
 
-# Batch retrieval
-cids = ["cid1", "cid2", "cid3"]
-results = await client.retrieve_batch(
-    cids,
-    output_dir=Path("output/images"),
-    return_results=True
-)
 
-# Handle batch results
-for cid, result in results.items():
-    if isinstance(result, Exception):
-        print(f"Error processing {cid}: {result}")
-    else:
-        print(f"Successfully processed {cid}") 
\ No newline at end of file
+class _IdentityHasher:
+    """Identity multihash: the 'digest' is the content itself"""
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def update(self, chunk: bytes) -> None:
+        self._parts.append(bytes(chunk))
+
+    def digest(self) -> bytes:
+        return b"".join(self._parts)
+
+
+def _pack_tar(file_paths: List[Path], archive_path: Path) -> List[Tuple[str, int, int]]:
+    """Write files into an uncompressed tar and return (name, data offset, size) per file"""
+    names = [f"{index:06d}-{file_path.name}" for index, file_path in enumerate(file_paths)]
+    with tarfile.open(archive_path, "w", format=tarfile.PAX_FORMAT) as tar:
+        for name, file_path in zip(names, file_paths):
+            tar.add(file_path, arcname=name, recursive=False)
+    # Data offsets are only known once headers are written; reading them back is header-only
+    with tarfile.open(archive_path, "r") as tar:
+        members = {member.name: member for member in tar.getmembers()}
+    return [(name, members[name].offset_data, members[name].size) for name in names]
+
+
+async def example_usage():
+    # Initialize with custom settings; the client holds one pooled session until closed
+    client = StorachaClient(
+        api_token="your-token",  # or set WEB3_STORAGE_TOKEN env var
+        max_concurrent_requests=15,
+        rate_limit_per_second=10,
+        timeout=60,
+        retry_attempts=3,
+        cache=CIDCache(Path("~/.cache/asl/ipfs").expanduser(), max_bytes=5 * 1024 ** 3)
+    )
+
+    # Single file retrieval
+    content = await client.retrieve_file("your-cid")
+
+    # Save file to disk
+    saved_path = await client.retrieve_file("your-cid", save_path=Path("output/image.jpg"))
+
+    # Batch retrieval
+    cids = ["cid1", "cid2", "cid3"]
+    results = await client.retrieve_batch(
+        cids,
+        output_dir=Path("output/images"),
+        return_results=True
+    )
+
+    # Handle batch results
+    for cid, result in results.items():
+        if isinstance(result, Exception):
+            print(f"Error processing {cid}: {result}")
+        else:
+            print(f"Successfully processed {cid}")
+
+    # Streaming retrieval for large datasets: bounded memory, completion order
+    async for cid, result in client.retrieve_stream(
+        (line.strip() for line in open("cids.txt")),
+        output_dir=Path("output/dataset")
+    ):
+        if isinstance(result, Exception):
+            print(f"Error processing {cid}: {result}")
+
+    # Batch upload of many small frames as a few archive uploads
+    packed = await client.upload_batch(sorted(Path("output/frames").glob("*.jpg")), archive_name="frames")
+    for file_path, location in packed.items():
+        print(f"{file_path} -> {location.archive_cid} [{location.byte_range}]")
+
+    print("Cache stats:", client.cache_stats())
+    await client.close()
+
+if __name__ == "__main__":
+    asyncio.run(example_usage())
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from src.core.admission import (
+    AdmissionControl,
+    AdmissionLimiter,
+    AdmissionMiddleware,
+    AdmissionRejected,
+)
+
+def build_app(limiter: AdmissionLimiter, delay: float = 0.05) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/ml/frame")
+    async def frame():
+        await asyncio.sleep(delay)
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    control = AdmissionControl([limiter], [("POST", r"/api/ml/.+", limiter.name)])
+    app.add_middleware(AdmissionMiddleware, control=control)
+    return app
+
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_in_arrival_order():
+    limiter = AdmissionLimiter("inference", limit=1, max_queue=5, timeout=1.0)
+    order = []
+
+    async def request(i):
+        await limiter.acquire()
+        order.append(i)
+        await asyncio.sleep(0.01)
+        limiter.release(0.01)
+
+    await asyncio.gather(*(request(i) for i in range(4)))
+    assert order == [0, 1, 2, 3]
+    assert limiter.active == 0 and limiter.queued == 0
+    assert limiter.admitted == 4
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_immediately():
+    limiter = AdmissionLimiter("upload", limit=1, max_queue=1, timeout=5.0)
+    await limiter.acquire()
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    with pytest.raises(AdmissionRejected) as info:
+        await limiter.acquire()
+    assert loop.time() - started < 0.01
+    assert info.value.reason == "queue_full"
+
+    limiter.release()
+    await waiting
+    limiter.release()
+    assert limiter.active == 0
+
+@pytest.mark.asyncio
+async def test_waiting_past_the_deadline_is_shed():
+    limiter = AdmissionLimiter("listing", limit=1, max_queue=4, timeout=0.05)
+    await limiter.acquire()
+    with pytest.raises(AdmissionRejected) as info:
+        await limiter.acquire()
+    assert info.value.reason == "timeout"
+    assert limiter.queued == 0
+    limiter.release()
+    assert limiter.active == 0
+
+@pytest.mark.asyncio
+async def test_expected_wait_beyond_the_deadline_is_shed_on_arrival():
+    limiter = AdmissionLimiter("inference", limit=1, max_queue=10, timeout=0.1)
+    for _ in range(5):
+        limiter.service.record(0.2)  # each request holds the slot for 200ms
+    await limiter.acquire()
+    with pytest.raises(AdmissionRejected) as info:
+        await limiter.acquire()
+    assert info.value.reason == "expected_wait"
+    assert info.value.retry_after == 1
+    limiter.release()
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    limiter = AdmissionLimiter("inference", limit=1, max_queue=4, timeout=1.0)
+    await limiter.acquire()
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    limiter.release()
+    assert limiter.active == 0 and limiter.queued == 0
+
+@pytest.mark.asyncio
+async def test_overload_gets_fast_503_with_retry_after():
+    limiter = AdmissionLimiter("inference", limit=2, max_queue=2, timeout=0.5)
+    app = build_app(limiter, delay=0.1)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*(client.post("/api/ml/frame") for _ in range(10)))
+        health = await client.get("/health")
+
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses.count(200) == 4
+    assert statuses.count(503) == 6
+    shed = next(r for r in responses if r.status_code == 503)
+    assert shed.headers["retry-after"] == "1"
+    assert shed.json()["route_class"] == "inference"
+    assert health.status_code == 200
+
+    snapshot = limiter.snapshot()
+    assert snapshot["admitted"] == 4
+    assert snapshot["shed"] == {"queue_full": 6}
+    assert snapshot["active"] == 0 and snapshot["queued"] == 0
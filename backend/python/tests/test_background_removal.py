@@ -0,0 +1,132 @@
+import asyncio
+import io
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from PIL import Image
+from src.services.ml.background_removal import (
+    BackgroundRemovalError,
+    CutoutOptions,
+    CutoutStage,
+    SegmentationSession,
+    hand_box,
+)
+from src.services.storage.cid_cache import CIDCache
+from src.services.storage.derivatives import DerivativeOptions, MediaPipeline
+from src.services.storage.local import LocalStorageService
+
+class FakeOnnxSession:
+    """InferenceSession-shaped: predicts the bright pixels of each input as foreground"""
+
+    def __init__(self, batch_dim="batch"):
+        self.batch_dim = batch_dim
+        self.runs = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input.1", shape=[self.batch_dim, 3, 320, 320])]
+
+    def run(self, outputs, feeds):
+        batch = feeds["input.1"]
+        self.runs.append(len(batch))
+        return [batch.mean(axis=1, keepdims=True), None]
+
+def photo(width=1600, height=1200, hand=(1000, 500, 1200, 800)) -> bytes:
+    """Dark background with a bright rectangle standing in for the hand"""
+    image = np.full((height, width, 3), 30, dtype=np.uint8)
+    if hand:
+        x0, y0, x1, y1 = hand
+        image[y0:y1, x0:x1] = 230
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+def bright_locator():
+    """Landmarks at the corners of the bright region, normalized like MediaPipe's"""
+    def locate(bgr):
+        ys, xs = np.nonzero(bgr[..., 0] > 128)
+        if not len(xs):
+            return None
+        height, width = bgr.shape[:2]
+        return np.array([[xs.min() / width, ys.min() / height, 0], [xs.max() / width, ys.max() / height, 0]])
+    return locate
+
+def test_hand_box_is_a_padded_square_inside_the_image():
+    points = np.array([[0.5, 0.5], [0.6, 0.7]])  # 100x200 px in a 1000x1000 image
+    assert hand_box(points, 1000, 1000, padding=0.25, min_size=64) == (400, 450, 700, 750)
+    # Pixel landmarks near a corner are shifted inside rather than cut off
+    assert hand_box(np.array([[5.0, 5.0], [40.0, 30.0]]), 640, 480, padding=0.5, min_size=96) == (0, 0, 96, 96)
+    # Never larger than the image
+    assert hand_box(np.array([[0.0, 0.0], [1.0, 1.0]]), 300, 200, padding=0.5, min_size=64) == (50, 0, 250, 200)
+
+@pytest.mark.parametrize("batch_dim,runs", [("batch", [3]), (1, [1, 1, 1])])
+def test_masks_are_batched_unless_the_model_has_a_fixed_batch(batch_dim, runs):
+    onnx = FakeOnnxSession(batch_dim)
+    session = SegmentationSession(onnx)
+    crops = [np.full((h, 2 * h, 3), 200, dtype=np.uint8) for h in (50, 80, 120)]
+    for crop in crops:
+        crop[:, : crop.shape[1] // 2] = 10
+    masks = session.masks(crops)
+    assert onnx.runs == runs
+    assert [m.shape for m in masks] == [c.shape[:2] for c in crops]
+    assert masks[0][:, -5:].min() > 200 and masks[0][:, :5].max() < 50
+
+async def test_crops_from_concurrent_images_share_a_run():
+    onnx = FakeOnnxSession()
+    stage = CutoutStage(bright_locator, lambda: SegmentationSession(onnx), CutoutOptions(max_wait=0.2, batch_size=4))
+    images = [photo() for _ in range(4)] + [photo(hand=None)]
+    cutouts = await asyncio.gather(*(stage.cut(data) for data in images))
+
+    assert cutouts[-1] is None
+    assert onnx.runs == [4]
+    cutout = cutouts[0]
+    x0, y0, x1, y1 = cutout.box
+    assert x1 - x0 == y1 - y0 == cutout.width == cutout.height
+    assert x0 < 1000 and x1 > 1200 and y0 < 500 and y1 > 800
+    assert x1 - x0 < 500  # a crop around the hand, not the image
+    image = Image.open(io.BytesIO(cutout.data))
+    assert image.mode == "RGBA" and image.size == (cutout.width, cutout.height)
+    alpha = np.asarray(image)[..., 3]
+    assert alpha[alpha.shape[0] // 2, alpha.shape[1] // 2] > 200 and alpha[2, 2] < 50
+
+    metrics = stage.metrics()
+    assert metrics["images"] == 5 and metrics["no_hand"] == 1
+    assert metrics["segmented_share"] < 0.1
+    stage.close()
+
+async def test_whole_image_fallback_and_model_failures():
+    onnx = FakeOnnxSession()
+    options = CutoutOptions(whole_image_fallback=True, max_crop_edge=400)
+    stage = CutoutStage(bright_locator, lambda: SegmentationSession(onnx), options)
+    cutout = await stage.cut(photo(hand=None))
+    assert cutout.hand is False and cutout.box == (0, 0, 1600, 1200)
+    assert (cutout.width, cutout.height) == (400, 300)
+    with pytest.raises(BackgroundRemovalError):
+        await stage.cut(b"not an image")
+
+    def broken():
+        raise RuntimeError("model download failed")
+    failing = CutoutStage(bright_locator, broken)
+    with pytest.raises(BackgroundRemovalError, match="unavailable"):
+        await failing.cut(photo())
+
+async def test_media_pipeline_stores_a_cutout_variant(tmp_path):
+    stage = CutoutStage(bright_locator, lambda: SegmentationSession(FakeOnnxSession()))
+    pipeline = MediaPipeline(
+        LocalStorageService(tmp_path / "storage"),
+        "asl-training-data",
+        CIDCache(tmp_path / "cache"),
+        options=DerivativeOptions(thumbnail_sizes=(64,)),
+        cutouts=stage,
+    )
+    data = photo()
+    pipeline.schedule("bafkreioriginal", data, "hand.jpg")
+    await pipeline.drain()
+
+    manifest = await pipeline.manifest("bafkreioriginal")
+    assert manifest.status == "ready"
+    info = manifest.variants["cutout"]
+    assert info["name"] == "bafkreioriginal.cutout.png" and info["media_type"] == "image/png"
+    assert info["hand"] is True and len(info["box"]) == 4
+    path, _ = await pipeline.variant_path("bafkreioriginal", "cutout")
+    assert Image.open(path).mode == "RGBA"
+    assert pipeline.metrics()["bytes"]["cutouts"] == info["bytes"]
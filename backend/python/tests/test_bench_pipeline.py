@@ -0,0 +1,70 @@
+import copy
+import json
+import pytest
+from scripts import bench_pipeline
+from scripts.bench_pipeline import (
+    StubHandDetector,
+    compare,
+    main,
+    parse_args,
+    run_suite,
+    synthetic_frame,
+)
+
+@pytest.fixture(scope="module")
+def results():
+    return run_suite(parse_args(["--quick", "--resolutions", "vga", "--threads", "1,2"]))
+
+@pytest.mark.parametrize("width,height", [(640, 480), (1920, 1080)])
+def test_stub_detector_finds_the_synthetic_hand_only(width, height):
+    detector = StubHandDetector()
+    landmarks = detector.detect(synthetic_frame(width, height, hand=True))
+    assert landmarks.shape == (21, 3)
+    assert ((landmarks[:, :2] >= 0) & (landmarks[:, :2] <= 1)).all()
+    assert detector.detect(synthetic_frame(width, height, hand=False)) is None
+
+def test_results_cover_every_stage(results):
+    latency = results["latency"]
+    for stage in ("decode", "detect", "preprocess", "predict", "serialize", "end_to_end"):
+        assert latency[f"vga/hand/{stage}"]["n"] == 5
+    # Frames without a hand stop after detection
+    assert "vga/empty/predict" not in latency
+    assert set(results["throughput"]) == {"threads-1/fps", "threads-2/fps"}
+    assert results["memory"]["vga/hand/peak_mb"] > 0
+    json.dumps(results)
+
+def test_gates_flag_only_regressions_past_their_threshold(results):
+    baseline = copy.deepcopy(results)
+    baseline["gates"] = {"default_pct": 25, "overrides": {"*/serialize": 1000}}
+    assert compare(results, baseline)[0] == []
+
+    slower = copy.deepcopy(results)
+    slower["latency"]["vga/hand/detect"]["p50_ms"] = baseline["latency"]["vga/hand/detect"]["p50_ms"] * 1.5 + 1
+    slower["latency"]["vga/hand/serialize"]["p50_ms"] *= 3  # covered by the override
+    slower["throughput"]["threads-1/fps"] = baseline["throughput"]["threads-1/fps"] * 0.5
+    regressions, _ = compare(slower, baseline)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("latency vga/hand/detect")
+    assert regressions[1].startswith("throughput threads-1/fps")
+
+    # Faster is never a regression
+    faster = copy.deepcopy(results)
+    faster["latency"]["vga/hand/detect"]["p50_ms"] /= 2
+    assert compare(faster, baseline)[0] == []
+
+def test_tiny_changes_are_below_the_noise_floor(results):
+    baseline = copy.deepcopy(results)
+    baseline["latency"]["vga/hand/preprocess"]["p50_ms"] = 0.01
+    current = copy.deepcopy(results)
+    current["latency"]["vga/hand/preprocess"]["p50_ms"] = 0.03  # +200%, but 0.02ms
+    assert compare(current, baseline)[0] == []
+
+def test_main_exits_nonzero_on_regression(tmp_path, monkeypatch, results):
+    baseline = copy.deepcopy(results)
+    baseline["latency"]["vga/hand/end_to_end"]["p50_ms"] = 0.1
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps(baseline))
+    monkeypatch.setattr(bench_pipeline, "run_suite", lambda args: results)
+    assert main(["--baseline", str(path)]) == 1
+    assert main(["--baseline", str(path), "--update-baseline"]) == 0
+    assert main(["--baseline", str(path)]) == 0
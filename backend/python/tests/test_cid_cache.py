@@ -0,0 +1,82 @@
+import multiprocessing
+import pytest
+from src.services.storage.cid_cache import CIDCache
+
+def _fill(root: str, prefix: str) -> None:
+    cache = CIDCache(root, max_bytes=10 * 1024 * 1024)
+    for i in range(20):
+        cache.put(f"{prefix}{i}", b"x" * 1000)
+        cache.lookup(f"{prefix}{i}")
+
+def test_lru_eviction_keeps_budget(tmp_path):
+    """Least recently used objects are evicted once the budget is exceeded"""
+    cache = CIDCache(tmp_path, max_bytes=3000)
+    for cid in ("bafya", "bafyb", "bafyc"):
+        cache.put(cid, b"x" * 1000)
+    assert cache.lookup("bafya") is not None  # refresh a, making b the oldest
+
+    cache.put("bafyd", b"x" * 1000)
+
+    assert cache.lookup("bafyb") is None
+    assert not cache.object_path("bafyb").exists()
+    for cid in ("bafya", "bafyc", "bafyd"):
+        assert cache.lookup(cid) is not None
+    assert cache.stats()["total_bytes"] == 3000
+
+def test_hits_are_memory_mapped_and_counted(tmp_path):
+    cache = CIDCache(tmp_path)
+    cache.put("bafyimage", b"frame-bytes" * 100)
+
+    mapped = cache.open("bafyimage")
+    assert mapped[:11] == b"frame-bytes"
+    assert cache.open("bafymissing") is None
+    copied = cache.copy_path(cache.object_path("bafyimage"), tmp_path / "out" / "f")
+    assert copied.read_bytes() == b"frame-bytes" * 100
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["bytes_saved"] == 1100
+
+class FailingCommit:
+    """Connection proxy whose COMMIT fails, after the object has been renamed into place"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT":
+            raise RuntimeError("disk I/O error")
+        return self.conn.execute(sql, *args)
+
+def test_failed_commit_leaves_no_object_behind(tmp_path):
+    cache = CIDCache(tmp_path)
+    conn = cache._db()
+    cache._db = lambda: FailingCommit(conn)
+    with pytest.raises(RuntimeError):
+        cache.put("bafyframe", b"frame-bytes")
+
+    cache._db = lambda: conn
+    assert not cache.object_path("bafyframe").exists()
+    assert list(cache.tmp_dir.iterdir()) == []
+    assert cache.lookup("bafyframe") is None
+    assert cache.stats()["total_bytes"] == 0
+
+def test_rejects_path_like_keys(tmp_path):
+    with pytest.raises(ValueError):
+        CIDCache(tmp_path).object_path("../etc/passwd")
+
+def test_shared_between_processes(tmp_path):
+    """Workers writing to the same directory keep one consistent index"""
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_fill, args=(str(tmp_path), p)) for p in ("bafyp", "bafyq")]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    stats = CIDCache(tmp_path).stats()
+    assert stats["entries"] == 40
+    assert stats["total_bytes"] == 40 * 1000
+    assert stats["hits"] == 40
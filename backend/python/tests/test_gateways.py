@@ -0,0 +1,147 @@
+import asyncio
+import random
+import time
+import pytest
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.services.storage.gateways import (
+    ContentVerificationError,
+    GatewayPool,
+    compute_raw_cid,
+    verify_cid,
+)
+
+CONTENT = b"asl-frame" * 100
+CID = compute_raw_cid(CONTENT)
+
+async def _start_gateway(delay: float = 0.0, status: int = 200, body: bytes = CONTENT):
+    """Local stand-in gateway with an injected delay and fixed response"""
+    async def handle(request: web.Request) -> web.Response:
+        await asyncio.sleep(delay)
+        return web.Response(status=status, body=body)
+
+    app = web.Application()
+    app.router.add_get("/ipfs/{cid}", handle)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+def _template(server: TestServer) -> str:
+    return str(server.make_url("/ipfs/")) + "{cid}"
+
+@pytest.fixture
+async def gateways():
+    servers = {
+        "slow": await _start_gateway(delay=1.0),
+        "fast": await _start_gateway(delay=0.01),
+        "broken": await _start_gateway(status=502),
+        "lying": await _start_gateway(body=b"not the content"),
+    }
+    yield servers
+    for server in servers.values():
+        await server.close()
+
+async def _fetch(session: aiohttp.ClientSession, gateway: str) -> bytes:
+    async with session.get(gateway.format(cid=CID)) as response:
+        response.raise_for_status()
+        content = await response.read()
+    if verify_cid(CID, content) is False:
+        raise ContentVerificationError(gateway)
+    return content
+
+@pytest.mark.asyncio
+async def test_hedge_beats_slow_primary(gateways):
+    """A slow primary is hedged after the delay and the faster gateway wins"""
+    pool = GatewayPool(
+        [_template(gateways["slow"]), _template(gateways["fast"])],
+        initial_hedge_delay=0.1
+    )
+    async with aiohttp.ClientSession() as session:
+        started = time.monotonic()
+        assert await pool.race(lambda g: _fetch(session, g)) == CONTENT
+        elapsed = time.monotonic() - started
+
+    assert elapsed < 0.5
+    stats = pool.snapshot()
+    assert stats[_template(gateways["fast"])]["wins"] == 1
+    assert stats[_template(gateways["slow"])]["wins"] == 0
+    # The cancelled loser is now ranked behind the winner
+    assert pool.ranked()[0] == _template(gateways["fast"])
+
+@pytest.mark.asyncio
+async def test_fails_over_on_errors_and_bad_content(gateways):
+    """Errors and content that does not match the CID move on to the next gateway"""
+    pool = GatewayPool(
+        [_template(gateways["broken"]), _template(gateways["lying"]), _template(gateways["fast"])],
+        initial_hedge_delay=5.0
+    )
+    async with aiohttp.ClientSession() as session:
+        assert await pool.race(lambda g: _fetch(session, g)) == CONTENT
+
+    stats = pool.snapshot()
+    assert stats[_template(gateways["broken"])]["errors"] == 1
+    assert stats[_template(gateways["lying"])]["errors"] == 1
+    assert pool.ranked()[0] == _template(gateways["fast"])
+
+@pytest.mark.asyncio
+async def test_raises_when_every_gateway_fails(gateways):
+    pool = GatewayPool([_template(gateways["broken"]), _template(gateways["lying"])])
+    async with aiohttp.ClientSession() as session:
+        with pytest.raises(ContentVerificationError):
+            await pool.race(lambda g: _fetch(session, g))
+
+@pytest.mark.asyncio
+async def test_consistently_slow_gateway_ranks_last():
+    """Cancelled hedges are censored, so a gateway that always loses cannot look fast"""
+    rng = random.Random(0)
+
+    async def fetch(gateway: str) -> str:
+        await asyncio.sleep(0.5 if gateway == "slow" else rng.uniform(0.02, 0.03))
+        return gateway
+
+    # A hedge delay below the fast gateway's latency hedges every race, and the
+    # slow gateway is always cancelled a few milliseconds after it started
+    pool = GatewayPool(["slow", "fast"], initial_hedge_delay=0.01, max_hedge_delay=0.01)
+    winners, rankings = [], []
+    for _ in range(30):
+        winners.append(await pool.race(fetch))
+        rankings.append(pool.ranked())
+
+    stats = pool.snapshot()
+    assert winners.count("slow") == 0 and stats["slow"]["requests"] == 30
+    assert stats["slow"]["score"] > stats["fast"]["score"]
+    assert all(ranking == ["fast", "slow"] for ranking in rankings)
+
+@pytest.mark.asyncio
+async def test_simultaneous_winners_are_both_scored_and_losers_awaited():
+    release = asyncio.Event()
+    started, unwound = [], []
+
+    async def fetch(gateway: str) -> str:
+        started.append(gateway)
+        try:
+            if len(started) == 3:
+                release.set()
+            if gateway == "slow":
+                await asyncio.sleep(10)
+            await release.wait()
+            return gateway
+        finally:
+            unwound.append(gateway)
+
+    pool = GatewayPool(["a", "b", "slow"], initial_hedge_delay=0.01, max_parallel=3)
+    await pool.race(fetch)
+
+    # Both successes landed in one wakeup: each counts as a win, not a loss
+    stats = pool.snapshot()
+    assert stats["a"]["wins"] == stats["b"]["wins"] == 1
+    assert stats["a"]["loss_rate"] == stats["b"]["loss_rate"] == 0
+    # The straggler was cancelled and finished unwinding before race returned
+    assert sorted(unwound) == sorted(started) == ["a", "b", "slow"]
+
+def test_verify_cid():
+    assert verify_cid(CID, CONTENT) is True
+    assert verify_cid(CID, CONTENT + b"x") is False
+    # dag-pb CIDv0 cannot be checked against raw bytes
+    assert verify_cid("QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG", CONTENT) is None
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from aiohttp.test_utils import TestServer
+from scripts.lilypad_standin import STATS, create_app
+from src.services.compute.lilypad import LilypadError, LilypadService
+
+@pytest.fixture
+async def lilypad():
+    """Local Lilypad stand-in with a short scheduling overhead"""
+    server = TestServer(create_app(job_overhead=0.1, per_item_latency=0.001))
+    await server.start_server()
+    yield server
+    await server.close()
+
+def _service(server: TestServer, **kwargs) -> LilypadService:
+    options = dict(max_batch_size=8, max_concurrent_jobs=2, poll_interval=0.02)
+    options.update(kwargs)
+    return LilypadService(api_key="test", base_url=str(server.make_url("")), **options)
+
+@pytest.mark.asyncio
+async def test_inputs_are_packed_and_fanned_out_in_order(lilypad):
+    async with _service(lilypad) as service:
+        results = await service.infer_many([{"frame": i} for i in range(40)])
+
+    assert results == [{"echo": {"frame": i}} for i in range(40)]
+    stats = lilypad.app[STATS]
+    assert stats["items"] == 40
+    assert stats["jobs"] <= 6
+    assert stats["max_running"] <= 2
+
+@pytest.mark.asyncio
+async def test_failed_job_fails_every_waiting_caller(lilypad):
+    async with _service(lilypad, max_batch_size=4, max_concurrent_jobs=1) as service:
+        results = await asyncio.gather(
+            service.infer({"frame": 0}),
+            service.infer({"frame": 1, "fail": True}),
+            service.infer({"frame": 2}),
+            return_exceptions=True
+        )
+
+    assert all(isinstance(result, LilypadError) for result in results)
+    assert lilypad.app[STATS]["jobs"] == 1
+
+@pytest.mark.asyncio
+async def test_wait_for_job_times_out(lilypad):
+    async with _service(lilypad) as service:
+        submitted = await service.submit_job({"frame": 0})
+        with pytest.raises(LilypadError, match="timed out"):
+            await service.wait_for_job(submitted["id"], timeout=0.01)
+
+@pytest.mark.asyncio
+async def test_close_fails_inputs_held_by_the_dispatcher(lilypad):
+    service = _service(lilypad, max_batch_size=4, max_concurrent_jobs=1, max_batch_delay=5.0)
+    # The only job slot is taken, so the dispatcher holds the next input while it waits
+    await service._job_slots.acquire()
+    waiting = asyncio.create_task(service.infer({"frame": 0}))
+    await asyncio.sleep(0.05)
+    assert service._queue.empty()
+
+    await service.close()
+    with pytest.raises(LilypadError, match="closed"):
+        await asyncio.wait_for(waiting, 1.0)
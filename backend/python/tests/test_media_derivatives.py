@@ -0,0 +1,114 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from src.services.storage.cid_cache import CIDCache
+from src.services.storage.derivatives import (
+    DerivativeError,
+    DerivativeOptions,
+    MediaPipeline,
+    render_derivatives,
+)
+from src.services.storage.local import LocalStorageService
+
+BUCKET = "asl-training-data"
+
+def photo(width: int = 1200, height: int = 800, orientation: int = 1) -> bytes:
+    """Camera-style JPEG: noisy pixels, an orientation tag and a large EXIF comment"""
+    pixels = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels)
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = "PhoneMaker"
+    exif[0x9286] = "x" * 40_000  # large maker/user comment
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=95, exif=exif.tobytes())
+    return buffer.getvalue()
+
+class CountingStorage(LocalStorageService):
+    """Local provider that counts downloads, to tell cache hits from storage fetches"""
+    def __init__(self, root):
+        super().__init__(root)
+        self.downloads = 0
+
+    async def download_file(self, bucket_name, file_name, destination):
+        self.downloads += 1
+        return await super().download_file(bucket_name, file_name, destination)
+
+@pytest.fixture
+def pipeline(tmp_path):
+    storage = CountingStorage(tmp_path / "storage")
+    cache = CIDCache(tmp_path / "cache")
+    return MediaPipeline(storage, BUCKET, cache, DerivativeOptions(max_edge=1024, thumbnail_sizes=(64, 256)))
+
+def test_render_strips_metadata_and_applies_orientation():
+    data = photo(orientation=6)  # rotate 90 degrees clockwise
+    rendered = render_derivatives(data, DerivativeOptions(max_edge=600, thumbnail_sizes=(64, 160)))
+
+    assert set(rendered) == {"display", "thumb-160", "thumb-64"}
+    display = Image.open(io.BytesIO(rendered["display"].data))
+    assert display.format == "WEBP"
+    assert display.size == (400, 600) == (rendered["display"].width, rendered["display"].height)
+    assert not display.getexif()
+    assert "exif" not in display.info and "xmp" not in display.info
+    for size in (64, 160):
+        assert Image.open(io.BytesIO(rendered[f"thumb-{size}"].data)).size == (size, size)
+    assert len(rendered["display"].data) < len(data) / 4
+
+def test_small_images_keep_their_size_and_transparency():
+    image = Image.new("RGBA", (100, 50), (255, 0, 0, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    rendered = render_derivatives(buffer.getvalue(), DerivativeOptions(thumbnail_sizes=(32,)))
+    display = Image.open(io.BytesIO(rendered["display"].data))
+    assert display.size == (100, 50)
+    assert display.mode == "RGBA"
+
+def test_undecodable_data_is_rejected():
+    with pytest.raises(DerivativeError):
+        render_derivatives(b"\xff\xd8\xff" + b"\x00" * 500)
+
+@pytest.mark.asyncio
+async def test_derivatives_are_stored_linked_to_the_original_and_served_from_cache(pipeline, tmp_path):
+    data = photo()
+    original_cid = await pipeline.storage.upload_file(BUCKET, data, "hand.jpg")
+
+    manifest = pipeline.schedule(original_cid, data, "hand.jpg")
+    assert manifest.status == "pending"
+    await pipeline.drain()
+
+    manifest = await pipeline.manifest(original_cid)
+    assert manifest.status == "ready"
+    assert set(manifest.variants) == {"display", "thumb-256", "thumb-64"}
+    stored = await pipeline.storage.list_files(BUCKET)
+    assert f"{original_cid}.derivatives.json" in stored
+    assert f"{original_cid}.thumb-64.webp" in stored
+
+    path, info = await pipeline.variant_path(original_cid, "thumb-64")
+    assert Image.open(path).size == (64, 64)
+    assert info["media_type"] == "image/webp"
+    assert pipeline.storage.downloads == 0
+
+    metrics = pipeline.metrics()
+    assert metrics["bytes"]["originals"] == len(data)
+    assert metrics["display_reduction"] > 0.5
+
+    # A fresh process without the local manifest or cache recovers both from storage
+    other = MediaPipeline(pipeline.storage, BUCKET, CIDCache(tmp_path / "other-cache"))
+    path, _ = await other.variant_path(original_cid, "display")
+    assert Image.open(path).size == (1024, 683)
+    assert pipeline.storage.downloads == 2
+
+@pytest.mark.asyncio
+async def test_failed_render_is_recorded(pipeline):
+    pipeline.schedule("bafkreibroken", b"\x89PNG\r\n\x1a\n" + b"\x00" * 200, "broken.png")
+    await pipeline.drain()
+    manifest = await pipeline.manifest("bafkreibroken")
+    assert manifest.status == "failed"
+    with pytest.raises(DerivativeError):
+        await pipeline.variant_path("bafkreibroken", "thumb-64")
+
+@pytest.mark.asyncio
+async def test_invalid_cids_are_refused(pipeline):
+    with pytest.raises(DerivativeError):
+        await pipeline.manifest("../etc")
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import Counter
+import pytest
+from src.services.ml.model_registry import ModelRegistry, ModelVersion, parse_versions
+
+class FakeService:
+    """Answers with a fixed letter after a delay; records the threads it ran on"""
+    created = []
+
+    def __init__(self, version: ModelVersion, letter: str, delay: float = 0.0):
+        self.version = version
+        self.letter = letter
+        self.delay = delay
+        self.threads = set()
+        FakeService.created.append(self)
+
+    def process_image(self, image_data, as_array=False):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        if image_data == "empty":
+            return {"detected": False}
+        return {"detected": True, "letter": self.letter, "confidence": 0.9 if self.version.name == "stable" else 0.8}
+
+def factory(letters, delays=None):
+    return lambda version: FakeService(version, letters[version.name], (delays or {}).get(version.name, 0.0))
+
+@pytest.fixture(autouse=True)
+def reset_created():
+    FakeService.created = []
+
+def test_versions_are_parsed_from_settings():
+    assert parse_versions("", "models/asl") == [ModelVersion("default", "models/asl")]
+    assert parse_versions("stable:models/a:1, fast:models/b:0:0.25", "x") == [
+        ModelVersion("stable", "models/a", 1.0, 0.0),
+        ModelVersion("fast", "models/b", 0.0, 0.25),
+    ]
+    with pytest.raises(ValueError):
+        parse_versions("stable:models/a", "x")
+    with pytest.raises(ValueError):
+        ModelRegistry([ModelVersion("a", "p", weight=0)], factory({"a": "A"}))
+
+def test_traffic_is_split_by_weight_and_sessions_are_sticky():
+    registry = ModelRegistry(
+        [ModelVersion("stable", "a", weight=3), ModelVersion("fast", "b", weight=1)],
+        factory({"stable": "A", "fast": "B"}),
+        seed=0,
+    )
+    counts = Counter(registry.process_image("frame")["model"] for _ in range(4000))
+    assert 0.7 < counts["stable"] / 4000 < 0.8
+
+    by_session = {f"s{i}": registry.choose(f"s{i}").name for i in range(200)}
+    assert all(registry.choose(key).name == name for key, name in by_session.items())
+    assert set(by_session.values()) == {"stable", "fast"}
+    assert registry.primary.name == "stable"
+
+def test_versions_load_lazily_once_per_thread():
+    registry = ModelRegistry(
+        [ModelVersion("stable", "a"), ModelVersion("unused", "b", weight=0)],
+        factory({"stable": "A", "unused": "B"}),
+    )
+    assert FakeService.created == []
+    for _ in range(5):
+        registry.process_image("frame")
+    assert [s.version.name for s in FakeService.created] == ["stable"]
+    assert registry.metrics()["versions"]["unused"]["loaded"] is False
+
+    thread = threading.Thread(target=registry.process_image, args=("frame",))
+    thread.start()
+    thread.join()
+    assert [s.version.name for s in FakeService.created] == ["stable", "stable"]
+
+def test_shadow_runs_off_the_request_path_and_records_agreement():
+    registry = ModelRegistry(
+        [ModelVersion("stable", "a"), ModelVersion("fast", "b", weight=0, shadow=1.0)],
+        factory({"stable": "A", "fast": "A"}, delays={"fast": 0.02}),
+        shadow_queue=100,
+    )
+    started = time.perf_counter()
+    results = [registry.process_image("empty" if i % 4 == 0 else "frame") for i in range(20)]
+    assert time.perf_counter() - started < 0.2  # 20 shadow runs take 0.4s
+    assert all(result["model"] == "stable" for result in results)
+
+    registry.drain()
+    stats = registry.metrics()["versions"]["fast"]["shadow_stats"]
+    assert stats["compared"] == 20 and stats["dropped"] == 0
+    assert stats["agreement"] == 1.0 and stats["detection_agreement"] == 1.0
+    assert stats["mean_confidence_delta"] == pytest.approx(-0.075)
+    assert stats["latency"]["p50"] >= 0.02
+    stable, fast = FakeService.created
+    assert not stable.threads & fast.threads
+
+def test_disagreements_are_counted_and_the_shadow_queue_is_bounded():
+    registry = ModelRegistry(
+        [ModelVersion("stable", "a"), ModelVersion("candidate", "b", weight=0, shadow=1.0)],
+        factory({"stable": "A", "candidate": "B"}, delays={"candidate": 0.05}),
+        shadow_queue=2,
+    )
+    for _ in range(10):
+        registry.process_image("frame")
+    registry.drain()
+    stats = registry.metrics()["versions"]["candidate"]["shadow_stats"]
+    assert stats["compared"] + stats["dropped"] == 10
+    assert 2 <= stats["compared"] <= 4
+    assert stats["agreement"] == 0.0
+    assert stats["top_disagreements"] == {"A->B": stats["compared"]}
+
+def test_shadow_sampling_rate():
+    registry = ModelRegistry(
+        [ModelVersion("stable", "a"), ModelVersion("fast", "b", weight=0, shadow=0.1)],
+        factory({"stable": "A", "fast": "A"}),
+        shadow_queue=10_000,
+        seed=1,
+    )
+    for _ in range(2000):
+        registry.process_image("frame")
+    registry.drain()
+    assert 150 < registry.metrics()["versions"]["fast"]["shadow_stats"]["compared"] < 250
+
+def test_close_drops_queued_shadow_runs_and_stops_mirroring():
+    registry = ModelRegistry(
+        [ModelVersion("stable", "a"), ModelVersion("candidate", "b", weight=0, shadow=1.0)],
+        factory({"stable": "A", "candidate": "B"}, delays={"candidate": 0.05}),
+        shadow_queue=8,
+    )
+    for _ in range(5):
+        registry.process_image("frame")
+    registry.close()
+    # Cancelled runs are no longer pending, so drain() returns
+    drained = threading.Thread(target=registry.drain, daemon=True)
+    drained.start()
+    drained.join(timeout=1)
+    assert not drained.is_alive()
+    assert registry.metrics()["shadow_pending"] == 0
+
+    # Live traffic still works after close, without mirroring
+    assert registry.process_image("frame")["letter"] == "A"
+    assert registry.metrics()["shadow_pending"] == 0
@@ -0,0 +1,78 @@
+import asyncio
+import time
+import pytest
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.services.storage.rate_limiter import AsyncTokenBucket, parse_retry_after
+
+@pytest.fixture
+async def gateway():
+    """Local stand-in for an IPFS gateway that records request arrival times"""
+    arrivals = []
+    throttle = {"remaining": 0, "retry_after": "0"}
+
+    async def handle(request: web.Request) -> web.Response:
+        arrivals.append(time.monotonic())
+        if throttle["remaining"] > 0:
+            throttle["remaining"] -= 1
+            return web.Response(status=429, headers={"Retry-After": throttle["retry_after"]})
+        return web.Response(body=request.match_info["cid"].encode())
+
+    app = web.Application()
+    app.router.add_get("/ipfs/{cid}", handle)
+    server = TestServer(app)
+    await server.start_server()
+    server.arrivals = arrivals
+    server.throttle = throttle
+    yield server
+    await server.close()
+
+async def _fetch(session, limiter, url):
+    await limiter.acquire()
+    async with session.get(url) as response:
+        if response.status == 429:
+            limiter.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+        else:
+            limiter.on_success()
+        return response.status
+
+@pytest.mark.asyncio
+async def test_measured_rate_under_concurrency(gateway):
+    """Concurrent callers never exceed burst plus rate * elapsed"""
+    rate, burst, total = 40, 5, 45
+    limiter = AsyncTokenBucket(rate, burst=burst)
+    async with aiohttp.ClientSession() as session:
+        statuses = await asyncio.gather(*[
+            _fetch(session, limiter, str(gateway.make_url(f"/ipfs/cid{i}")))
+            for i in range(total)
+        ])
+
+    assert statuses == [200] * total
+    arrivals = sorted(gateway.arrivals)
+    elapsed = arrivals[-1] - arrivals[0]
+    # The first `burst` requests go out immediately, the rest are paced at `rate`
+    assert elapsed >= (total - burst) / rate * 0.9
+    for i, start in enumerate(arrivals):
+        in_window = sum(1 for t in arrivals[i:] if t - start < 0.5)
+        assert in_window <= burst + rate * 0.5 + 1
+
+@pytest.mark.asyncio
+async def test_throttle_honours_retry_after(gateway):
+    """A 429 with Retry-After pauses every waiter and lowers the rate"""
+    gateway.throttle.update(remaining=1, retry_after="0.3")
+    limiter = AsyncTokenBucket(100, burst=1)
+    async with aiohttp.ClientSession() as session:
+        url = str(gateway.make_url("/ipfs/cid"))
+        assert await _fetch(session, limiter, url) == 429
+        assert limiter.rate == 50
+        assert await _fetch(session, limiter, url) == 200
+
+    first, second = gateway.arrivals
+    assert second - first >= 0.3
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("garbage") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
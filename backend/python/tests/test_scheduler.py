@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from src.services.compute.scheduler import (
+    BULK,
+    INTERACTIVE,
+    InferenceBackend,
+    InferenceScheduler,
+    LatencyAwarePolicy,
+    LocalBackend,
+)
+
+class SimulatedBackend(InferenceBackend):
+    """Backend with a fixed service time and a hard concurrency limit"""
+    def __init__(self, name: str, service_time: float, capacity: int, fail: bool = False):
+        super().__init__(name, capacity, prior_latency=service_time)
+        self.delay = service_time
+        self.fail = fail
+        self._slots = asyncio.Semaphore(capacity)
+
+    async def _infer(self, payload):
+        async with self._slots:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError(f"{self.name} down")
+            return {"backend": self.name, "payload": payload}
+
+def _scheduler(**kwargs):
+    local = SimulatedBackend("local", service_time=0.02, capacity=2)
+    remote = SimulatedBackend("lilypad", service_time=0.1, capacity=64, **kwargs)
+    policy = LatencyAwarePolicy(offload_threshold=3)
+    return InferenceScheduler([local, remote], policy=policy)
+
+@pytest.mark.asyncio
+async def test_idle_interactive_requests_stay_local():
+    scheduler = _scheduler()
+    for _ in range(5):
+        result = await scheduler.submit("frame", kind=INTERACTIVE)
+        assert result["backend"] == "local"
+    assert scheduler.stats()["decisions"][INTERACTIVE] == {"local": 5}
+
+@pytest.mark.asyncio
+async def test_spike_spills_interactive_traffic_to_remote():
+    """Once the local queue makes it slower than the remote, new requests go remote"""
+    scheduler = _scheduler()
+    results = await asyncio.gather(*[scheduler.submit(i) for i in range(40)])
+
+    used = {result["backend"] for result in results}
+    assert used == {"local", "lilypad"}
+    # Local never builds a queue much deeper than what beats the remote latency
+    assert scheduler.backends["local"].latency.snapshot()["count"] < 40
+
+@pytest.mark.asyncio
+async def test_bulk_work_offloads_past_queue_threshold():
+    scheduler = _scheduler()
+    await asyncio.gather(*[scheduler.submit(i, kind=BULK) for i in range(20)])
+
+    decisions = scheduler.stats()["decisions"][BULK]
+    # The first capacity + threshold requests fit locally, the rest are offloaded
+    assert decisions["local"] == 5
+    assert decisions["lilypad"] == 15
+
+@pytest.mark.asyncio
+async def test_falls_back_when_chosen_backend_fails():
+    scheduler = _scheduler()
+    scheduler.backends["local"].fail = True
+    result = await scheduler.submit("frame")
+    assert result["backend"] == "lilypad"
+    assert scheduler.stats()["fallbacks"] == 1
+
+class ErroringService:
+    """ASLService-shaped: reports failures in the result instead of raising"""
+    def process_image(self, image_data):
+        return {"error": "Invalid image data"}
+
+@pytest.mark.asyncio
+async def test_error_result_from_local_service_falls_back():
+    local = LocalBackend(ErroringService(), workers=1, prior_latency=0.001)
+    remote = SimulatedBackend("lilypad", service_time=0.01, capacity=8)
+    scheduler = InferenceScheduler([local, remote])
+
+    result = await scheduler.submit("frame")
+    assert result["backend"] == "lilypad"
+    assert scheduler.stats()["fallbacks"] == 1
+    # Counted as a failure, not as a fast success the policy would keep choosing
+    assert local.latency.errors == 1 and local.latency.count == 0
+    assert local.service.errors == 1 and local.service.p50 is None
@@ -0,0 +1,68 @@
+import numpy as np
+from src.services.ml.sequence_decoder import FingerspellingDecoder
+
+A, B, L = 1, 2, 12
+
+def feed(decoder, session, classes, start=0.0, confidence=0.9):
+    """Feed one prediction per frame at 30fps; None means no hand detected"""
+    committed = []
+    for i, class_index in enumerate(classes):
+        update = decoder.update_prediction(session, class_index, confidence, now=start + i / 30)
+        if update.committed:
+            committed.append(update.committed)
+    return committed, update
+
+def test_held_sign_commits_once_and_flicker_is_ignored():
+    decoder = FingerspellingDecoder(window=4, min_frames=3)
+    # A single-frame flicker of B inside a held A must not produce a letter
+    committed, update = feed(decoder, "s", [A] * 10 + [B] + [A] * 10 + [B] * 10)
+    assert committed == ["A", "B"]
+    assert decoder.text("s") == "AB"
+
+def test_double_letter_requires_release():
+    decoder = FingerspellingDecoder(window=4, min_frames=3, space_frames=50)
+    committed, update = feed(decoder, "s", [L] * 8 + [None] * 4 + [L] * 8)
+    assert decoder.text("s") == "LL"
+
+def test_blank_run_ends_word():
+    decoder = FingerspellingDecoder(window=4, min_frames=3, space_frames=6)
+    _, update = feed(decoder, "s", [A] * 8 + [None] * 10 + [B] * 8)
+    assert decoder.text("s") == "A B"
+    assert update.word == "B"
+
+def test_low_confidence_frames_do_not_commit():
+    decoder = FingerspellingDecoder(window=4, min_frames=3, commit_threshold=0.6)
+    committed, _ = feed(decoder, "s", [A] * 20, confidence=0.4)
+    assert committed == []
+
+def test_sessions_are_independent_and_expire():
+    decoder = FingerspellingDecoder(window=4, min_frames=3, session_ttl=10.0)
+    feed(decoder, "one", [A] * 8)
+    feed(decoder, "two", [B] * 8, start=5.0)
+    assert decoder.text("one") == "A"
+    assert decoder.text("two") == "B"
+
+    # "one" has been idle for more than the TTL; "two" has not
+    decoder.update("two", np.eye(decoder.num_classes, dtype=np.float32)[B], now=12.0)
+    assert len(decoder) == 1
+    assert decoder.text("one") == ""
+
+def test_max_sessions_drops_least_recently_active():
+    decoder = FingerspellingDecoder(max_sessions=100)
+    for i in range(1000):
+        decoder.update_prediction(i, A, now=0.0)
+    assert len(decoder) == 100
+    assert 999 in decoder._sessions
+    assert 0 not in decoder._sessions
+
+def test_session_text_is_bounded():
+    decoder = FingerspellingDecoder(window=4, min_frames=3, space_frames=6, max_word_length=4, max_words=3)
+    for word in range(10):
+        feed(decoder, "s", [A] * 8 + [B] * 8 + [None] * 10, start=word * 10.0)
+    # Only the last three finished words are kept
+    assert decoder.text("s") == "AB AB AB"
+
+    # A ten-letter run without blanks is split at the word-length cap
+    _, update = feed(decoder, "s", ([A] * 8 + [B] * 8) * 5, start=200.0)
+    assert decoder.text("s") == "AB ABAB ABAB AB"
+    assert update.word == "AB"
@@ -0,0 +1,71 @@
+import json
+import numpy as np
+import pytest
+from src.api import serialization
+from src.api.serialization import (
+    COMPACT_JSON,
+    JSON,
+    MSGPACK,
+    negotiate,
+    pack_array,
+    render,
+    unpack_array,
+)
+
+@pytest.fixture
+def result():
+    landmarks = np.random.default_rng(0).random((21, 3), dtype=np.float32)
+    return {"detected": True, "letter": "A", "confidence": 0.9, "landmarks": landmarks}
+
+def test_default_json_matches_tolist_output(result):
+    body = json.loads(render(result).body)
+    assert body["letter"] == "A"
+    np.testing.assert_allclose(body["landmarks"], result["landmarks"], rtol=1e-6)
+
+@pytest.mark.parametrize("dtype,tolerance", [("float16", 3e-4), ("float32", 0)])
+def test_pack_array_round_trip(dtype, tolerance):
+    array = np.random.default_rng(1).random((21, 3), dtype=np.float32)
+    restored = unpack_array(json.loads(json.dumps(pack_array(array, dtype))))
+    assert restored.shape == (21, 3)
+    np.testing.assert_allclose(restored, array, atol=tolerance)
+
+def test_compact_json_packs_arrays_and_lists(result):
+    response = render({**result, "timeline": [{"landmarks": result["landmarks"].tolist()}]}, COMPACT_JSON)
+    assert response.media_type == COMPACT_JSON
+    body = json.loads(response.body)
+    assert body["landmarks"]["dtype"] == "float16"
+    np.testing.assert_allclose(unpack_array(body["timeline"][0]["landmarks"]), result["landmarks"], atol=3e-4)
+    assert len(response.body) < len(render(result).body)
+
+def test_msgpack_round_trip(result):
+    msgpack = pytest.importorskip("msgpack")
+    response = render(result, f"{MSGPACK}; dtype=float32")
+    assert response.media_type == MSGPACK
+    body = msgpack.unpackb(response.body)
+    np.testing.assert_array_equal(unpack_array(body["landmarks"]), result["landmarks"])
+
+@pytest.mark.parametrize("accept,expected", [
+    (None, (JSON, "float16")),
+    ("*/*", (JSON, "float16")),
+    ("text/html", (JSON, "float16")),
+    (f"{COMPACT_JSON}; dtype=float32, */*; q=0.1", (COMPACT_JSON, "float32")),
+    (f"application/json, {COMPACT_JSON}; q=0.5", (JSON, "float16")),
+    (f"application/json; q=0.5, {COMPACT_JSON}", (COMPACT_JSON, "float16")),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == expected
+
+def test_msgpack_falls_back_when_not_installed(monkeypatch):
+    monkeypatch.setattr(serialization, "msgpack", None)
+    assert negotiate(f"{MSGPACK}, {COMPACT_JSON}; q=0.5") == (COMPACT_JSON, "float16")
+
+@pytest.mark.parametrize("accept", [COMPACT_JSON, MSGPACK])
+def test_integer_data_is_not_packed(result, accept):
+    msgpack = pytest.importorskip("msgpack") if accept == MSGPACK else None
+    content = {**result, "frames": np.arange(3), "boxes": [[1, 2], [3, 4]], "top_k": [0.5, 0.25]}
+    response = render(content, accept)
+    body = msgpack.unpackb(response.body) if msgpack else json.loads(response.body)
+    assert body["frames"] == [0, 1, 2]
+    assert body["boxes"] == [[1, 2], [3, 4]]
+    assert body["top_k"] == [0.5, 0.25]
+    assert body["landmarks"]["dtype"] == "float16"
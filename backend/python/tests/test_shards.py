@@ -0,0 +1,131 @@
+import asyncio
+import json
+import tarfile
+import pytest
+from src.services.storage.local import LocalStorageService
+from src.services.storage.shards import (
+    ShardError,
+    ShardIndex,
+    ShardReader,
+    export_shards,
+    group_samples,
+    label_from_pattern,
+    local_shards,
+    read_shard,
+    storage_shards,
+)
+
+BUCKET = "asl-training-data"
+
+@pytest.fixture
+async def storage(tmp_path):
+    storage = LocalStorageService(tmp_path / "storage")
+    for letter in "ABC":
+        for i in range(10):
+            key = f"{letter}_{i:03d}"
+            await storage.upload_file(BUCKET, bytes([i]) * (3000 + 100 * i), f"{key}.png")
+            await storage.upload_file(BUCKET, json.dumps([[i, i, 0.5]]).encode(), f"{key}.landmarks.json")
+    await storage.upload_file(BUCKET, b"B\n", "A_000.label")  # sidecar wins over the name
+    await storage.upload_file(BUCKET, b"x" * 500, "deadbeef.thumb-128.webp")
+    await storage.upload_file(BUCKET, b"{}", "deadbeef.derivatives.json")
+    return storage
+
+def test_objects_are_grouped_by_key_with_their_sidecars():
+    groups, skipped = group_samples([
+        "a.png", "a.label", "a.landmarks.json",
+        "hand.v2.jpg", "hand.v2.label",
+        "clip.mp4", "clip.timeline.json",
+        "orphan.label", "cid1.display.webp", "cid1.derivatives.json", "asl-train-00000.tar",
+    ])
+    assert {g.key: g.members for g in groups} == {
+        "a": {"png": "a.png", "label": "a.label", "landmarks.json": "a.landmarks.json"},
+        "clip": {"mp4": "clip.mp4", "timeline.json": "clip.timeline.json"},
+        "hand.v2": {"jpg": "hand.v2.jpg", "label": "hand.v2.label"},
+    }
+    assert skipped == ["orphan.label"]
+
+async def test_export_packs_whole_samples_into_bounded_shards(storage, tmp_path):
+    index = await export_shards(
+        storage, BUCKET, tmp_path / "out", shard_bytes=40_000,
+        labels=label_from_pattern(r"^([A-Z])_"), concurrency=4, seed=7,
+    )
+    assert index.samples == 30
+    assert index.labels == {"A": 9, "B": 11, "C": 10}
+    assert len(index.shards) > 1
+    keys = [key for shard in index.shards for key in shard.keys]
+    assert sorted(keys) == sorted(f"{l}_{i:03d}" for l in "ABC" for i in range(10))
+    assert keys != sorted(keys)  # shuffled across shards
+
+    for shard in index.shards:
+        path = tmp_path / "out" / shard.name
+        assert path.stat().st_size == shard.size
+        assert shard.size <= 40_000 or shard.samples == 1
+        samples = list(read_shard(path))
+        assert [s["__key__"] for s in samples] == shard.keys
+        for sample in samples:
+            i = int(sample["__key__"][2:])
+            assert sample["png"] == bytes([i]) * (3000 + 100 * i)
+            assert json.loads(sample["landmarks.json"]) == [[i, i, 0.5]]
+            assert sample["label"] == ("B" if sample["__key__"] == "A_000" else sample["__key__"][0])
+
+    saved = ShardIndex.from_json((tmp_path / "out" / "asl-train.index.json").read_bytes())
+    assert saved.shards == index.shards
+    assert not list((tmp_path / "out").glob(".staging-*"))
+
+async def test_export_is_reproducible(storage, tmp_path):
+    first = await export_shards(storage, BUCKET, tmp_path / "one", shard_bytes=40_000, seed=3)
+    second = await export_shards(storage, BUCKET, tmp_path / "two", shard_bytes=40_000, seed=3)
+    assert [s.sha256 for s in first.shards] == [s.sha256 for s in second.shards]
+
+async def test_unlabeled_samples_can_be_dropped(storage, tmp_path):
+    index = await export_shards(storage, BUCKET, tmp_path / "out", require_label=True)
+    assert index.samples == 1 and index.shards[0].keys == ["A_000"]
+
+async def test_reader_prefetches_and_shuffles_every_sample_once(storage, tmp_path):
+    index = await export_shards(storage, BUCKET, tmp_path / "out", shard_bytes=20_000)
+    reader = ShardReader(index, local_shards(tmp_path / "out"), prefetch=3, shuffle_buffer=8, seed=1)
+    first, second = [s["__key__"] for s in reader], [s["__key__"] for s in reader]
+    assert len(first) == len(reader) == 30
+    assert sorted(first) == sorted(second) == sorted(key for s in index.shards for key in s.keys)
+    assert first != second  # new order every epoch
+    assert first == [s["__key__"] for s in ShardReader(index, local_shards(tmp_path / "out"), shuffle_buffer=8, seed=1)]
+
+    halves = [
+        [s["__key__"] for s in ShardReader(index, local_shards(tmp_path / "out"), partition=(rank, 2))]
+        for rank in range(2)
+    ]
+    assert not set(halves[0]) & set(halves[1])
+    assert sorted(halves[0] + halves[1]) == sorted(first)
+
+async def test_storage_reader_verifies_and_caches_shards(storage, tmp_path):
+    index = await export_shards(
+        storage, BUCKET, tmp_path / "out", shard_bytes=40_000,
+        upload_bucket="asl-shards", keep_local=False,
+    )
+    assert not list((tmp_path / "out").glob("*.tar"))
+    assert set(await storage.list_files("asl-shards")) == {s.name for s in index.shards} | {"asl-train.index.json"}
+
+    fetch = storage_shards(storage, "asl-shards", tmp_path / "cache")
+    samples = list(ShardReader(index, fetch, prefetch=2))
+    assert len(samples) == 30
+    assert {p.name for p in (tmp_path / "cache").iterdir()} == {s.name for s in index.shards}
+
+    # A corrupt upload is caught by the checksum and never enters the cache
+    victim = index.shards[0]
+    (tmp_path / "cache" / victim.name).unlink()
+    data = bytearray(storage.path_for("asl-shards", victim.name).read_bytes())
+    data[600] ^= 0xFF
+    storage.path_for("asl-shards", victim.name).write_bytes(bytes(data))
+    with pytest.raises(ShardError, match="Checksum"):
+        await asyncio.to_thread(fetch, victim)
+    assert not (tmp_path / "cache" / victim.name).exists()
+
+def test_foreign_tars_are_grouped_by_name(tmp_path):
+    path = tmp_path / "plain.tar"
+    with tarfile.open(path, "w", format=tarfile.GNU_FORMAT) as tar:
+        for name in ["x.png", "x.label", "y.png"]:
+            tar.addfile(tarfile.TarInfo(name))
+    assert [(s["__key__"], sorted(k for k in s if not k.startswith("__"))) for s in read_shard(path)] == [
+        ("x", ["label", "png"]),
+        ("y", ["png"]),
+    ]
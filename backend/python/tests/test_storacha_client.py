@@ -0,0 +1,275 @@
+import asyncio
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Optional
+import pytest
+
+pytest.importorskip("web3.storage")
+
+from src.services.storage.gateways import compute_raw_cid
+from src.services.storage.storacha import StorachaStorageService
+from src.storacha_client import StorachaClient
+
+GATEWAY = "https://gateway.test/ipfs/{cid}"
+
+class FakeResponse:
+    def __init__(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.content = self
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def iter_chunked(self, size: int):
+        for start in range(0, len(self.body), size):
+            yield self.body[start:start + size]
+
+class FakeSession:
+    """aiohttp.ClientSession stand-in serving stored objects, with Range support"""
+
+    def __init__(self, objects: Dict[str, bytes]):
+        self.objects = objects
+        self.closed = False
+        self.requests = []
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None):
+        self.requests.append((url, headers))
+        return self._request(url.rsplit("/", 1)[-1], headers or {})
+
+    @asynccontextmanager
+    async def _request(self, cid: str, headers: Dict[str, str]):
+        yield await self.respond(cid, headers)
+
+    async def respond(self, cid: str, headers: Dict[str, str]) -> FakeResponse:
+        body = self.objects.get(cid)
+        if body is None:
+            return FakeResponse(404)
+        if "Range" in headers:
+            start, end = (int(v) for v in headers["Range"].removeprefix("bytes=").split("-"))
+            return FakeResponse(206, body[start:end + 1])
+        return FakeResponse(200, body)
+
+    async def close(self):
+        self.closed = True
+
+class FakeWeb3:
+    """Web3Storage stand-in: stores uploads under their raw CID after a short delay"""
+
+    def __init__(self, objects: Dict[str, bytes], delay: float = 0.0, on_put=None):
+        self.objects = objects
+        self.delay = delay
+        self.on_put = on_put
+        self.names = []
+
+    def put(self, name: str, data) -> str:
+        if self.on_put:
+            self.on_put(name)
+        content = data if isinstance(data, bytes) else data.read()
+        time.sleep(self.delay)
+        cid = compute_raw_cid(content)
+        self.objects[cid] = content
+        self.names.append(name)
+        return cid
+
+class SlowSession(FakeSession):
+    """Answers after a delay that grows with each request, and records how many were in flight"""
+
+    def __init__(self, objects: Dict[str, bytes], delay: float):
+        super().__init__(objects)
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self.cancelled = 0
+
+    async def respond(self, cid: str, headers: Dict[str, str]) -> FakeResponse:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay * len(self.requests))
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        return await super().respond(cid, headers)
+
+class ThrottlingSession(FakeSession):
+    """Throttles the first requests with the given status and Retry-After"""
+
+    def __init__(self, objects: Dict[str, bytes], throttled: int, status: int, retry_after: str):
+        super().__init__(objects)
+        self.throttled = throttled
+        self.status = status
+        self.retry_after = retry_after
+        self.arrivals = []
+
+    async def respond(self, cid: str, headers: Dict[str, str]) -> FakeResponse:
+        self.arrivals.append(time.monotonic())
+        if len(self.arrivals) <= self.throttled:
+            return FakeResponse(self.status, headers={"Retry-After": self.retry_after})
+        return await super().respond(cid, headers)
+
+def make_client(objects: Dict[str, bytes], **kwargs) -> StorachaClient:
+    kwargs.setdefault("rate_limit_per_second", 1000)
+    client = StorachaClient(api_token="test-token", gateways=[GATEWAY], **kwargs)
+    client._session = FakeSession(objects)
+    return client
+
+async def test_upload_batch_packs_groups_and_keeps_few_archives_on_disk(tmp_path, monkeypatch):
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(spool))
+    files = []
+    for i in range(12):
+        path = tmp_path / f"frame{i:02d}.jpg"
+        path.write_bytes(bytes([i]) * (3000 + 100 * i))
+        files.append(path)
+
+    objects: Dict[str, bytes] = {}
+    archives_on_disk = []
+    lock = threading.Lock()
+
+    def on_put(name):
+        with lock:
+            archives_on_disk.append(len(list(spool.glob("*.tar"))))
+
+    client = make_client(objects, max_upload_workers=4)
+    client.client = FakeWeb3(objects, delay=0.05, on_put=on_put)
+    packed = await client.upload_batch(files, archive_name="frames", max_archive_bytes=8 * 1024)
+
+    # About two files per 8 KiB archive, uploaded as six archives
+    assert sorted(client.client.names) == [f"frames-{i:04d}.tar" for i in range(6)]
+    assert max(archives_on_disk) <= 2
+    assert list(spool.glob("*.tar")) == []
+
+    for path in files:
+        location = packed[path]
+        archive = objects[location.archive_cid]
+        assert archive[location.offset:location.offset + location.size] == path.read_bytes()
+        assert await client.retrieve_packed(location) == path.read_bytes()
+    assert client._session.requests[-1][1] == {"Range": packed[files[-1]].byte_range}
+    await client.close()
+
+async def test_client_can_be_reused_after_close(tmp_path):
+    objects: Dict[str, bytes] = {}
+    path = tmp_path / "sign.jpg"
+    path.write_bytes(b"hello")
+    client = make_client(objects)
+    client.client = FakeWeb3(objects)
+
+    first = await client.upload_file(path)
+    await client.close()
+    # The upload pool comes back on next use, as the session does
+    assert await client.upload_file(path) == first
+    assert client.client.names == ["sign.jpg", "sign.jpg"]
+    await client.close()
+
+def frames(count: int):
+    contents = [f"frame-{i}".encode() for i in range(count)]
+    return {compute_raw_cid(content): content for content in contents}
+
+async def test_retrieve_stream_keeps_a_bounded_window(tmp_path):
+    objects = frames(20)
+    pulled = []
+
+    async def source():
+        for cid in objects:
+            pulled.append(cid)
+            yield cid
+
+    client = make_client(objects)
+    client._session = SlowSession(objects, delay=0.001)
+    results = {}
+    async for cid, result in client.retrieve_stream(source(), max_in_flight=3):
+        # Never more than the window has been pulled from the source ahead of the consumer
+        assert len(pulled) - len(results) <= 3
+        results[cid] = result
+
+    assert results == objects
+    assert client._session.peak <= 3
+
+    saved = await client.retrieve_batch(list(objects)[:4], output_dir=tmp_path)
+    assert all(path.read_bytes() == objects[cid] for cid, path in saved.items())
+    await client.close()
+
+async def test_retrieve_stream_early_exit_cancels_and_awaits_pending_requests():
+    objects = frames(10)
+    source_closed = asyncio.Event()
+
+    async def source():
+        try:
+            for cid in objects:
+                yield cid
+        finally:
+            source_closed.set()
+
+    client = make_client(objects)
+    client._session = SlowSession(objects, delay=0.02)
+    stream = client.retrieve_stream(source(), max_in_flight=4)
+    async for cid, result in stream:
+        assert result == objects[cid]
+        break
+    await stream.aclose()
+
+    session = client._session
+    assert session.in_flight == 0 and session.cancelled == 3
+    assert source_closed.is_set()
+    assert [task for task in asyncio.all_tasks() if task is not asyncio.current_task()] == []
+    await client.close()
+
+@pytest.mark.parametrize("status", [429, 503])
+async def test_throttled_request_waits_for_retry_after_then_succeeds(status):
+    objects = frames(2)
+    first, second = objects
+    client = make_client(objects, rate_limit_per_second=20)
+    session = ThrottlingSession(objects, throttled=1, status=status, retry_after="0.2")
+    client._session = session
+    acquired = []
+    acquire = client.limiter.acquire
+
+    async def counting_acquire(*args):
+        acquired.append(time.monotonic())
+        await acquire(*args)
+    client.limiter.acquire = counting_acquire
+
+    assert await client.retrieve_file(first) == objects[first]
+    assert await client.retrieve_file(second) == objects[second]
+
+    # The 429 paused the shared limiter; the retry went out after Retry-After, not tenacity's backoff
+    assert len(session.arrivals) == len(acquired) == 3
+    assert 0.2 <= session.arrivals[1] - session.arrivals[0] < 2.0
+    assert client.limiter.rate < 20
+    # Every request went through the one pooled session
+    assert await client._get_session() is session
+    await client.close()
+
+class FakeUploadClient:
+    def __init__(self):
+        self.objects: Dict[str, bytes] = {}
+
+    async def upload_file(self, path: Path) -> str:
+        content = path.read_bytes()
+        cid = compute_raw_cid(content)
+        self.objects[cid] = content
+        return cid
+
+async def test_storage_index_is_shared_between_workers(tmp_path):
+    index_path = tmp_path / "index" / "storacha.sqlite3"
+    client = FakeUploadClient()
+    # One service per worker process, both opened before either uploads
+    first = StorachaStorageService(client, index_path)
+    second = StorachaStorageService(client, index_path)
+
+    first_cid = await first.upload_file("videos", b"one", "a.mp4")
+    second_cid = await second.upload_file("videos", b"two", "b.mp4")
+
+    for service in (first, second):
+        assert await service.list_files("videos") == ["a.mp4", "b.mp4"]
+        assert service.get_cid("videos", "a.mp4") == first_cid
+        assert service.get_cid("videos", "b.mp4") == second_cid
+    assert await StorachaStorageService(client, index_path).list_files("videos") == ["a.mp4", "b.mp4"]
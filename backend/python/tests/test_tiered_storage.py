@@ -0,0 +1,101 @@
+import asyncio
+import time
+import pytest
+from src.services.storage.local import LocalStorageService
+from src.services.storage.tiered import TieredStorageError, TieredStorageService
+
+class SlowTier(LocalStorageService):
+    """Local stand-in for a remote tier with injected latency and failures"""
+    def __init__(self, root, delay: float, fail: bool = False):
+        super().__init__(root)
+        self.delay = delay
+        self.fail = fail
+
+    async def upload_file(self, bucket_name, file_data, file_name):
+        await asyncio.sleep(self.delay)
+        return await super().upload_file(bucket_name, file_data, file_name)
+
+    async def download_file(self, bucket_name, file_name, destination):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("tier unavailable")
+        return await super().download_file(bucket_name, file_name, destination)
+
+@pytest.fixture
+def tiers(tmp_path):
+    hot = LocalStorageService(tmp_path / "hot", max_bytes=10_000)
+    replicas = {
+        "storacha": SlowTier(tmp_path / "storacha", delay=0.05),
+        "akave": SlowTier(tmp_path / "akave", delay=0.2),
+    }
+    return TieredStorageService(hot, replicas, retry_delay=0.01)
+
+@pytest.mark.asyncio
+async def test_upload_returns_before_replication(tiers, tmp_path):
+    started = time.monotonic()
+    cid = await tiers.upload_file("asl-training-data", b"a" * 500, "frame.jpg")
+    assert time.monotonic() - started < 0.1
+    assert cid.startswith("b")
+    assert tiers.is_pending("asl-training-data", "frame.jpg")
+
+    await tiers.drain()
+    for replica in tiers.replicas.values():
+        assert replica.exists("asl-training-data", "frame.jpg")
+    assert not tiers.is_pending("asl-training-data", "frame.jpg")
+
+    destination = tmp_path / "out" / "frame.jpg"
+    await tiers.download_file("asl-training-data", "frame.jpg", str(destination))
+    assert destination.read_bytes() == b"a" * 500
+    assert tiers.metrics()["local"]["download"]["count"] == 1
+
+@pytest.mark.asyncio
+async def test_pending_files_are_not_evicted(tiers):
+    await tiers.upload_file("bucket", b"x" * 8_000, "old.jpg")
+    await tiers.upload_file("bucket", b"y" * 8_000, "new.jpg")
+    # Over budget, but neither file is replicated yet
+    assert tiers.hot.evict() == []
+
+    await tiers.drain()
+    assert tiers.hot.evict() == [("bucket", "old.jpg")]
+
+@pytest.mark.asyncio
+async def test_remote_read_falls_back_and_fills_hot_tier(tiers, tmp_path):
+    await tiers.upload_file("bucket", b"z" * 500, "clip.mp4")
+    await tiers.drain()
+    tiers.hot.path_for("bucket", "clip.mp4").unlink()
+    tiers.replicas["storacha"].fail = True
+
+    destination = tmp_path / "clip.mp4"
+    await tiers.download_file("bucket", "clip.mp4", str(destination))
+
+    assert destination.read_bytes() == b"z" * 500
+    assert tiers.hot.exists("bucket", "clip.mp4")
+    metrics = tiers.metrics()
+    assert metrics["akave"]["download"]["count"] == 1
+    assert metrics["storacha"]["download"]["errors"] == 1
+
+@pytest.mark.asyncio
+async def test_missing_everywhere(tiers, tmp_path):
+    with pytest.raises(TieredStorageError):
+        await tiers.download_file("bucket", "nope.jpg", str(tmp_path / "nope.jpg"))
+
+@pytest.mark.asyncio
+async def test_replication_gives_up_without_a_trailing_backoff(tmp_path):
+    class DownTier(SlowTier):
+        async def upload_file(self, bucket_name, file_data, file_name):
+            self.attempts += 1
+            raise ConnectionError("tier unavailable")
+
+    down = DownTier(tmp_path / "down", delay=0)
+    down.attempts = 0
+    tiers = TieredStorageService(
+        LocalStorageService(tmp_path / "hot"), {"down": down}, replication_attempts=2, retry_delay=0.2
+    )
+    await tiers.upload_file("bucket", b"a" * 10, "frame.jpg")
+    started = time.monotonic()
+    await tiers.drain()
+
+    # One backoff between the two attempts, none after the last
+    assert down.attempts == 2
+    assert 0.2 <= time.monotonic() - started < 0.5
+    assert tiers.is_pending("bucket", "frame.jpg")
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import logging
+import time
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from src.core.tracing import TracingMiddleware, current_trace, span, traced
+
+@traced("akave")
+async def fake_akave_call(delay: float):
+    await asyncio.sleep(delay)
+
+def build_app(**options) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/fast")
+    async def fast():
+        return {"ok": True}
+
+    @app.get("/slow")
+    async def slow():
+        await fake_akave_call(0.05)
+        with span("inference"):
+            time.sleep(0.02)
+        return {"ok": True}
+
+    app.add_middleware(TracingMiddleware, **options)
+    return app
+
+async def get(app, path, headers=None):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path, headers=headers)
+
+@pytest.mark.asyncio
+async def test_spans_are_reported_per_request(caplog):
+    app = build_app(slow_threshold=0.03)
+    with caplog.at_level(logging.INFO, logger="src.core.tracing"):
+        fast = await get(app, "/fast")
+        slow = await get(app, "/slow", headers={"X-Request-ID": "req-1"})
+
+    assert "akave" not in fast.headers["server-timing"]
+    assert slow.headers["x-request-id"] == "req-1"
+    assert "akave;dur=" in slow.headers["server-timing"]
+
+    records = [json.loads(r.getMessage()) for r in caplog.records]
+    assert [r["path"] for r in records] == ["/slow"]
+    record = records[0]
+    assert record["event"] == "slow_request"
+    assert record["request_id"] == "req-1"
+    assert record["status"] == 200
+    assert record["external_ms"]["akave"] >= 45
+    assert record["external_ms"]["inference"] >= 15
+    assert record["external_calls"] == {"akave": 1, "inference": 1}
+
+@pytest.mark.asyncio
+async def test_unsafe_request_ids_are_replaced():
+    response = await get(build_app(), "/fast", headers={"X-Request-ID": "../../etc/passwd"})
+    assert "/" not in response.headers["x-request-id"]
+
+@pytest.mark.asyncio
+async def test_debug_header_profiles_only_with_the_right_token(tmp_path, caplog):
+    app = build_app(slow_threshold=10, profile_token="secret", profile_dir=tmp_path, profile_interval=0.001)
+    with caplog.at_level(logging.INFO, logger="src.core.tracing"):
+        await get(app, "/slow", headers={"X-Debug-Profile": "wrong"})
+        assert list(tmp_path.iterdir()) == []
+        await get(app, "/slow", headers={"X-Debug-Profile": "secret"})
+
+    [profile] = list(tmp_path.iterdir())
+    lines = profile.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+    assert any("slow (test_tracing.py" in line for line in lines)
+    assert json.loads(caplog.records[-1].getMessage())["profile"] == str(profile)
+
+@pytest.mark.asyncio
+async def test_spans_outside_requests_are_ignored():
+    assert current_trace() is None
+    await fake_akave_call(0)
@@ -0,0 +1,57 @@
+import base64
+import json
+import pytest
+from src.services.storage.upload_tokens import InvalidUploadToken, UploadTokenSigner
+
+SECRET = b"0123456789abcdef0123456789abcdef"
+NOW = 1_700_000_000
+
+@pytest.fixture
+def signer():
+    return UploadTokenSigner(SECRET, ttl=300)
+
+def test_token_round_trip(signer):
+    token = signer.issue("asl-training-data", 5_000_000, {"image/png", "image/jpeg"}, filename="hand.png", now=NOW)
+    grant = signer.verify(token, now=NOW + 299)
+    assert grant.bucket == "asl-training-data"
+    assert grant.max_bytes == 5_000_000
+    assert grant.allowed_types == {"image/png", "image/jpeg"}
+    assert grant.filename == "hand.png"
+    assert grant.expires == NOW + 300
+    # Identical grants still get distinct tokens
+    assert token != signer.issue("asl-training-data", 5_000_000, {"image/png", "image/jpeg"}, filename="hand.png", now=NOW)
+
+def test_expired_token_is_rejected(signer):
+    token = signer.issue("asl-training-data", 100, {"image/png"}, now=NOW)
+    with pytest.raises(InvalidUploadToken, match="expired"):
+        signer.verify(token, now=NOW + 301)
+
+@pytest.mark.parametrize("tamper", [
+    lambda t: t[:-2] + ("AA" if not t.endswith("AA") else "BB"),  # signature changed
+    lambda t: "x" + t,                                              # payload changed
+    lambda t: t.split(".")[0],                                      # no signature
+    lambda t: "",
+    lambda t: "é." + t.split(".")[1],
+])
+def test_tampered_tokens_are_rejected(signer, tamper):
+    token = signer.issue("asl-training-data", 100, {"image/png"}, now=NOW)
+    with pytest.raises(InvalidUploadToken):
+        signer.verify(tamper(token), now=NOW)
+
+def test_raising_the_size_limit_breaks_the_signature(signer):
+    token = signer.issue("asl-training-data", 100, {"image/png"}, now=NOW)
+    payload, signature = token.split(".")
+    claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    claims["m"] = 10 ** 9
+    forged = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=").decode()
+    with pytest.raises(InvalidUploadToken, match="signature"):
+        signer.verify(f"{forged}.{signature}", now=NOW)
+
+def test_tokens_from_another_key_are_rejected(signer):
+    other = UploadTokenSigner(b"another-secret-key-of-32-bytes!!")
+    with pytest.raises(InvalidUploadToken):
+        signer.verify(other.issue("asl-training-data", 100, {"image/png"}, now=NOW), now=NOW)
+
+def test_short_secrets_are_refused():
+    with pytest.raises(ValueError):
+        UploadTokenSigner(b"short")
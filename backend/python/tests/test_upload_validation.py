@@ -0,0 +1,148 @@
+import struct
+import cv2
+import numpy as np
+import pytest
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+from src.api.uploads import read_upload, rejection_response
+from src.services.storage.validation import (
+    UploadPolicy,
+    UploadRejected,
+    UploadValidator,
+    image_dimensions,
+    sniff_media_type,
+)
+
+CHUNK = 1024
+# Rejected uploads must stop being read within this many body bytes
+READ_CAP = 8 * 1024
+BOUNDARY = b"test-boundary"
+
+def encode(ext: str, width: int = 64, height: int = 48) -> bytes:
+    image = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    ok, data = cv2.imencode(ext, image)
+    assert ok
+    return data.tobytes()
+
+def png_header(width: int, height: int) -> bytes:
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr + b"\x00" * 4
+
+def multipart(data: bytes, filename: str = "upload.bin") -> bytes:
+    return (
+        b"--" + BOUNDARY + b"\r\n"
+        + f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'.encode()
+        + b"Content-Type: application/octet-stream\r\n\r\n"
+        + data + b"\r\n--" + BOUNDARY + b"--\r\n"
+    )
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        try:
+            received = await read_upload(request, UploadPolicy(max_bytes=10 * 1024 * 1024))
+        except UploadRejected as e:
+            return rejection_response(e)
+        return {
+            "filename": received.filename,
+            "media_type": received.media_type,
+            "size": received.size,
+            "dimensions": received.dimensions,
+            "stored": len(received.file.read()),
+        }
+
+    return app
+
+async def post(app, body: bytes, headers=None):
+    """Send body in 1KB chunks and report how many bytes the app pulled"""
+    sent = 0
+
+    async def stream():
+        nonlocal sent
+        for i in range(0, len(body), CHUNK):
+            sent += len(body[i:i + CHUNK])
+            yield body[i:i + CHUNK]
+
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY.decode()}", **(headers or {})}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/upload", content=stream(), headers=headers)
+    return response, sent
+
+@pytest.mark.parametrize("ext,media_type", [
+    (".jpg", "image/jpeg"), (".png", "image/png"), (".webp", "image/webp"),
+])
+def test_dimensions_from_encoded_images(ext, media_type):
+    data = encode(ext, 640, 480)
+    assert sniff_media_type(data[:16]) == media_type
+    assert image_dimensions(media_type, data[:2048]) == (640, 480)
+
+def test_gif_and_video_signatures():
+    assert image_dimensions("image/gif", b"GIF89a" + struct.pack("<HH", 320, 200)) == (320, 200)
+    assert sniff_media_type(b"\x00\x00\x00\x18ftypisom\x00\x00\x02\x00") == "video/mp4"
+    assert sniff_media_type(b"\x00\x00\x00\x14ftypqt  \x00\x00\x00\x00") == "video/quicktime"
+    assert sniff_media_type(b"\x1a\x45\xdf\xa3" + b"\x00" * 12) == "video/webm"
+    assert sniff_media_type(b"%PDF-1.7\n" + b"\x00" * 7) is None
+
+@pytest.mark.parametrize("brand", [b"M4A ", b"heic", b"mif1", b"avif"])
+def test_audio_and_still_image_iso_files_are_not_video(brand):
+    assert sniff_media_type(b"\x00\x00\x00\x18ftyp" + brand + b"\x00\x00\x00\x00") is None
+
+def test_jpeg_header_after_large_metadata_segment_is_found_across_chunks():
+    data = encode(".jpg", 320, 240)
+    # A 60KB APP1 segment (EXIF-sized) in front of the frame header
+    app1 = b"\xff\xe1" + struct.pack(">H", 60002) + b"\x00" * 60000
+    data = data[:2] + app1 + data[2:]
+    validator = UploadValidator()
+    for i in range(0, len(data), CHUNK):
+        validator.feed(data[i:i + CHUNK])
+        if validator.dimensions:
+            break
+    assert validator.dimensions == (320, 240)
+    assert i < 64 * 1024
+
+@pytest.mark.asyncio
+async def test_valid_image_is_accepted_and_spooled(app):
+    data = encode(".png", 200, 100)
+    response, _ = await post(app, multipart(data, "hand.png"))
+    assert response.status_code == 200
+    assert response.json() == {
+        "filename": "hand.png", "media_type": "image/png", "size": len(data),
+        "dimensions": [200, 100], "stored": len(data),
+    }
+
+@pytest.mark.asyncio
+async def test_raw_body_upload(app):
+    data = encode(".jpg")
+    response, _ = await post(app, data, headers={"Content-Type": "image/jpeg"})
+    assert response.status_code == 200
+    assert response.json()["dimensions"] == [64, 48]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name,body,status", [
+    ("not media", multipart(b"%PDF-1.7\n" + b"x" * 2_000_000), 415),
+    ("huge dimensions", multipart(png_header(30000, 30000) + b"\x00" * 2_000_000), 413),
+    ("truncated jpeg garbage", multipart(b"\xff\xd8\xff\x00" + b"\x00" * 2_000_000), 400),
+])
+async def test_bad_uploads_are_rejected_from_the_first_bytes(app, name, body, status):
+    response, sent = await post(app, body)
+    assert response.status_code == status, name
+    assert response.headers["connection"] == "close"
+    assert sent <= READ_CAP, f"{name}: read {sent} bytes"
+
+@pytest.mark.asyncio
+async def test_declared_length_over_limit_is_rejected_before_reading(app):
+    body = multipart(encode(".png"))
+    response, sent = await post(app, body, headers={"Content-Length": str(200 * 1024 * 1024)})
+    assert response.status_code == 413
+    assert sent == 0
+
+@pytest.mark.asyncio
+async def test_streamed_size_limit_without_content_length(app):
+    # Valid video signature, then more data than the 10MB policy allows
+    body = multipart(b"\x00\x00\x00\x18ftypisom" + b"\x00" * (11 * 1024 * 1024))
+    response, sent = await post(app, body)
+    assert response.status_code == 413
+    assert sent <= 10 * 1024 * 1024 + READ_CAP
@@ -0,0 +1,64 @@
+import threading
+import cv2
+import numpy as np
+import pytest
+from src.services.ml.video_service import (
+    MotionSampler,
+    StrideSampler,
+    VideoPipeline,
+    VideoProcessingError,
+)
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    """60-frame synthetic clip: 30 still frames, then a moving square"""
+    path = tmp_path_factory.mktemp("video") / "clip.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 30, (160, 120))
+    for i in range(60):
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        x = 10 if i < 30 else 10 + (i - 30) * 4
+        cv2.rectangle(frame, (x, 40), (x + 30, 70), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+class RecordingService:
+    """Stands in for ASLService.process_frame; letters follow the square's position"""
+    instances = 0
+    lock = threading.Lock()
+
+    def __init__(self):
+        with RecordingService.lock:
+            RecordingService.instances += 1
+
+    def process_frame(self, frame):
+        xs = np.nonzero(frame[55, :, 0] > 128)[0]
+        letter = "A" if xs.size and xs[0] < 50 else "B"
+        return {"detected": True, "letter": letter, "confidence": 0.9, "landmarks": [[0.0, 0.0, 0.0]]}
+
+def test_stride_sampling_builds_ordered_timeline(clip):
+    pipeline = VideoPipeline(RecordingService, workers=2, batch_size=4, queue_size=2)
+    timeline = pipeline.process(clip, StrideSampler(stride=5))
+
+    assert timeline.frame_count == 60
+    assert [e.frame_index for e in timeline.entries] == list(range(0, 60, 5))
+    # Skipped frames are grabbed, not decoded
+    assert timeline.frames_decoded == 12
+    assert timeline.letters == "AB"
+    assert timeline.to_dict()["frames_sampled"] == 12
+
+def test_motion_sampling_skips_still_frames(clip):
+    pipeline = VideoPipeline(RecordingService, batch_size=4)
+    timeline = pipeline.process(clip, MotionSampler(threshold=1.0, max_gap=100))
+
+    indices = [e.frame_index for e in timeline.entries]
+    still = [i for i in indices if i < 30]
+    moving = [i for i in indices if i >= 30]
+    assert still == [0]
+    assert len(moving) >= 10
+
+def test_unreadable_clip(tmp_path):
+    bad = tmp_path / "bad.mp4"
+    bad.write_bytes(b"not a video")
+    with pytest.raises(VideoProcessingError):
+        VideoPipeline(RecordingService).process(bad)
@@ -7,12 +7,28 @@ export const storageService = {
     onProgress?: (progress: number) => void
   ): Promise<UploadResponse> {
     try {
-      const formData = new FormData();
-      formData.append("file", file);
-
-      const response = await fetch(`${API_BASE_URL}/storage/upload`, {
+      // Express only signs the upload; the file goes straight to the storage API
+      const tokenResponse = await fetch(`${API_BASE_URL}/storage/upload-token`, {
         method: "POST",
-        body: formData,
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          filename: file.name,
+          contentType: file.type,
+          size: file.size,
+        }),
+      });
+      const { token, uploadUrl } = await handleApiResponse<{
+        token: string;
+        uploadUrl: string;
+      }>(tokenResponse);
+
+      const response = await fetch(uploadUrl, {
+        method: "PUT",
+        headers: {
+          Authorization: `Bearer ${token}`,
+          "Content-Type": file.type,
+        },
+        body: file,
       });
 
       return handleApiResponse<UploadResponse>(response);